@@ -0,0 +1,158 @@
+"""
+    Synthetic IDF 3.0 data for benchmarking:
+        ~writeBoard writes a valid .emn board file at a given scale
+        ~writeLibrary writes a CADSTAR-style library folder (.LIB files)
+          that holds the part numbers the board places
+
+    The same seed always gives the same files.
+"""
+
+import math
+import os
+import random
+
+#the shape sections a board gets, with their second (header) record
+SHAPE_HEADERS = (
+    (".OTHER_OUTLINE", "OTHER%d 1.0 TOP"),
+    (".PLACE_KEEPOUT", "TOP 0.0"),
+    (".PLACE_OUTLINE", "TOP 5.0"),
+    (".ROUTE_OUTLINE", "ALL"),
+    (".ROUTE_KEEPOUT", "ALL"),
+    (".VIA_KEEPOUT", None),
+)
+
+#the top-level libraries importLibrary reads, and the nested library
+#  folders generated library parts are spread across
+TOP_LIBS = ("000199.LIB", "200399.LIB", "400599.LIB", "600799.LIB",
+            "800899.LIB", "900904.LIB")
+NESTED_LIBS = 4
+
+"""
+    The settings that decide how big generated data is.
+"""
+class boardScale:
+    def __init__(self, parts=2000, shapesPerType=20, cutoutsPerShape=4,
+                 loopVertices=40, arcDensity=0.2, drills=5000,
+                 libSize=50000, boardSize=500.0):
+        self.parts = parts #placed parts
+        self.shapesPerType = shapesPerType #shapes of each non-board type
+        self.cutoutsPerShape = cutoutsPerShape #cutouts in every shape
+        self.loopVertices = loopVertices #points in every outline/cutout
+        self.arcDensity = arcDensity #fraction of points that end an arc
+        self.drills = drills #drilled holes
+        self.libSize = libSize #part numbers in the library
+        self.boardSize = boardSize #board width and height, in MM
+
+    def asDict(self):
+        return dict(self.__dict__)
+
+#the part number of the n-th library part
+def partNumber(n):
+    return "%03d-%05d-%02d" % (n % 1000, n // 1000, n % 97)
+
+"""
+    Write the points of one closed loop: a polygon of count points around
+      (cx, cy), some of them ending arcs, with the first point repeated
+      at the end.
+"""
+def writeLoop(f, rng, loopIndex, cx, cy, radius, count, arcDensity):
+    points = []
+    for i in range(count):
+        angle = math.tau * i / count
+        points.append((cx + radius * math.cos(angle),
+                       cy + radius * math.sin(angle)))
+
+    for x, y in points:
+        arc = 0.0
+        if rng.random() < arcDensity:
+            arc = rng.choice((-90.0, -45.0, 45.0, 90.0, 180.0))
+        f.write("%d %.4f %.4f %.1f\n" % (loopIndex, x, y, arc))
+    f.write("%d %.4f %.4f 0.0\n" % (loopIndex, points[0][0], points[0][1]))
+
+"""
+    Write one shape section: an outline loop plus its cutouts.
+"""
+def writeShape(f, rng, scale, keyword, header, cx, cy, radius):
+    f.write("%s MCAD\n" % keyword)
+    if header:
+        f.write(header + "\n")
+
+    writeLoop(f, rng, 0, cx, cy, radius, scale.loopVertices, scale.arcDensity)
+    for cutout in range(1, scale.cutoutsPerShape + 1):
+        angle = math.tau * cutout / (scale.cutoutsPerShape + 1)
+        writeLoop(f, rng, cutout,
+                  cx + radius * 0.5 * math.cos(angle),
+                  cy + radius * 0.5 * math.sin(angle),
+                  radius * 0.1, scale.loopVertices, scale.arcDensity)
+
+    f.write(".END_%s\n" % keyword[1:])
+
+"""
+    Write a .emn board file at path.
+"""
+def writeBoard(path, scale, seed=0):
+    rng = random.Random(seed)
+    size = scale.boardSize
+
+    with open(path, "w") as f:
+        f.write(".HEADER\n")
+        f.write("BOARD_FILE 3.0 \"idfGenerator\" 2026/01/01.00:00:00 1\n")
+        f.write("\"bench_board\" MM\n")
+        f.write(".END_HEADER\n")
+
+        #the board outline is one big loop around the whole board
+        writeShape(f, rng, scale, ".BOARD_OUTLINE", "1.6",
+                   size / 2, size / 2, size / 2)
+
+        for keyword, header in SHAPE_HEADERS:
+            for i in range(scale.shapesPerType):
+                radius = rng.uniform(size * 0.01, size * 0.05)
+                writeShape(f, rng, scale, keyword,
+                           header % i if header and "%d" in header else header,
+                           rng.uniform(radius, size - radius),
+                           rng.uniform(radius, size - radius), radius)
+
+        f.write(".DRILLED_HOLES\n")
+        for i in range(scale.drills):
+            f.write("%.3f %.4f %.4f PTH BOARD VIA ECAD\n" %
+                    (rng.choice((0.3, 0.5, 1.0, 3.2)),
+                     rng.uniform(0, size), rng.uniform(0, size)))
+        f.write(".END_DRILLED_HOLES\n")
+
+        f.write(".PLACEMENT\n")
+        for i in range(scale.parts):
+            #most parts are in the library, a few are not. The checker
+            #  reads the first field as the part name, like CircuitWorks
+            #  writes it
+            n = rng.randrange(scale.libSize + scale.libSize // 50 + 1)
+            f.write("%s PKG%d U%d\n" % (partNumber(n), i % 50, i + 1))
+            f.write("%.4f %.4f 0.0 %.1f %s PLACED\n" %
+                    (rng.uniform(0, size), rng.uniform(0, size),
+                     rng.choice((0.0, 90.0, 180.0, 270.0)),
+                     rng.choice(("TOP", "BOTTOM"))))
+        f.write(".END_PLACEMENT\n")
+
+"""
+    Write a CADSTAR-style library under libPath: the top-level libraries,
+      plus LIBnn folders holding LIBnn.LIB files. Part number lines start
+      with a single quote, like the real thing; the other lines don't.
+"""
+def writeLibrary(libPath, scale):
+    libFiles = [os.path.join(libPath, name) for name in TOP_LIBS]
+    for i in range(NESTED_LIBS):
+        libDir = os.path.join(libPath, "LIB%02d" % i)
+        os.makedirs(libDir, exist_ok=True)
+        libFiles.append(os.path.join(libDir, "LIB%02d.LIB" % i))
+    os.makedirs(libPath, exist_ok=True)
+
+    handles = [open(p, "w") for p in libFiles]
+    try:
+        for n in range(scale.libSize):
+            f = handles[n % len(handles)]
+            f.write("'%s' &\n" % partNumber(n))
+            f.write("  DESCRIPTION \"generated part %d\"\n" % n)
+    finally:
+        for f in handles:
+            f.close()
+
+    return libFiles
@@ -0,0 +1,184 @@
+"""
+    IDF Checking Tool benchmarks
+
+    Purpose: To time the parser, every check, the library loader and whole
+               runs on synthetic boards (see idfGenerator), and to catch
+               slowdowns before a release.
+
+    Usage: python benchmarks/runBenchmarks.py --out results.json
+           python benchmarks/runBenchmarks.py --baseline results.json
+
+    Results are written as JSON. When a baseline is given, every scenario
+      whose best time is more than --threshold times the baseline's is
+      reported as a regression, and the exit code is 1.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+#the tool's modules live one folder up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import emnObj
+import emnReader
+import errorSink
+import idfCheckingTool
+import idfGenerator
+import libIndex
+
+"""
+    Time fn repeat times. setup (if given) runs untimed before each call
+      and its return value is passed to fn.
+"""
+def timeScenario(fn, repeat, setup=None):
+    times = []
+    for i in range(repeat):
+        arg = setup() if setup else None
+        startTime = time.perf_counter()
+        fn(arg) if setup else fn()
+        times.append(time.perf_counter() - startTime)
+    times.sort()
+    return {"best": times[0], "median": times[len(times) // 2],
+            "repeat": repeat}
+
+"""
+    Build every scenario as (name, fn, setup) for a generated board and
+      library.
+"""
+def buildScenarios(emnPath, libPath, libFiles):
+    partsLibrary = libIndex.loadLibrary(libPath)
+    scenarios = []
+
+    def readLines():
+        with open(emnPath) as f:
+            return f.readlines()
+
+    def parseLines():
+        with open(emnPath) as f:
+            emnObj.emnObj(f, "bench.emn")
+
+    def parseReader():
+        currentEmn = emnObj.emnObj(emnReader.emnReader(emnPath), "bench.emn")
+        currentEmn.parts, currentEmn.shapes, currentEmn.drills
+        currentEmn.close()
+
+    def parseColumnar():
+        with open(emnPath) as f:
+            emnObj.emnObj(f, "bench.emn", columnar=True)
+
+    scenarios.append(("read.lines", readLines, None))
+    scenarios.append(("parse.fileHandle", parseLines, None))
+    scenarios.append(("parse.emnReader", parseReader, None))
+    scenarios.append(("parse.columnar", parseColumnar, None))
+
+    #each check gets a freshly parsed board, so only the check is timed
+    def parsedBoard():
+        with open(emnPath) as f:
+            currentEmn = emnObj.emnObj(f, "bench.emn")
+        currentEmn.getCoordTable()
+        return currentEmn
+
+    for name, needs in emnObj.CHECKS:
+        #generated boards have no .emp file of component outlines
+        if "components" in needs:
+            continue
+        if "library" in needs:
+            check = lambda e, name=name: getattr(e, name)(partsLibrary)
+        else:
+            check = lambda e, name=name: getattr(e, name)()
+        scenarios.append(("check." + name, check, parsedBoard))
+
+    scenarios.append(("library.findLibFiles",
+                      lambda: libIndex.findLibFiles(libPath), None))
+    scenarios.append(("library.readLibFile",
+                      lambda: [libIndex.readLibFile(p) for p in libFiles],
+                      None))
+    scenarios.append(("library.loadLibrary",
+                      lambda: libIndex.loadLibrary(libPath), None))
+
+    checks = emnObj.selectChecks()
+    scenarios.append(("endToEnd.checkFile",
+                      lambda: list(idfCheckingTool.checkFiles(
+                          [emnPath], partsLibrary, checks,
+                          errorSink.recordList(), jobs=1)),
+                      None))
+
+    return scenarios
+
+"""
+    Compare results against a baseline. Returns a list of
+      (scenario, baseline seconds, new seconds) that got slower than
+      threshold allows.
+"""
+def findRegressions(results, baseline, threshold):
+    regressions = []
+    for name, result in sorted(results["scenarios"].items()):
+        old = baseline["scenarios"].get(name)
+        if old and result["best"] > old["best"] * threshold:
+            regressions.append((name, old["best"], result["best"]))
+    return regressions
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    defaults = idfGenerator.boardScale()
+    for name, value in sorted(defaults.asDict().items()):
+        parser.add_argument("--" + name, type=type(value), default=value)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", default=None,
+        help="only run scenarios whose names contain this text")
+    parser.add_argument("--out", default=None,
+        help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=None,
+        help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+        help="slowdown factor that counts as a regression (default: 1.25)")
+    args = parser.parse_args(argv)
+
+    scale = idfGenerator.boardScale(**{name: getattr(args, name)
+                                       for name in defaults.asDict()})
+    workDir = tempfile.mkdtemp(prefix="idfbench")
+    try:
+        emnPath = os.path.join(workDir, "bench.emn")
+        libPath = os.path.join(workDir, "library")
+        idfGenerator.writeBoard(emnPath, scale)
+        libFiles = idfGenerator.writeLibrary(libPath, scale)
+
+        results = {
+            "scale": scale.asDict(),
+            "python": platform.python_version(),
+            "checkerVersion": emnObj.CHECKER_VERSION,
+            "scenarios": {},
+        }
+        for name, fn, setup in buildScenarios(emnPath, libPath, libFiles):
+            if args.only and args.only not in name:
+                continue
+            result = timeScenario(fn, args.repeat, setup)
+            results["scenarios"][name] = result
+            print("%-28s %10.2f ms" % (name, result["best"] * 1000))
+    finally:
+        shutil.rmtree(workDir)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = findRegressions(results, baseline, args.threshold)
+        for name, old, new in regressions:
+            print("REGRESSION %s: %.2f ms -> %.2f ms" %
+                  (name, old * 1000, new * 1000))
+        if regressions:
+            return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
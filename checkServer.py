@@ -0,0 +1,281 @@
+"""
+    checkServer class:
+        ~a long-running local HTTP server that keeps the parts library and
+          the check settings loaded between checks, so a check costs one
+          parse and one run of the checks instead of a whole startup
+        ~checks several .emn files at once on a pool of worker processes
+        ~reloads the parts library in the background when its .LIB files
+          change, and swaps it in once it has loaded
+
+    Requests and responses are JSON:
+        POST /check   {"path": "C:/boards/board.emn"} to check a file, or
+                      {"name": "board.emn", "data": "<.emn text>"} to check
+                      what was sent. The response has the file name, its
+                      error records (see errorSink.errorRecord), a failure
+                      message ("" if it could be checked) and check times.
+        GET /status   the checker version, the checks that run, the parts
+                      library's size and fingerprint and when it loaded
+        POST /reload  reload the parts library now
+"""
+
+import http.server
+import json
+import multiprocessing
+import socketserver
+import threading
+import time
+import emnObj
+import errorSink
+import idfCheckingTool
+import libIndex
+
+"""
+    Parse and check one .emn file for a request, the same way batch mode
+      does (see idfCheckingTool.checkFile). request is (fileName,
+      emnPath, data): data is None to read the file at emnPath, or the
+      text of a file that was sent. Returns the response as a dict.
+"""
+def checkRequest(request):
+    fileName, emnPath, data = request
+    records = errorSink.recordList()
+    fileName, failure, fileStats = idfCheckingTool.checkFile(
+        emnPath, records, data, fileName)
+    return {
+        "file": fileName,
+        "errors": [record.asDict() for record in records],
+        "failure": failure,
+        "checks": fileStats.get("checks", []),
+    }
+
+"""
+    Turn the JSON body of a /check request into a checkRequest request.
+      Raises ValueError if it names neither a path nor data.
+"""
+def parseRequest(body):
+    if not isinstance(body, dict):
+        raise ValueError("Expected a JSON object.")
+    if isinstance(body.get("data"), str):
+        fileName = str(body.get("name") or "payload.emn")
+        return fileName, None, body["data"]
+    if isinstance(body.get("path"), str):
+        emnPath = body["path"]
+        return emnPath.replace("\\", "/").split("/")[-1], emnPath, None
+    raise ValueError("Expected \"path\" or \"data\".")
+
+"""
+    A checkServer answers check requests against one parts library at a
+      time. partsLibrary is the library to start with (a libIndex, or a
+      libIndex.libraryLoader that is still loading).
+
+    findLibFiles returns the .LIB files of the library and loadLibrary
+      reads them into a new libIndex. Every pollInterval seconds the
+      files' sizes and modification times are compared to the ones the
+      library was loaded from; when they change, the library is reloaded
+      on a background thread while requests keep being answered with the
+      old one. findLibFiles can be None to never reload.
+
+    Checks run on jobs worker processes (all of the cores when None), or
+      in the server's own request threads with one job.
+"""
+class checkServer:
+    def __init__(self, partsLibrary, findLibFiles, loadLibrary, checks,
+                 jobs=None, empPath=None, lineNumbers=False,
+                 pollInterval=10.0, snapshotPath=None, log=print):
+        self.findLibFiles = findLibFiles
+        self.loadLibrary = loadLibrary
+        self.checks = checks #(name, needs) checks from emnObj.selectChecks
+        self.jobs = jobs
+        self.empPath = empPath
+        self.lineNumbers = lineNumbers
+        self.pollInterval = pollInterval #seconds between library polls
+        self.snapshotPath = snapshotPath #where reloaded libraries are saved
+        self.log = log
+        self.checked = 0 #requests answered
+        self._lock = threading.Lock() #guards the pool and library swaps
+        self._reloadLock = threading.Lock() #one reload at a time
+        self._pool = None
+        self._library = None
+        self._libraryTime = None #when the library in use was loaded
+        self._libStats = None #.LIB file stats the library was loaded from
+        self._stopped = threading.Event()
+
+        #a library the loader fell back to (the snapshot, or nothing) may
+        #  be out of date, so the first poll reloads it
+        libStats = self.libraryStats()
+        loader = partsLibrary
+        partsLibrary = libIndex.waitForLibrary(loader)
+        self.useLibrary(partsLibrary)
+        if not getattr(loader, "usedSnapshot", False) and len(partsLibrary):
+            self._libStats = libStats
+
+    #sizes and modification times of the library's .LIB files
+    def libraryStats(self):
+        if self.findLibFiles is None:
+            return None
+        return libIndex.libFileStats(self.findLibFiles())
+
+    """
+        Start checking with a new parts library. Requests that are already
+          running finish with the old one.
+    """
+    def useLibrary(self, partsLibrary):
+        pool = None
+        settings = (partsLibrary, self.checks, False, self.empPath,
+                    self.lineNumbers)
+        if self.jobs != 1:
+            partsLibrary.prepareForWorkers()
+            pool = multiprocessing.Pool(self.jobs, idfCheckingTool.initWorker,
+                                        settings)
+
+        with self._lock:
+            oldPool = self._pool
+            self._pool = pool
+            self._library = partsLibrary
+            self._libraryTime = time.time()
+            if pool is None:
+                idfCheckingTool.initWorker(*settings)
+        if oldPool is not None:
+            oldPool.close() #its workers leave once their requests are done
+
+    """
+        Check one request from parseRequest and return the response.
+    """
+    def check(self, request):
+        with self._lock:
+            self.checked += 1
+            if self._pool is not None:
+                result = self._pool.apply_async(checkRequest, (request,))
+            else:
+                result = None
+        if result is None:
+            return checkRequest(request)
+        return result.get()
+
+    """
+        Load the parts library again and use it, unless it came back empty
+          (a network library that went away, say) while the current one
+          isn't. Returns whether the new library is in use.
+    """
+    def reload(self):
+        with self._reloadLock:
+            libStats = self.libraryStats()
+            self.log("Reloading parts library...")
+            try:
+                partsLibrary = self.loadLibrary()
+            except Exception as e:
+                self.log("Could not reload parts library (%s)." % e)
+                return False
+            if not len(partsLibrary) and len(self._library):
+                self.log("Did not find a parts library, keeping the one " +
+                         "in use.")
+                return False
+
+            self.useLibrary(partsLibrary)
+            self._libStats = libStats
+            self.log("Parts library reloaded, %d parts." % len(partsLibrary))
+            if self.snapshotPath and len(partsLibrary):
+                try:
+                    partsLibrary.saveSnapshot(self.snapshotPath)
+                except OSError:
+                    pass
+            return True
+
+    #runs on a background thread, reloading when the .LIB files change
+    def pollLibrary(self):
+        while not self._stopped.wait(self.pollInterval):
+            try:
+                libStats = self.libraryStats()
+            except OSError:
+                continue #the library folder is away for now
+            if libStats != self._libStats:
+                self.reload()
+
+    def status(self):
+        with self._lock:
+            partsLibrary = self._library
+            libraryTime = self._libraryTime
+        return {
+            "checkerVersion": emnObj.CHECKER_VERSION,
+            "checks": [name for name, needs in self.checks],
+            "jobs": self.jobs,
+            "checked": self.checked,
+            "library": {
+                "parts": len(partsLibrary),
+                "fingerprint": partsLibrary.fingerprint(),
+                "loaded": time.strftime("%Y-%m-%dT%H:%M:%S",
+                                        time.localtime(libraryTime)),
+            },
+        }
+
+    """
+        Answer requests on host:port until ctrl+c (or close()).
+    """
+    def serve(self, host="127.0.0.1", port=8765):
+        httpServer = threadingServer((host, port), requestHandler)
+        httpServer.checkServer = self
+        if self.findLibFiles is not None:
+            threading.Thread(target=self.pollLibrary, daemon=True).start()
+
+        self.log("Serving checks on http://%s:%d/, press ctrl+c to stop." %
+                 httpServer.server_address[:2])
+        try:
+            httpServer.serve_forever()
+        except KeyboardInterrupt:
+            self.log("Stopped serving.")
+        finally:
+            httpServer.server_close()
+            self.close()
+
+    #stop polling and let the workers go
+    def close(self):
+        self._stopped.set()
+        with self._lock:
+            pool = self._pool
+            self._pool = None
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+#an HTTP server that answers each request on a thread of its own (what
+#  http.server.ThreadingHTTPServer is from Python 3.7)
+class threadingServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+#answers the HTTP requests of a checkServer
+class requestHandler(http.server.BaseHTTPRequestHandler):
+    server_version = "IDFCheckServer/" + emnObj.CHECKER_VERSION
+
+    def do_GET(self):
+        if self.path == "/status":
+            self.reply(200, self.server.checkServer.status())
+        else:
+            self.reply(404, {"error": "Unknown path %s" % self.path})
+
+    def do_POST(self):
+        checker = self.server.checkServer
+        if self.path == "/check":
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length).decode("utf-8")
+                request = parseRequest(json.loads(body))
+            except ValueError as e: #bad length, encoding, JSON or request
+                self.reply(400, {"error": str(e)})
+                return
+            self.reply(200, checker.check(request))
+        elif self.path == "/reload":
+            threading.Thread(target=checker.reload, daemon=True).start()
+            self.reply(202, {"reloading": True})
+        else:
+            self.reply(404, {"error": "Unknown path %s" % self.path})
+
+    def reply(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    #requests aren't logged one by one; /status counts them
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,267 @@
+"""
+    boardDiff class:
+        ~compare two revisions of a board entity by entity: parts by
+          reference designator, shapes by type and start point, drills
+          by position
+        ~work out which entities of the new revision each check has to
+          look at again, so a small edit only re-checks what it touched
+
+    planCheck:
+        ~decide, for one check, whether its errors can be worked out from
+          a few entities of the new revision or need a full run
+"""
+
+import collections
+import itertools
+import emnObj
+import spatialIndex
+
+#the entity sections a check's errors are about, one entity at a time.
+#  An entity's errors only depend on that entity (and the check's other
+#  needs), so re-running the check on the changed entities, plus the ones
+#  it reported last time, gives the same errors as a full run. Checks that
+#  aren't listed look at the board as a whole (or, like checkArcAngle,
+#  report points rather than entities) and always run in full.
+CHECK_SUBJECTS = {
+    "checkHeightErrors":   ("shapes",),
+    "checkNegErrors":      ("shapes", "parts", "drills"),
+    "checkClosedErrors":   ("shapes",),
+    "checkRefDesErrors":   ("parts",),
+    "checkRoundCutout":    ("shapes",),
+    "checkLoopCrossings":  ("shapes",),
+    "checkLibErrors":      ("parts",),
+    "checkDrillClearance": ("drills",),
+    "checkDrillKeepouts":  ("drills",),
+    "checkPartKeepouts":   ("parts",),
+    "checkPartHeights":    ("parts",),
+    "checkPartsOnBoard":   ("parts",),
+}
+
+#checks whose errors are about pairs of drills, so drills near a changed
+#  drill have to be looked at again too
+PAIR_CHECKS = ("checkDrillClearance",)
+
+#past this fraction of changed entities, a full run is cheaper
+FULL_RUN_FRACTION = 0.25
+
+#the columns of a partTable or drillTable, which tell whether a whole
+#  section is unchanged without looking at entities one by one
+TABLE_COLUMNS = {
+    "parts": ("xs", "ys", "rotations", "sides", "names", "refDeses",
+              "geometries", "partNumbers", "lineNumbers"),
+    "drills": ("diameters", "xs", "ys", "lineNumbers"),
+}
+
+#line numbers are part of an entity's content, since its messages say them
+def lineColumn(table, count):
+    if table.lineNumbers is None:
+        return itertools.repeat(None, count)
+    return table.lineNumbers
+
+#keys (see emnObj.entityKey) of every part, in board order
+def partKeys(parts):
+    return [("part", refDes) for refDes in parts.refDeses]
+
+#keys of every drill, in board order
+def drillKeys(drills):
+    return [("drill", x, y) for x, y in zip(drills.xs, drills.ys)]
+
+#keys of every shape, in board order
+def shapeKeys(shapes):
+    return [emnObj.entityKey(currentShape) for currentShape in shapes]
+
+#identity and content of every part, as (key, value) pairs in board order
+def partSignatures(parts):
+    values = zip(parts.names, parts.geometries, parts.partNumbers,
+                 parts.xs, parts.ys, parts.rotations, parts.sides,
+                 lineColumn(parts, len(parts)))
+    return list(zip(partKeys(parts), values))
+
+#identity and content of every drill, as (key, value) pairs in board order
+def drillSignatures(drills):
+    values = zip(drills.diameters, lineColumn(drills, len(drills)))
+    return list(zip(drillKeys(drills), values))
+
+#identity and content of every shape, as (key, value) pairs in board order
+def shapeSignatures(shapes):
+    values = []
+    for currentShape in shapes:
+        if currentShape.coordArray is not None:
+            coords = currentShape.coordArray.tobytes()
+        else:
+            coords = tuple(map(tuple, currentShape.coordinates))
+        values.append((currentShape.height, currentShape.layer, coords,
+                       currentShape.lineNumber))
+    return list(zip(shapeKeys(shapes), values))
+
+#section -> (keys, signatures) functions
+SECTIONS = {
+    "parts": (partKeys, partSignatures),
+    "drills": (drillKeys, drillSignatures),
+    "shapes": (shapeKeys, shapeSignatures),
+}
+
+"""
+    Find which new signatures have no match among the old ones. Returns
+      the indexes of the unmatched new ones and the number of unmatched
+      old ones. Each old signature can only match one new one, so a
+      duplicated entity counts as new.
+"""
+def matchSignatures(oldSignatures, newSignatures):
+    oldSet = set(oldSignatures)
+    newSet = set(newSignatures)
+    if len(oldSet) == len(oldSignatures) and len(newSet) == len(newSignatures):
+        #no duplicates, so sets are enough
+        changed = [i for i, signature in enumerate(newSignatures)
+                   if signature not in oldSet]
+        removed = len(oldSet) - (len(newSet) - len(changed))
+        return changed, removed
+
+    unmatched = collections.Counter(oldSignatures)
+    changed = []
+    for i, signature in enumerate(newSignatures):
+        if unmatched[signature] > 0:
+            unmatched[signature] -= 1
+        else:
+            changed.append(i)
+    return changed, sum(unmatched.values())
+
+"""
+    A boardDiff holds, for each entity section, the indexes of the entities
+      in the new revision that are new or different, and how many of the
+      old revision's are gone. An entity counts as unchanged if one with
+      the same key and content was in the old revision. A part or drill
+      section that kept its length is compared row by row instead, one
+      column at a time, so only the columns an edit touched are looked at.
+"""
+class boardDiff:
+    def __init__(self, oldEmn, newEmn):
+        self.newEmn = newEmn
+        self.changed = {} #section -> indexes of new or changed entities
+        self.removed = {} #section -> old entities with no match
+        self._keys = {} #section -> key of every new entity, when needed
+        for section in SECTIONS:
+            oldSection = getattr(oldEmn, section)
+            newSection = getattr(newEmn, section)
+            columns = TABLE_COLUMNS.get(section)
+            if columns and len(oldSection) == len(newSection):
+                changed = changedRows(oldSection, newSection, columns)
+                self.changed[section] = changed
+                self.removed[section] = len(changed)
+            else:
+                signatures = SECTIONS[section][1]
+                self.changed[section], self.removed[section] = \
+                    matchSignatures(signatures(oldSection),
+                                    signatures(newSection))
+        self.unitsChanged = oldEmn.units != newEmn.units
+
+    #whether anything in a section (or the units) is different
+    def sectionChanged(self, section):
+        if section == "units":
+            return self.unitsChanged
+        return bool(self.changed[section] or self.removed[section])
+
+    #the number of entities in a section of the new revision
+    def count(self, section):
+        return len(getattr(self.newEmn, section))
+
+    #indexes of the new entities in a section whose keys are in keys
+    def matchKeys(self, section, keys):
+        if not keys:
+            return []
+        if section not in self._keys:
+            self._keys[section] = SECTIONS[section][0](
+                getattr(self.newEmn, section))
+        return [i for i, key in enumerate(self._keys[section])
+                if key in keys]
+
+#indexes of the rows that differ between two tables of the same length
+def changedRows(oldTable, newTable, columns):
+    changed = set()
+    for column in columns:
+        oldColumn = getattr(oldTable, column)
+        newColumn = getattr(newTable, column)
+        if oldColumn == newColumn:
+            continue
+        if oldColumn is None or newColumn is None:
+            return list(range(len(newTable)))
+        changed.update(i for i, (oldValue, newValue) in
+                       enumerate(zip(oldColumn, newColumn))
+                       if oldValue != newValue)
+    return sorted(changed)
+
+"""
+    Get the indexes of the drills within reach of the given drills, so
+      pairs between them and a changed drill are looked at again. Drills
+      are bucketed in a grid as big as the reach, the way
+      emnObj.checkDrillClearance does it.
+"""
+def nearbyDrills(drills, indexes, reach):
+    xs = drills.xs
+    ys = drills.ys
+    grid = spatialIndex.gridIndex(max(reach, 1e-6))
+    for i, (x, y) in enumerate(zip(xs, ys)):
+        grid.insert(i, x, y, x, y)
+
+    nearby = set()
+    for i in indexes:
+        x = xs[i]
+        y = ys[i]
+        nearby.update(j for j in grid.queryBox(x - reach, y - reach,
+                                               x + reach, y + reach)
+                      if abs(xs[j] - x) <= reach and abs(ys[j] - y) <= reach)
+    return nearby
+
+"""
+    Decide how to run one check on newEmn given the previous revision.
+      Returns None when the check has to run on the whole board, or a dict
+      of section -> sorted entity indexes of newEmn to run it on.
+
+    A full run is needed when the previous revision didn't run the check,
+      when anything the check reads besides its subject entities changed
+      (the units, the shapes of a keepout check, the library, the .emp
+      outlines), or when so much changed that a full run is cheaper.
+"""
+def planCheck(name, needs, oldEmn, newEmn, diff, partsLibrary=None,
+              componentLibrary=None):
+    subjects = CHECK_SUBJECTS.get(name)
+    if (subjects is None or oldEmn.errorKeys is None or
+        name not in oldEmn.errorKeys):
+        return None
+
+    for section in needs:
+        if section in subjects:
+            continue
+        elif section == "library":
+            if not sameLibrary(oldEmn.checkedLibrary, partsLibrary):
+                return None
+        elif section == "components":
+            if oldEmn.checkedComponents is not componentLibrary:
+                return None
+        elif diff.sectionChanged(section):
+            return None
+
+    reported = oldEmn.errorKeys[name]
+    plan = {}
+    for section in subjects:
+        changed = diff.changed[section]
+        total = diff.count(section)
+        if len(changed) > max(1, total * FULL_RUN_FRACTION):
+            return None
+        indexes = set(changed)
+        indexes.update(diff.matchKeys(section, reported))
+        if name in PAIR_CHECKS and changed:
+            drills = newEmn.drills
+            reach = (max(drills.diameters) +
+                     emnObj.DRILL_CLEARANCE.get(newEmn.units, 0.0))
+            indexes.update(nearbyDrills(drills, changed, reach))
+        plan[section] = sorted(indexes)
+    return plan
+
+#whether two parts libraries hold the same part numbers
+def sameLibrary(oldLibrary, newLibrary):
+    if oldLibrary is newLibrary:
+        return True
+    if not oldLibrary or not newLibrary:
+        return False
+    return oldLibrary.fingerprint() == newLibrary.fingerprint()
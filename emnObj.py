@@ -11,7 +11,21 @@
         ~store a part's position, name and refdes for use by emnObj
 """
 
+import functools
+import itertools
 import math
+import operator
+import re
+import time
+import emnDiff
+import errorSink
+import libIndex
+import spatialIndex
+from array import array
+from sys import intern
+
+#bump this whenever a check changes what it reports
+CHECKER_VERSION = "0.9"
 
 #some definitions from the IDF 3.0 standard
 BOARD_START         = ".BOARD_OUTLINE"
@@ -30,7 +44,7 @@ PLACEMENT_START     = ".PLACEMENT"
 PLACEMENT_END       = ".END_PLACEMENT"
 ROUTE_START         = ".ROUTE_OUTLINE"
 ROUTE_END           = ".END_ROUTE_OUTLINE"
-ROUTE_KEEPOUT_START = ".ROUTE_KEEOUT"
+ROUTE_KEEPOUT_START = ".ROUTE_KEEPOUT"
 ROUTE_KEEPOUT_END   = ".END_ROUTE_KEEPOUT"
 VIA_KEEPOUT_START   = ".VIA_KEEPOUT"
 VIA_KEEPOUT_END     = ".END_VIA_KEEPOUT"
@@ -44,6 +58,266 @@ SHAPE_ENDS = (
     ROUTE_END, ROUTE_KEEPOUT_END, VIA_KEEPOUT_END
 )    
 
+#one field of an IDF record: a quoted string (which may hold spaces) or a
+#  run of anything but whitespace
+IDF_FIELD = re.compile(r'"[^"]*"|\S+')
+
+#smallest allowed gap between the edges of two drills, in file units
+DRILL_CLEARANCE = {"MM": 0.1, "THOU": 4.0}
+
+#how far the straight edges arcs are split into may stray from the true
+#  arc when looking for crossing outlines, in file units
+ARC_TOLERANCE = {"MM": 0.01, "THOU": 0.4}
+
+#the check registry: every check checkAllErrors runs, in the order it runs
+#  them, with the data each one needs ("parts", "shapes", "drills",
+#  "units" are emnObj sections, "library" is the parts library and
+#  "components" is an empLib.empLibrary of component outlines)
+CHECKS = (
+    ("checkUnits",          ("units",)),
+    ("checkHeightErrors",   ("shapes", "units")),
+    ("checkNegErrors",      ("shapes", "parts", "drills")),
+    ("checkClosedErrors",   ("shapes",)),
+    ("checkRefDesErrors",   ("parts",)),
+    ("checkRoundCutout",    ("shapes",)),
+    ("checkEmpty",          ("shapes",)),
+    ("checkArcAngle",       ("shapes",)),
+    ("checkLoopCrossings",  ("shapes", "units")),
+    ("checkLibErrors",      ("parts", "library")),
+    ("checkDrillClearance", ("drills", "units")),
+    ("checkDrillKeepouts",  ("drills", "shapes")),
+    ("checkPartKeepouts",   ("parts", "shapes")),
+    ("checkPartHeights",    ("parts", "shapes", "units", "components")),
+    ("checkPartsOnBoard",   ("parts", "shapes", "units", "components")),
+)
+CHECK_NAMES = tuple(name for name, needs in CHECKS)
+
+"""
+    Pick checks out of the registry. include limits the run to those
+      names, exclude leaves names out. Either can be None. Returns
+      (name, needs) pairs in registry order.
+"""
+def selectChecks(include=None, exclude=None):
+    for name in list(include or []) + list(exclude or []):
+        if name not in CHECK_NAMES:
+            raise ValueError("Unknown check: %s" % name)
+
+    return [(name, needs) for name, needs in CHECKS
+            if (include is None or name in include) and
+               (exclude is None or name not in exclude)]
+
+"""
+    Get the key an entity is known by from one revision of a board to the
+      next: parts by reference designator, drills by position and shapes
+      by type and starting point.
+"""
+def entityKey(entity):
+    if isinstance(entity, part):
+        return ("part", entity.refDes)
+    elif isinstance(entity, drill):
+        return ("drill",) + entity.coordinates
+    outline = entity.outline
+    if outline:
+        return ("shape", entity.sType, outline[0][1], outline[0][2])
+    return ("shape", entity.sType, None, None)
+
+#every section start keyword mapped to the keyword that ends it
+SECTION_ENDS = {
+    HEADER_START: HEADER_END,
+    PLACEMENT_START: PLACEMENT_END,
+    DRILL_START: DRILL_END,
+}
+SECTION_ENDS.update(zip(SHAPE_STARTS, SHAPE_ENDS))
+
+"""
+    Split an IDF record into fields, keeping quoted strings together and
+      removing their quotes.
+"""
+def splitFields(line):
+    return [field.strip('"') for field in IDF_FIELD.findall(line)]
+
+"""
+    An emnParser reads .emn data once, line by line, and hands each line
+      to the handler for the section it is in. Section keywords are
+      matched exactly against the first field of a line.
+
+    The data can come from any iterable of lines, so an open file handle
+      can be parsed without reading the whole file into memory first.
+
+    With lineNumbers, the data is an iterable of (line number, line) pairs
+      instead, and every part, shape and drill keeps the line it started on
+      so errors can point back into the file.
+"""
+class emnParser:
+    def __init__(self, columnar=False, lineNumbers=False):
+        self.columnar = columnar #store shape coordinates as arrays
+        self.lineNumbers = lineNumbers #data comes as (number, line) pairs
+        self.units = "" #A string with units (MM or THOU)
+        self.parts = partTable() #every part, a column per field
+        self.shapes = [] #A list of shape objects
+        self.drills = drillTable() #every drill, a column per field
+        self.errors = [] #A list of strings containing error messages
+        self.lineCount = 0 #lines fed through the parser
+
+        self._handlers = {
+            HEADER_START: self.readHeaderLine,
+            PLACEMENT_START: self.readPlacementLine,
+            DRILL_START: self.readDrillLine,
+        }
+        for keyword in SHAPE_STARTS:
+            self._handlers[keyword] = self.readShapeLine
+
+        self._section = None #start keyword of the section being read
+        self._sectionEnd = None #keyword that will end that section
+        self._lines = [] #lines of the current section, start and end included
+        self._records = [] #part or drill lines waiting to be decoded
+        self._recordLines = [] #and their line numbers, if kept
+        self._lineNumber = None #number of the line being read, if known
+        self._sectionLine = None #number of the current section's first line
+
+    """
+        Feed every line from lineSource through the parser.
+    """
+    def parse(self, lineSource):
+        if self.lineNumbers:
+            for lineNumber, line in lineSource:
+                self.feed(line, lineNumber)
+        else:
+            for line in lineSource:
+                self.feed(line)
+        self.close()
+
+    def feed(self, line, lineNumber=None):
+        self.lineCount += 1
+        self._lineNumber = lineNumber
+        fields = line.split(None, 1)
+        if not fields: #blank lines carry no data
+            return
+        keyword = fields[0]
+
+        if self._section is None:
+            #outside of a section, only section starts are interesting
+            if keyword in SECTION_ENDS:
+                self._section = keyword
+                self._sectionEnd = SECTION_ENDS[keyword]
+                self._lines = [line]
+                self._sectionLine = lineNumber
+        elif keyword == self._sectionEnd:
+            self._lines.append(line)
+            self.endSection()
+        else:
+            self._handlers[self._section](line)
+
+    def endSection(self):
+        if self._section in SHAPE_STARTS:
+            self.shapes.append(shape(self._lines, self.columnar,
+                                     self._sectionLine))
+        self.decodeRecords()
+
+        self._section = None
+        self._sectionEnd = None
+        self._lines = []
+
+    """
+        Decode the part or drill records read from the current section,
+          all at once. A part missing its second line is left out.
+    """
+    def decodeRecords(self):
+        lineNumbers = self._recordLines if self.lineNumbers else None
+        if self._section == PLACEMENT_START:
+            count = len(self._records) - len(self._records) % 2
+            self.parts.addLines(self._records[0:count:2],
+                                self._records[1:count:2],
+                                lineNumbers and lineNumbers[0:count:2])
+        elif self._section == DRILL_START:
+            self.drills.addLines(self._records, lineNumbers)
+        self._records = []
+        self._recordLines = []
+
+    """
+        Finish parsing and note anything the data never got around to.
+    """
+    def close(self):
+        if self._section is not None:
+            self.errors.append("%s section is never closed." % self._section)
+            self.decodeRecords()
+            self._section = None
+            self._sectionEnd = None
+            self._lines = []
+
+        if not self.units:
+            self.units = "ERROR"
+
+    #the header holds the file units
+    def readHeaderLine(self, line):
+        if not self.units:
+            if "THOU" in line:
+                self.units = "THOU"
+            elif "MM" in line:
+                self.units = "MM"
+
+    #the placement section holds 2 lines per part and the drilled holes
+    #  section 1 line per drill, decoded when the section ends
+    def readPlacementLine(self, line):
+        self._records.append(line)
+        if self.lineNumbers:
+            self._recordLines.append(self._lineNumber)
+
+    readDrillLine = readPlacementLine
+
+    #shapes keep all of their lines
+    def readShapeLine(self, line):
+        self._lines.append(line)
+
+"""
+    A coordTable holds the coordinates of every shape on a board in one
+      contiguous float array, 4 values ([cutout,x,y,arc]) per vertex.
+
+    loopStarts holds the vertex index where each outline or cutout loop
+      starts, plus one last entry where the final loop ends. shapeLoops
+      does the same for the loops of each shape, so the loops of shape k
+      are shapeLoops[k] up to (not including) shapeLoops[k+1].
+"""
+class coordTable:
+    def __init__(self, shapes):
+        self.coords = array('d')
+        self.loopStarts = array('l', [0])
+        self.shapeLoops = array('l', [0])
+
+        for currentShape in shapes:
+            vertexBase = len(self.coords) // 4
+            if currentShape.coordArray is not None: #columnar shapes
+                self.coords.extend(currentShape.coordArray)
+                self.loopStarts.extend(
+                    vertexBase + i for i in currentShape.loopStarts[1:])
+            else:
+                for loop in currentShape.coordinates:
+                    self.coords.extend(itertools.chain.from_iterable(loop))
+                    self.loopStarts.append(len(self.coords) // 4)
+            self.shapeLoops.append(len(self.loopStarts) - 1)
+
+    #first vertex and end vertex of a shape
+    def shapeVertices(self, shapeIndex):
+        return (self.loopStarts[self.shapeLoops[shapeIndex]],
+                self.loopStarts[self.shapeLoops[shapeIndex + 1]])
+
+    #loop indexes that belong to a shape, outline first
+    def shapeLoopRange(self, shapeIndex):
+        return range(self.shapeLoops[shapeIndex],
+                     self.shapeLoops[shapeIndex + 1])
+
+    #first vertex and end vertex of a loop
+    def loopVertices(self, loopIndex):
+        return self.loopStarts[loopIndex], self.loopStarts[loopIndex + 1]
+
+    #every x value, in vertex order
+    def xValues(self):
+        return self.coords[1::4]
+
+    #every y value, in vertex order
+    def yValues(self):
+        return self.coords[2::4]
+
 """
     An emnObj is used to store and manipulate data contained in a .emn file.
     
@@ -61,149 +335,338 @@ SHAPE_ENDS = (
       -checking that all parts to be placed exist in the library
       -checking that all coordinates are in positive space
       -checking that arcs don't come together at an infinitesimal angle
+      -checking that outlines and cutouts don't cross themselves or each
+        other, and that cutouts are inside their outline
       -checking that IDF data exists at all
+      -checking that the file has units
+      -checking that drills don't overlap or crowd each other
+      -checking that drills and parts aren't inside keepouts
+      -checking that parts fit under height limits and on the board
+        (when a .emp library of component outlines is available)
 """
 class emnObj:
-    def __init__(self, currentData, fname):
-        self._emnData = currentData #save the emn data (list of strings)
+    def __init__(self, currentData, fname, columnar=False, lineNumbers=False,
+                 sink=None, keepErrors=True):
         self.fileName = fname
-        self.parts = self.getParts() #A list of part objects
-        self.shapes = self.getShapes() #A list of shape objects
         self.errors = [] #A list of strings containing error messages
-        self.units = self.getUnits() #A string with units (MM or THOU)
-        self.drills = self.getDrills() #A list of drill objects
+        self.errorCount = 0 #errors found, kept or not
+        self.sink = sink #gets an errorSink.errorRecord for every error
+        self.keepErrors = keepErrors #whether errors go in self.errors too
+        self.currentCheck = None #name of the check being run, for records
+        #check name -> keys (see entityKey) of the entities it reported,
+        #  so the next revision of the board knows what to look at again
+        self.errorKeys = {} if keepErrors else None
+        self.checkedLibrary = None #parts library the last run checked with
+        self.checkedComponents = None #component outlines it checked with
+        self.columnar = columnar #store shape coordinates as arrays
+        self.lineNumbers = lineNumbers #keep the line every entity came from
+        self._coordTable = None #built the first time a check needs it
+        self.checkTimes = [] #(check name, seconds, errors found) per check
+        self.sectionTimes = {} #section -> seconds spent parsing it
+        self.lineCount = 0 #lines parsed so far
+
+        #parts, shapes, units and drills are parsed when first used
+        self._parts = None
+        self._shapes = None
+        self._units = None
+        self._drills = None
+
+        #an emnReader can hand out one section at a time, so each section
+        #  waits until something asks for it. Lists of lines and open file
+        #  handles can only be read once, so they're parsed right away.
+        if hasattr(currentData, "sections"):
+            self._reader = currentData
+            self.path = currentData.path #where the file is, for companions
+        else:
+            self._reader = None
+            self.path = None
+            if lineNumbers:
+                currentData = enumerate(currentData, 1)
+            parser = self.parseSections(currentData)
+            self._parts = parser.parts
+            self._shapes = parser.shapes
+            self._units = parser.units
+            self._drills = parser.drills
 
     def __str__(self):
         return self.fileName
 
-   """
-        Read through the placement section to get a list of parts to be placed.
-        Part data is stored in "part" objects.
-   """
-    def getParts(self):
-        partsRange = False
-        currentPart = ""
-        partList = []
-        partLines = ["",""] 
-        firstLine = True
-        
-        for line in self._emnData:
-            if PLACEMENT_END in line:
-                partsRange = False
-            
-            #grab every set of 2 lines in the placement section and make a part
-            if partsRange:
-                if firstLine: #the first line holds name and refdes
-                    partLines[0] = line
-                    firstLine = False
-                else: #the second line holds position, side and orientation.
-                    partLines[1] = line
-                    partList.append(part(partLines))
-                    firstLine = True
-            
-            #no useful data lives in the placement header
-            if PLACEMENT_START in line:
-                partsRange = True
+    #A list of part objects
+    @property
+    def parts(self):
+        if self._parts is None:
+            self._parts = self.readSections((PLACEMENT_START,)).parts
+        return self._parts
+
+    #A list of shape objects
+    @property
+    def shapes(self):
+        if self._shapes is None:
+            self._shapes = self.readSections(SHAPE_STARTS).shapes
+        return self._shapes
+
+    #A string with units (MM or THOU, or ERROR if there aren't any)
+    @property
+    def units(self):
+        if self._units is None:
+            self._units = self.readSections((HEADER_START,)).units
+        return self._units
 
-        return partList
+    #A list of drill objects
+    @property
+    def drills(self):
+        if self._drills is None:
+            self._drills = self.readSections((DRILL_START,)).drills
+        return self._drills
 
     """
-        Read the file header and store the file units.
+        Parse some sections out of the emnReader.
     """
-    def getUnits(self):
-        boardUnits = ""
+    def readSections(self, keywords):
+        if self.lineNumbers:
+            return self.parseSections(self._reader.numberedLines(keywords))
+        return self.parseSections(self._reader.lines(keywords))
 
-        #read until you find units or the header ends
-        for line in self._emnData:
-            if "THOU" in line:
-                boardUnits = "THOU"
-                break
-            elif "MM" in line:
-                boardUnits = "MM"
-                break
+    """
+        Run lines through an emnParser, keeping any errors it found.
+    """
+    def parseSections(self, lines):
+        parser = emnParser(self.columnar, self.lineNumbers)
+        parser.parse(lines)
+        for message in parser.errors:
+            self.addError(message, check="parse")
+        self.lineCount += parser.lineCount
+        return parser
+
+    """
+        Count the entities in the sections parsed so far. Sections that
+          haven't been parsed are left out rather than parsed now.
+    """
+    def getCounts(self):
+        counts = {"lines": self.lineCount}
+        if self._parts is not None:
+            counts["parts"] = len(self._parts)
+        if self._drills is not None:
+            counts["drills"] = len(self._drills)
+        if self._shapes is not None:
+            counts["shapes"] = len(self._shapes)
+            if self._coordTable is not None:
+                counts["vertices"] = len(self._coordTable.coords) // 4
             else:
-                boardUnits = "ERROR"
+                counts["vertices"] = sum(len(loop)
+                    for currentShape in self._shapes
+                    for loop in currentShape.coordinates)
+        return counts
+
+    """
+        Let go of the emnReader. Sections that haven't been parsed yet
+          can't be parsed after this.
+    """
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+
+    """
+        Get every shape coordinate on the board in one coordTable.
+    """
+    def getCoordTable(self):
+        if self._coordTable is None:
+            self._coordTable = coordTable(self.shapes)
+        return self._coordTable
 
-            if HEADER_END in line:
-                self.errors.append("Could not find units in file")
-                break
+    #error checking suite
+    def checkAllErrors(self, partsLibrary, include=None, exclude=None,
+                       componentLibrary=None):
+        self.runChecks(selectChecks(include, exclude), partsLibrary,
+                       componentLibrary)
+
+    """
+        Run (name, needs) checks from the registry. The sections each check
+          needs are parsed before it starts, so parse time (sectionTimes)
+          and check time (checkTimes) are recorded separately.
+          checkTimes holds (name, seconds, errors found) for each check.
+          Library checks are skipped when there is no library, and
+          component checks when there is no componentLibrary.
 
-        return boardUnits
+          partsLibrary can be a libIndex.libraryLoader that is still
+          loading; it is only waited on when the first check that needs
+          the library is about to run, and the wait is recorded in
+          sectionTimes under "library".
 
+          previous can be the emnObj of an earlier revision of the same
+          board that was checked with keepErrors on. Checks that look at
+          one entity at a time are then only run on the entities that
+          changed since, plus the ones they reported last time (see
+          emnDiff), which finds the same errors in the same order as a
+          full run. The diff is recorded in sectionTimes under "diff".
     """
-        Read through the emn data and build shape objects for each shape.
+    def runChecks(self, checks, partsLibrary=None, componentLibrary=None,
+                  previous=None):
+        self.checkTimes = []
+        self.sectionTimes = {}
+        self.checkedComponents = componentLibrary
+        diff = None
+        if previous is not None and previous.errorKeys is None:
+            previous = None
+
+        for name, needs in checks:
+            if ("library" in needs) and ("library" not in self.sectionTimes):
+                startTime = time.perf_counter()
+                partsLibrary = libIndex.waitForLibrary(partsLibrary)
+                self.checkedLibrary = partsLibrary
+                self.sectionTimes["library"] = (time.perf_counter() -
+                                                startTime)
+            if ("library" in needs) and not partsLibrary:
+                continue
+            if ("components" in needs) and not componentLibrary:
+                continue
+
+            for section in needs:
+                if (section not in ("library", "components") and
+                    section not in self.sectionTimes):
+                    startTime = time.perf_counter()
+                    getattr(self, section)
+                    self.sectionTimes[section] = (time.perf_counter() -
+                                                  startTime)
+
+            target = self
+            if previous is not None and name in emnDiff.CHECK_SUBJECTS:
+                if diff is None:
+                    startTime = time.perf_counter()
+                    diff = emnDiff.boardDiff(previous, self)
+                    self.sectionTimes["diff"] = (time.perf_counter() -
+                                                 startTime)
+                plan = emnDiff.planCheck(name, needs, previous, self, diff,
+                                         partsLibrary, componentLibrary)
+                if plan is not None:
+                    target = self.subBoard(plan.get("parts"),
+                                           plan.get("shapes"),
+                                           plan.get("drills"))
+
+            errorCount = self.errorCount
+            startTime = time.perf_counter()
+            target.runCheck(name, needs, partsLibrary, componentLibrary)
+            if target is not self:
+                self.mergeErrors(target, name)
+            self.checkTimes.append((name, time.perf_counter() - startTime,
+                                    self.errorCount - errorCount))
+
+    #run one check on this board, giving it the library it needs
+    def runCheck(self, name, needs, partsLibrary=None, componentLibrary=None):
+        self.currentCheck = name
+        if self.errorKeys is not None:
+            self.errorKeys[name] = set()
+        if "library" in needs:
+            getattr(self, name)(partsLibrary)
+        elif "components" in needs:
+            getattr(self, name)(componentLibrary)
+        else:
+            getattr(self, name)()
+        self.currentCheck = None
+
     """
-    def getShapes(self):
-        shapeList = []
-        currentLines = []
-        coordRange = False
+        Make an emnObj with only some of this board's parts, shapes and
+          drills, given as lists of indexes in board order (None keeps the
+          whole section). Its errors go to the same sink; mergeErrors
+          brings the rest of them back.
+    """
+    def subBoard(self, partIndexes=None, shapeIndexes=None,
+                 drillIndexes=None):
+        sub = emnObj([], self.fileName, self.columnar, self.lineNumbers,
+                     self.sink, self.keepErrors)
+        sub.path = self.path
+        sub._units = self.units
+        sub._parts = self.parts
+        if partIndexes is not None:
+            sub._parts = self.parts.subset(partIndexes)
+        sub._shapes = self.shapes
+        if shapeIndexes is not None:
+            sub._shapes = [self.shapes[i] for i in shapeIndexes]
+        sub._drills = self.drills
+        if drillIndexes is not None:
+            sub._drills = self.drills.subset(drillIndexes)
+        return sub
 
-        for line in self._emnData: 
-            #find shape starts
-            for keyword in SHAPE_STARTS:
-                if keyword in line:
-                    coordRange = True
-            
-            #after a shape starts, start putting its data in a list
-            if coordRange == True: 
-                currentLines.append(line)
-            
-            #once a shape ends, make an object from its data
-            for keyword in SHAPE_ENDS:
-                if keyword in line:
-                    shapeList.append(shape(currentLines))
-                    currentLines = []
-                    coordRange = False
-        
-        return shapeList
+    #take on the errors a check found on a subBoard
+    def mergeErrors(self, sub, name):
+        self.errors.extend(sub.errors)
+        self.errorCount += sub.errorCount
+        if self.errorKeys is not None:
+            self.errorKeys[name] = sub.errorKeys[name]
 
     """
-        
+        Report an error. The message goes in self.errors (unless keepErrors
+          is off) and, when there is a sink, an errorRecord goes to the sink
+          straight away. entity is the shape, part or drill the error is
+          about, if any; its kind, position and line go in the record.
+          related is another entity the error is about too (the other
+          drill of a pair), which the next revision has to look at again.
     """
-    def getDrills(self):
-        drillList = []
-        drillRange = False
-        
-        for line in self._emnData:
-            if DRILL_END in line:
-                drillRange = False
-            if drillRange == True:
-                drillList.append(drill(line))
-            if DRILL_START in line:
-                drillRange = True            
+    def addError(self, message, entity=None, severity="error",
+                 coordinates=None, check=None, related=None):
+        self.errorCount += 1
+        if self.keepErrors:
+            self.errors.append(message)
+        if self.errorKeys is not None and check is None:
+            keys = self.errorKeys.get(self.currentCheck)
+            if keys is not None:
+                for reported in (entity, related):
+                    if reported is not None:
+                        keys.add(entityKey(reported))
+        if self.sink is None:
+            return
 
-        return drillList
+        entityType = None
+        line = None
+        if entity is not None:
+            entityType = type(entity).__name__
+            line = entity.lineNumber
+            if coordinates is None:
+                if isinstance(entity, shape):
+                    outline = entity.outline
+                    if outline:
+                        coordinates = (outline[0][1], outline[0][2])
+                else:
+                    coordinates = tuple(entity.coordinates[:2])
+        self.sink.emit(errorSink.errorRecord(
+            self.fileName, check or self.currentCheck, severity, message,
+            entityType, coordinates, line))
 
-    #error checking suite
-    def checkAllErrors(self, partsLibrary):
-        self.checkHeightErrors()
-        self.checkNegErrors()
-        self.checkClosedErrors()
-        self.checkRefDesErrors()
-        self.checkRoundCutout()
-        self.checkEmpty()
-        self.checkArcAngle()
-        if(partsLibrary):
-            self.checkLibErrors(partsLibrary)
-
-    #see if parts are in the library
+    #see if parts are in the library (a libIndex)
     def checkLibErrors(self, partsLibrary):
         circFlag = False
         for part in self.parts:
             invCharFlag = False
             if ('_' in part.name) or ('^' in part.name) or ('_cc' in part.name):
                 fmt = (part.name,part.refDes)
-                self.errors.append(
-                    "{0} ({1}) has invalid characters".format(fmt[0],fmt[1]) +
-                    " in its part name.")
+                errStr = ("{0} ({1}) has invalid characters".format(fmt[0],fmt[1])
+                          + " in its part name.")
+                #the part may be in the library under its real characters
+                match = partsLibrary.flaggedMatch(part.name.upper())
+                if match:
+                    errStr += (" Apart from them it matches library part %s." %
+                               match)
+                self.addError(errStr, part)
                 invCharFlag = True
                 circFlag = True
-            if (part.name.upper() not in partsLibrary) and not invCharFlag:
-                self.errors.append(part.name + " not found in parts library")
+            partNumber = part.name.upper()
+            if (partNumber not in partsLibrary) and not invCharFlag:
+                libFile = partsLibrary.expectedSource(partNumber)
+                if libFile:
+                    errStr = (part.name + " not found in parts " +
+                              "library (expected in %s)" % libFile)
+                else:
+                    errStr = part.name + " not found in parts library"
+                #library part numbers it could be a typo or revision of
+                suggestions = partsLibrary.suggestions(partNumber)
+                if suggestions:
+                    errStr += ", closest: " + ", ".join(suggestions)
+                self.addError(errStr, part)
 
         if circFlag:
-            self.errors.append("Part names with invalid characters were " +
-                "detected. Please check CircuitWorks settings.")
+            self.addError("Part names with invalid characters were " +
+                "detected. Please check CircuitWorks settings.",
+                severity="warning")
             
         return
 
@@ -224,130 +687,430 @@ class emnObj:
                 heightError = True
                 heightFlag = True
             if heightError:
-                self.errors.append(currentShape.__str__() + 
-                    " is too short to be checked in Board Modeler Lite.")
+                self.addError(currentShape.__str__() + 
+                    " is too short to be checked in Board Modeler Lite.",
+                    currentShape)
         if heightFlag:
-            self.errors.append("Recommend using .PLACE_KEEPOUT instead" + 
-                " of zero-height placement areas.")
+            self.addError("Recommend using .PLACE_KEEPOUT instead" + 
+                " of zero-height placement areas.", severity="warning")
                     
     def checkNegErrors(self):
-        for currentShape in self.shapes:
-            negShape = False
-            for coordList in currentShape.coordinates:
-                for coord in coordList:
-                    if (coord[1] < 0) or (coord[2] < 0):
-                        negShape = True
-            if negShape:
-                self.errors.append(currentShape.__str__() +
-                    " has coordinates in negative X,Y space.")
+        table = self.getCoordTable()
+        xValues = table.xValues()
+        yValues = table.yValues()
 
-        for currentPart in self.parts:
-            if ((currentPart.coordinates[0] < 0) or 
-                (currentPart.coordinates[1] < 0)):
-                self.errors.append("Part " + currentPart.__str__() +
-                    " is in negative X,Y space.")
+        #only look shape by shape if something on the board is negative
+        if xValues and (min(xValues) < 0 or min(yValues) < 0):
+            for i, currentShape in enumerate(self.shapes):
+                start, end = table.shapeVertices(i)
+                if (end > start) and ((min(xValues[start:end]) < 0) or
+                                      (min(yValues[start:end]) < 0)):
+                    self.addError(currentShape.__str__() +
+                        " has coordinates in negative X,Y space.",
+                        currentShape)
 
-        for currentDrill in self.drills:
-            if ((currentDrill.coordinates[0] < 0) or 
-                (currentDrill.coordinates[1] < 0)):
-                self.errors.append(currentDrill.__str__() +
-                    " is in negative X,Y space.")
+        #parts and drills are checked column by column, and only looked
+        #  at one by one if a column has something negative in it
+        parts = self.parts
+        if parts.xs and (min(parts.xs) < 0 or min(parts.ys) < 0):
+            for i, (x, y) in enumerate(zip(parts.xs, parts.ys)):
+                if (x < 0) or (y < 0):
+                    self.addError("Part " + parts[i].__str__() +
+                        " is in negative X,Y space.", parts[i])
+
+        drills = self.drills
+        if drills.xs and (min(drills.xs) < 0 or min(drills.ys) < 0):
+            for i, (x, y) in enumerate(zip(drills.xs, drills.ys)):
+                if (x < 0) or (y < 0):
+                    self.addError(drills[i].__str__() +
+                        " is in negative X,Y space.", drills[i])
 
     def checkClosedErrors(self):
-        for currentShape in self.shapes:
-            toCheck = []
-            toCheck.append(currentShape.outline)
-            if(currentShape.cutouts):
-                for cutout in currentShape.cutouts:
-                    toCheck.append(cutout)
-
-            for s in toCheck:
-                if (len(s) >= 3) and (s[0][:3] != s[-1][:3]):
-                    if s[0][0] == 0:
-                        self.errors.append(currentShape.__str__() + 
-                            " is not a closed shape.")
+        table = self.getCoordTable()
+        coords = table.coords
+
+        for i, currentShape in enumerate(self.shapes):
+            for loop in table.shapeLoopRange(i):
+                start, end = table.loopVertices(loop)
+                first = start * 4
+                last = (end - 1) * 4
+                if ((end - start >= 3) and
+                    (coords[first:first+3] != coords[last:last+3])):
+                    if coords[first] == 0:
+                        self.addError(currentShape.__str__() + 
+                            " is not a closed shape.", currentShape)
                     else:
                         errStr = (currentShape.__str__() + 
                             " has a cutout at [%.2f,%.2f]" % 
-                            (s[0][1],s[0][2]) + 
+                            (coords[first+1],coords[first+2]) + 
                             " that is not a closed shape.")
-                        self.errors.append(errStr)
-                elif (len(s) == 2) and (s[1][3] != 360):
-                    self.errors.append(currentShape.__str__() + 
-                            " is not a closed shape.")
+                        self.addError(errStr, currentShape,
+                            coordinates=(coords[first+1], coords[first+2]))
+                elif (end - start == 2) and (coords[last+3] != 360):
+                    self.addError(currentShape.__str__() + 
+                            " is not a closed shape.", currentShape)
+
     def checkRefDesErrors(self):
         for part in self.parts:
             if part.refDes[0] == "R":
-                self.errors.append(part.__str__() + " has an \'R' " +
-                    "reference designator.")
+                self.addError(part.__str__() + " has an \'R' " +
+                    "reference designator.", part)
 
     def checkRoundCutout(self):
-        toCheck = []
-        for currentShape in self.shapes:
-            toCheck = []
-            if(currentShape.cutouts):
-                for cutout in currentShape.cutouts:
-                    toCheck.append(cutout)
-
-        for s in toCheck:
-            if(len(s) == 2) and (s[1][3] == 360):
-                errStr = (currentShape.__str__() + 
-                            " has a cutout at [%.2f,%.2f]" % 
-                            (s[0][1],s[0][2]) + 
-                            " that is circular.")
-                self.errors.append(errStr)
+        table = self.getCoordTable()
+        coords = table.coords
+
+        for i, currentShape in enumerate(self.shapes):
+            for loop in table.shapeLoopRange(i)[1:]: #skip the outline
+                start, end = table.loopVertices(loop)
+                if (end - start == 2) and (coords[(end - 1) * 4 + 3] == 360):
+                    errStr = (currentShape.__str__() + 
+                                " has a cutout at [%.2f,%.2f]" % 
+                                (coords[start*4+1],coords[start*4+2]) + 
+                                " that is circular.")
+                    self.addError(errStr, currentShape, coordinates=
+                                  (coords[start*4+1], coords[start*4+2]))
 
     '''
     check for acute arc vertexes:
         this check looks at each end of a curve and determines whether
         its tangent forms an infinitesimal angle with the tangent of the
         next line or curve.
+
+        every loop on the board is checked at once: the neighbouring
+        vertexes of each point are gathered into flat sequences, then
+        each step of the angle math is mapped over all of them together.
     '''
     def checkArcAngle(self):
+        table = self.getCoordTable()
+        xValues = table.xValues()
+        yValues = table.yValues()
+        arcValues = table.coords[3::4]
+
+        #vertex indexes of point 0, 1 and 2 for every point in every loop
+        prev2, prev1, current = [], [], []
+        for loop in range(len(table.loopStarts) - 1):
+            start, end = table.loopVertices(loop)
+            start += 1 #first/last point are equal, or you have other issues.
+            count = end - start
+            if count > 2: #any arc definition requires 3 points
+                #python's wraparound indexing of s[i-2] and s[i-1]
+                prev2.extend((end - 2, end - 1))
+                prev2.extend(range(start, end - 2))
+                prev1.append(end - 1)
+                prev1.extend(range(start, end - 1))
+                current.extend(range(start, end))
+
+        #if we don't have any arcs, skip these
+        hasArc = [bool(a or b) for a, b in zip(
+            map(arcValues.__getitem__, prev1),
+            map(arcValues.__getitem__, current))]
+        prev2 = list(itertools.compress(prev2, hasArc))
+        prev1 = list(itertools.compress(prev1, hasArc))
+        current = list(itertools.compress(current, hasArc))
+        if not current:
+            return
+
+        x0 = list(map(xValues.__getitem__, prev2))
+        y0 = list(map(yValues.__getitem__, prev2))
+        x1 = list(map(xValues.__getitem__, prev1))
+        y1 = list(map(yValues.__getitem__, prev1))
+        x2 = map(xValues.__getitem__, current)
+        y2 = map(yValues.__getitem__, current)
+        phi0 = map(math.radians, map(arcValues.__getitem__, prev1))
+        phi1 = map(math.radians, map(arcValues.__getitem__, current))
+
+        #angle from point 1 to point 0 or 2
+        alpha0 = map(math.atan2, map(operator.sub, y0, y1),
+                                 map(operator.sub, x0, x1))
+        alpha1 = map(math.atan2, map(operator.sub, y2, y1),
+                                 map(operator.sub, x2, x1))
+
+        #get positive angles from negative angles from atan2
+        tau = itertools.repeat(math.tau)
+        alpha0 = map(math.fmod, map(math.tau.__add__, alpha0), tau)
+        alpha1 = map(math.fmod, map(math.tau.__add__, alpha1), tau)
+
+        #angle of tangent of each arc at point 1
+        two = itertools.repeat(2)
+        beta0 = map(operator.add, alpha0, map(operator.truediv, phi0, two))
+        beta1 = map(operator.sub, alpha1, map(operator.truediv, phi1, two))
+
+        delta = map(math.fabs, map(operator.sub, beta1, beta0))
+        delta = list(map(math.fmod, delta, tau))
+
+        nearZero = map(functools.partial(math.isclose, b=0,
+                                         rel_tol=0.01, abs_tol=0.01), delta)
+        nearTau = map(functools.partial(math.isclose, b=math.tau,
+                                        rel_tol=0.01, abs_tol=0.01), delta)
+        for i, flagged in enumerate(map(operator.or_, nearZero, nearTau)):
+            if flagged:
+                self.addError("Infinitesimal arc intersection" + 
+                              " found at [%.2f,%.2f]" % (x1[i],y1[i]),
+                              coordinates=(x1[i], y1[i]))
+
+    """
+        Look for outlines and cutouts that cross (or touch) themselves,
+          cutouts that cross their shape's outline or each other, and
+          cutouts that sit outside their outline or inside another cutout.
+
+        Arcs are split into straight edges within ARC_TOLERANCE of them
+          and every loop of a shape is swept at once (see
+          spatialIndex.loopCrossings), so a shape with tens of thousands
+          of edges costs about as much as sorting them.
+    """
+    def checkLoopCrossings(self):
+        tolerance = ARC_TOLERANCE.get(self.units, ARC_TOLERANCE["MM"])
+        for currentShape in self.shapes:
+            coordinates = [loop for loop in currentShape.coordinates if loop]
+            if not coordinates:
+                continue
+            loops = [spatialIndex.flattenLoop(loop, tolerance)
+                     for loop in coordinates]
+            starts = ["[%.2f,%.2f]" % (loop[0][1], loop[0][2])
+                      for loop in coordinates]
+
+            crossed = set() #loops that cross something
+            reported = set()
+            for loopA, loopB, x, y in sorted(
+                    spatialIndex.loopCrossings(loops)):
+                crossed.update((loopA, loopB))
+                if loopA == loopB == 0:
+                    errStr = " crosses itself"
+                elif loopA == loopB:
+                    errStr = (" has a cutout at %s that crosses itself" %
+                              starts[loopA])
+                elif loopA == 0:
+                    errStr = (" has a cutout at %s that crosses its " %
+                              starts[loopB] + "outline")
+                else:
+                    errStr = (" has cutouts at %s and %s that overlap" %
+                              (starts[loopA], starts[loopB]))
+                errStr = (currentShape.__str__() + errStr +
+                          " at [%.2f,%.2f]." % (x, y))
+                if errStr not in reported: #one edge split by an arc
+                    reported.add(errStr)
+                    self.addError(errStr, currentShape, coordinates=(x, y))
+
+            self.checkCutoutPlacement(currentShape, loops, starts, crossed)
+
+    """
+        Look for cutouts that don't cross anything but are outside their
+          outline, or inside another cutout, for checkLoopCrossings.
+    """
+    def checkCutoutPlacement(self, currentShape, loops, starts, crossed):
+        whole = [i for i in range(1, len(loops))
+                 if i not in crossed and len(loops[i]) >= 4]
+        if not whole:
+            return
+        outline = loops[0]
+        for i in whole:
+            x, y = loops[i][0][1], loops[i][0][2]
+            if (len(outline) >= 4 and
+                not spatialIndex.pointInPolygon(x, y, outline)):
+                self.addError(currentShape.__str__() + " has a cutout at " +
+                    "%s outside its outline." % starts[i], currentShape,
+                    coordinates=(x, y))
+
+        #cutouts are only tested against the ones whose boxes hold them
+        bounds = [spatialIndex.loopsBounds([loops[i]]) for i in whole]
+        grid = spatialIndex.gridIndex(spatialIndex.chooseCellSize(
+            max(b[2] for b in bounds) - min(b[0] for b in bounds),
+            max(b[3] for b in bounds) - min(b[1] for b in bounds),
+            len(whole)))
+        for k, box in enumerate(bounds):
+            grid.insert(k, *box)
+        for k, i in enumerate(whole):
+            x, y = loops[i][0][1], loops[i][0][2]
+            for other in sorted(grid.queryPoint(x, y)):
+                box = bounds[other]
+                if (other != k and box[0] <= x <= box[2] and
+                    box[1] <= y <= box[3] and
+                    spatialIndex.pointInPolygon(x, y, loops[whole[other]])):
+                    self.addError(currentShape.__str__() + " has a " +
+                        "cutout at %s inside the cutout at %s." %
+                        (starts[i], starts[whole[other]]), currentShape,
+                        coordinates=(x, y))
+
+    """
+        Look for drills that overlap, or whose edges are closer than
+          DRILL_CLEARANCE. Each drill goes in a grid with its own box,
+          grown by the clearance, so it is only compared to the drills
+          whose boxes it touches. Cells are sized for a typical drill, so
+          one big tooling hole doesn't make every cell hold half the board.
+    """
+    def checkDrillClearance(self):
+        drills = self.drills
+        if len(drills) < 2:
+            return
+        clearance = DRILL_CLEARANCE.get(self.units, 0.0)
+        xs, ys, diameters = drills.xs, drills.ys, drills.diameters
+
+        #a cell is at least a typical drill and its clearance, and big
+        #  enough that the biggest drill spans no more than 64 cells a side
+        typicalReach = sorted(diameters)[len(diameters) // 2] + clearance
+        cellSize = spatialIndex.chooseCellSize(max(xs) - min(xs),
+            max(ys) - min(ys), len(drills),
+            max(typicalReach, (max(diameters) + 2 * clearance) / 64))
+        grid = spatialIndex.gridIndex(cellSize)
+        for i, (x, y, diameter) in enumerate(zip(xs, ys, diameters)):
+            reach = diameter / 2 + clearance
+            grid.insert(i, x - reach, y - reach, x + reach, y + reach)
+
+        for i, (x, y, diameter) in enumerate(zip(xs, ys, diameters)):
+            radius = diameter / 2
+            for j in sorted(grid.queryBox(x - radius, y - radius,
+                                          x + radius, y + radius)):
+                if j <= i: #each pair once
+                    continue
+                gap = (math.hypot(xs[j] - x, ys[j] - y) -
+                       (diameter + diameters[j]) / 2)
+                if gap < 0:
+                    self.addError(drills[i].__str__() +
+                        " overlaps " + drills[j].__str__() + ".", drills[i],
+                        related=drills[j])
+                elif gap < clearance:
+                    self.addError(drills[i].__str__() +
+                        " is closer than %.2f %s to " % (clearance, self.units)
+                        + drills[j].__str__() + ".", drills[i],
+                        related=drills[j])
+
+    """
+        Get a gridIndex of the shapes of some types, plus a list of
+          (shape, bounding box) that its item ids point into.
+    """
+    def getShapeGrid(self, sTypes):
+        found = []
         for currentShape in self.shapes:
-            toCheck = []
-            toCheck.append(currentShape.outline) #get shape outlines
-            if(currentShape.cutouts):
-                for cutout in currentShape.cutouts:
-                    toCheck.append(cutout)  #and cutout outlines
-            for s in toCheck:
-                s = s[1:] #first/last point are equal, or you have other issues.
-                if len(s) > 2: #any arc definition requires 3 points
-                    for i in range(len(s)):
-                        alpha0, alpha1 = 0,0  #angle from point 1 to point 0 or 2
-                        beta0, beta1 = 0,0    #angle of tangent of each arc at point 1
-                        phi0 = s[i-1][3]  #arc angle from point 0 to 1
-                        phi1 = s[i][3]    #arc angle from point 1 to 2
-
-                        #if we don't have any arcs, skip these
-                        if phi0 or phi1:
-                            phi0 = math.radians(phi0)
-                            phi1 = math.radians(phi1)
-                            
-                            alpha0 = math.atan2(s[i-2][2]-s[i-1][2],
-                                                s[i-2][1]-s[i-1][1])
-                            alpha1 = math.atan2(s[i][2]-s[i-1][2],
-                                                s[i][1]-s[i-1][1])
-
-                            #get positive angles from negative angles from atan2
-                            alpha0 = math.fmod((alpha0 + math.tau),math.tau)
-                            alpha1 = math.fmod((alpha1 + math.tau),math.tau)
-
-                            beta0 = alpha0 + (phi0/2)
-                            beta1 = alpha1 - (phi1/2)
-
-                            delta = math.fabs(beta1-beta0)
-                            delta = math.fmod(delta,math.tau)
-
-                            if math.isclose(delta,0,rel_tol=0.01,abs_tol=0.01) or \
-                                math.isclose(delta,math.tau,rel_tol=0.01,abs_tol=0.01):
-                                self.errors.append("Infinitesimal arc intersection" + 
-                                                    " found at [%.2f,%.2f]" %
-                                                    (s[i-1][1],s[i-1][2]))
+            if currentShape.sType in sTypes:
+                bounds = spatialIndex.loopsBounds(currentShape.coordinates)
+                if bounds:
+                    found.append((currentShape, bounds))
+        if not found:
+            return None, found
+
+        minX = min(bounds[0] for s, bounds in found)
+        minY = min(bounds[1] for s, bounds in found)
+        maxX = max(bounds[2] for s, bounds in found)
+        maxY = max(bounds[3] for s, bounds in found)
+        grid = spatialIndex.gridIndex(spatialIndex.chooseCellSize(
+            maxX - minX, maxY - minY, len(found)))
+        for i, (currentShape, bounds) in enumerate(found):
+            grid.insert(i, *bounds)
+        return grid, found
+
+    #find the shapes in a getShapeGrid result that contain a point
+    def shapesAtPoint(self, grid, found, x, y):
+        for i in grid.queryPoint(x, y):
+            currentShape, bounds = found[i]
+            if ((bounds[0] <= x <= bounds[2]) and (bounds[1] <= y <= bounds[3])
+                and spatialIndex.pointInLoops(x, y, currentShape.coordinates)):
+                yield currentShape
+
+    #look for drills inside placement or via keepouts
+    def checkDrillKeepouts(self):
+        grid, keepouts = self.getShapeGrid(
+            (PLACE_KEEPOUT_START, VIA_KEEPOUT_START))
+        if not keepouts:
+            return
+
+        for currentDrill in self.drills:
+            x, y = currentDrill.coordinates
+            for keepout in self.shapesAtPoint(grid, keepouts, x, y):
+                self.addError(currentDrill.__str__() + " is inside " +
+                    keepout.__str__() + ".", currentDrill)
+
+    #look for parts placed inside placement keepouts on their side
+    def checkPartKeepouts(self):
+        grid, keepouts = self.getShapeGrid((PLACE_KEEPOUT_START,))
+        if not keepouts:
+            return
+
+        for currentPart in self.parts:
+            x, y = currentPart.coordinates[0], currentPart.coordinates[1]
+            for keepout in self.shapesAtPoint(grid, keepouts, x, y):
+                if keepout.layer in (currentPart.side, "BOTH"):
+                    self.addError("Part " + currentPart.__str__() +
+                        " is inside " + keepout.__str__() + ".", currentPart)
+
+    """
+        Look for parts taller than the .PLACE_OUTLINE height limit they
+          are placed in, on their side of the board. A part counts as in
+          an area if its placed outline overlaps it, or, without an
+          outline, if its origin is in it. Arcs of both are followed to
+          within ARC_TOLERANCE.
+    """
+    def checkPartHeights(self, componentLibrary):
+        grid, areas = self.getShapeGrid((PLACE_OUTLINE_START,))
+        if not areas:
+            return
+        tolerance = ARC_TOLERANCE.get(self.units, ARC_TOLERANCE["MM"])
+        areaEdges = {} #area number -> spatialIndex.loopEdges, when needed
+
+        for currentPart in self.parts:
+            component = componentLibrary.getComponent(currentPart)
+            if component is None:
+                continue
+            height = componentLibrary.heightIn(component, self.units)
+            outline = componentLibrary.placedOutline(currentPart, self.units,
+                                                     tolerance)
+
+            tooTall = []
+            if outline is None:
+                x, y = currentPart.coordinates[0], currentPart.coordinates[1]
+                tooTall.extend(self.shapesAtPoint(grid, areas, x, y))
+            else:
+                box = spatialIndex.loopsBounds(outline)
+                for i in sorted(grid.queryBox(*box)):
+                    area, bounds = areas[i]
+                    if (bounds[0] > box[2] or bounds[2] < box[0] or
+                        bounds[1] > box[3] or bounds[3] < box[1]):
+                        continue
+                    if i not in areaEdges:
+                        areaEdges[i] = spatialIndex.loopEdges(
+                            [spatialIndex.flattenLoop(loop, tolerance)
+                             for loop in area.coordinates if loop])
+                    if areaEdges[i].overlaps(outline):
+                        tooTall.append(area)
+            for area in tooTall:
+                if ((area.layer in (currentPart.side, "BOTH")) and
+                    (height > area.height)):
+                    self.addError("Part " + currentPart.__str__() +
+                        " is %.2f tall, over the %.2f limit of " %
+                        (height, area.height) + area.__str__() + ".",
+                        currentPart)
+
+    """
+        Look for parts whose placed outline reaches off the board outline,
+          or over one of its cutouts. The arcs of both are followed to
+          within ARC_TOLERANCE, and an outline that touches the board's
+          edge counts as reaching off it.
+    """
+    def checkPartsOnBoard(self, componentLibrary):
+        boards = [s for s in self.shapes if s.sType == BOARD_START]
+        if not boards:
+            return
+        tolerance = ARC_TOLERANCE.get(self.units, ARC_TOLERANCE["MM"])
+        board = spatialIndex.loopEdges(
+            [spatialIndex.flattenLoop(loop, tolerance)
+             for loop in boards[0].coordinates if loop])
+
+        for currentPart in self.parts:
+            outline = componentLibrary.placedOutline(currentPart, self.units,
+                                                     tolerance)
+            if outline is None:
+                continue
+            if not board.holds(outline):
+                self.addError("Part " + currentPart.__str__() +
+                    " does not fit inside the board outline.", currentPart)
+
+    def checkUnits(self):
+        if self.units == "ERROR":
+            self.addError("Could not find units in file")
 
     def checkEmpty(self):
         if not (self.shapes):
-            self.errors.append("No shapes found. Is this IDF 3.0 data?")
+            self.addError("No shapes found. Is this IDF 3.0 data?")
 
     def checkCurves(self):
         pass
@@ -360,44 +1123,84 @@ class emnObj:
         else:
             print("No errors detected!\n")
 
+#the " (line n)" an entity adds to its description when it knows its line
+def lineSuffix(lineNumber):
+    if lineNumber is None:
+        return ""
+    return " (line %d)" % lineNumber
+
 #relevant shape data: type, outline, cutouts, height, layer (eventually)
+#  Only the parsed fields are kept, not the lines they came from.
 class shape:
-    def __init__(self, sData):
-        self._sData = sData
-        self.sType = sData[0].split()[0] 
-        self.coordinates = self.getCoords() #list of list of all coordinates
-        self.outline = self.coordinates[0] #list of ouline coordinates
-        self.cutouts = self.coordinates[1:] #list of list of cutouts
-        self.height = self.getHeight()
-        self.layer = "" #not implementing this until we need it
+    __slots__ = ("sType", "coordArray", "loopStarts", "_coordinates",
+                 "height", "layer", "lineNumber")
+
+    def __init__(self, sData, columnar=False, lineNumber=None):
+        self.sType = intern(sData[0].split()[0])
+        if columnar:
+            #one float array of [cutout,x,y,arc] per vertex, plus the
+            #  vertex index where each loop starts (and where the last ends)
+            self.coordArray, self.loopStarts = self.getCoordArray(sData)
+            self._coordinates = None
+        else:
+            self.coordArray, self.loopStarts = None, None
+            self._coordinates = self.getCoords(sData)
+        self.height = self.getHeight(sData)
+        self.layer = intern(self.getLayer(sData)) #board side or routing layers
+        self.lineNumber = lineNumber #line the shape starts on, if kept
 
     def __str__(self):
         info = (
             self.sType,self.outline[0][1],self.outline[0][2],
         )
-        return "%s starting at [%.2f,%.2f]" % info
+        return ("%s starting at [%.2f,%.2f]" % info +
+                lineSuffix(self.lineNumber))
+
+    #list of list of all coordinates
+    @property
+    def coordinates(self):
+        if self._coordinates is not None:
+            return self._coordinates
+        return [self.getLoop(i) for i in range(len(self.loopStarts) - 1)]
+
+    #list of outline coordinates
+    @property
+    def outline(self):
+        if self._coordinates is not None:
+            return self._coordinates[0]
+        return self.getLoop(0)
+
+    #list of list of cutouts
+    @property
+    def cutouts(self):
+        return self.coordinates[1:]
 
-    #get shape outline
-    def getCoords(self):
-        shapeStrs = []  
-        shapeOutline = []
+    #build the coordinate list of one loop from the coordinate array
+    def getLoop(self, loopIndex):
+        start = self.loopStarts[loopIndex] * 4
+        end = self.loopStarts[loopIndex + 1] * 4
+        values = self.coordArray[start:end]
+        return [tuple(values[i:i+4]) for i in range(0, len(values), 4)]
+
+    #get shape coordinate lines, exploiting a convenient feature of IDF 3.0
+    #  that only/all coordinate lines are 4 fields long
+    def getCoordFields(self, sData):
+        coordFields = []
+        for line in sData:
+            fields = line.split()
+            if len(fields) == 4:
+                coordFields.append(fields)
+        return coordFields
+
+    #get shape outline, one (cutout,x,y,arc) tuple per point
+    def getCoords(self, sData):
         subshapeList = []
         currentSubshape = []
         cutoutIndex = 0
 
-        for line in self._sData: #get shape lines
-                #exploiting a convenient feature of IDF 3.0
-                #that only/all coordinate lines are 4 fields long
-                if len(line.split()) == 4: 
-                    shapeStrs.append(line.split())
-
-        #convert the strings to lists of floats
-        for line in shapeStrs:
-            cutout = float(line[0])
-            xPos = float(line[1])
-            yPos = float(line[2])
-            arc = float(line[3])
-            coord = [cutout,xPos,yPos,arc]
+        #convert the strings to tuples of floats
+        for line in self.getCoordFields(sData):
+            coord = tuple(map(float, line))
             if cutoutIndex == coord[0]:
                 currentSubshape.append(coord)
             elif cutoutIndex != coord[0]:
@@ -409,62 +1212,277 @@ class shape:
         subshapeList.append(currentSubshape)
         return subshapeList
 
+    #get the shape outline as a flat array, splitting loops the same way
+    #  getCoords does
+    def getCoordArray(self, sData):
+        coordFields = self.getCoordFields(sData)
+        coords = array('d', map(float, itertools.chain.from_iterable(
+            coordFields)))
+
+        loopStarts = array('l', [0])
+        cutoutIndex = 0
+        for i, cutout in enumerate(coords[0::4]):
+            if cutout != cutoutIndex:
+                loopStarts.append(i)
+                cutoutIndex = cutout
+        loopStarts.append(len(coordFields))
+
+        return coords, loopStarts
+
+    #pull the board side (or routing layers) from a shape's second record
+    def getLayer(self, sData):
+        if self.sType in (PLACE_KEEPOUT_START, PLACE_OUTLINE_START,
+                          ROUTE_START, ROUTE_KEEPOUT_START):
+            return sData[1].split()[0]
+        elif self.sType == OTHER_START:
+            return sData[1].split()[2]
+        return ""
+
     #pull height/thickness from a shape
-    def getHeight(self):
+    def getHeight(self, sData):
         sHeight = 0
 
         if self.sType == BOARD_START: #conditionals based on IDF 3.0 standard
-            sHeight = float(self._sData[1])
+            sHeight = float(sData[1])
         elif (self.sType == OTHER_START) or (self.sType == PLACE_OUTLINE_START):
-            line = self._sData[1]
+            line = sData[1]
             sHeight = float(line.split()[1])
 
         return sHeight
 
+"""
+    Get the names out of the first line of a part record, as
+      (name, refDes, geometry, partNumber). The line is only split into
+      IDF fields once.
+
+    name and refDes are read the way CircuitWorks writes them: the first
+      quoted string and whatever follows the last quote, or the first and
+      last fields when nothing is quoted. geometry and partNumber are the
+      first two IDF fields, which a .emp library keys outlines by.
+"""
+def splitPartNames(line):
+    fields = splitFields(line)
+    if "\"" in line:
+        name = line.split('\"', 2)[1]
+        refDes = line.rpartition('\"')[2].strip()
+    else:
+        name = fields[0]
+        refDes = fields[-1]
+
+    if len(fields) >= 3:
+        return name, refDes, fields[0], fields[1]
+    return name, refDes, (fields[0] if fields else ""), ""
+
+"""
+    A partTable holds the parts of a board column by column: positions in
+      typed arrays and names in lists, decoded a whole section at a time.
+      Indexing or iterating it gives part views.
+"""
+class partTable:
+    def __init__(self):
+        self.xs = array('d')
+        self.ys = array('d')
+        self.rotations = array('d')
+        self.sides = [] #the side of the board each part is on
+        self.names = []
+        self.refDeses = []
+        self.geometries = [] #.emp lookup keys
+        self.partNumbers = []
+        self.lineNumbers = None #array of first line numbers, if kept
+
+    def __len__(self):
+        return len(self.xs)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.xs)
+        if not 0 <= index < len(self.xs):
+            raise IndexError("part index out of range")
+        return part(self, index)
+
+    def __iter__(self):
+        for index in range(len(self.xs)):
+            yield part(self, index)
+
+    """
+        Decode part records: the first lines (names) and second lines
+          (placement) of every part. Each line is split once, and each
+          numeric column is converted in one pass. Names, part numbers and
+          sides repeat across a board, so each distinct string is only
+          stored once.
+    """
+    def addLines(self, nameLines, placeLines, lineNumbers=None):
+        if not nameLines:
+            return
+        names, refDeses, geometries, partNumbers = zip(
+            *map(splitPartNames, nameLines))
+        columns = list(zip(*[line.split(None, 5)[:5] for line in placeLines]))
+        if len(columns) < 5:
+            raise ValueError("%s has a part with too few fields." %
+                             PLACEMENT_START)
+
+        self.xs.extend(map(float, columns[0]))
+        self.ys.extend(map(float, columns[1]))
+        self.rotations.extend(map(float, columns[3]))
+        self.sides.extend(map(intern, columns[4]))
+        self.names.extend(map(intern, names))
+        self.refDeses.extend(refDeses)
+        self.geometries.extend(map(intern, geometries))
+        self.partNumbers.extend(map(intern, partNumbers))
+        if lineNumbers is not None:
+            if self.lineNumbers is None:
+                self.lineNumbers = array('l')
+            self.lineNumbers.extend(lineNumbers)
+
+    #a new partTable with only the rows at indexes, in that order
+    def subset(self, indexes):
+        table = partTable()
+        for column in ("xs", "ys", "rotations"):
+            values = getattr(self, column)
+            setattr(table, column, array('d', [values[i] for i in indexes]))
+        for column in ("sides", "names", "refDeses", "geometries",
+                       "partNumbers"):
+            values = getattr(self, column)
+            setattr(table, column, [values[i] for i in indexes])
+        if self.lineNumbers is not None:
+            table.lineNumbers = array('l',
+                                      [self.lineNumbers[i] for i in indexes])
+        return table
+
 #relevant part data: name, reference designator, coordinates, side
+#  A part is a view of one row of a partTable.
 class part:
-    def __init__(self, pData):
-        self._pData = pData #a list of 2 strings
-        self.coordinates = self.getCoords() #the part's position [x,y,rot]
-        self.side = pData[1].split()[4] #the side of the board the part is on
-        self.name, self.refDes = self.getNames() #the part's name
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
 
     def __str__(self):
         info = (
             self.name, self.refDes, self.coordinates[0], self.coordinates[1]
         )
-        return "%s (%s) at [%.2f,%.2f]" % info
-
-    def getCoords(self):
-        xPos = float(self._pData[1].split()[0])
-        yPos = float(self._pData[1].split()[1])
-        rot  = float(self._pData[1].split()[3])
-        return [xPos,yPos,rot]
-
-    def getNames(self):
-        pName = ""
-        rName = ""
-
-        if "\"" in self._pData[0]:
-            pName = self._pData[0].split('\"')[1]
-            rName = self._pData[0].split('\"')[-1]
-            rName = rName.strip()
-        else:
-            pName = self._pData[0].split()[0]
-            rName = self._pData[0].split()[-1]
-        
-        return pName, rName
+        return "%s (%s) at [%.2f,%.2f]" % info + lineSuffix(self.lineNumber)
+
+    #the part's name
+    @property
+    def name(self):
+        return self._table.names[self._index]
+
+    @property
+    def refDes(self):
+        return self._table.refDeses[self._index]
+
+    #IDF geometry name and part number, which .emp outlines are keyed by
+    @property
+    def geometry(self):
+        return self._table.geometries[self._index]
+
+    @property
+    def partNumber(self):
+        return self._table.partNumbers[self._index]
+
+    #the side of the board the part is on
+    @property
+    def side(self):
+        return self._table.sides[self._index]
+
+    #the part's position (x,y,rot)
+    @property
+    def coordinates(self):
+        table = self._table
+        index = self._index
+        return (table.xs[index], table.ys[index], table.rotations[index])
+
+    #line the part starts on, if kept
+    @property
+    def lineNumber(self):
+        if self._table.lineNumbers is None:
+            return None
+        return self._table.lineNumbers[self._index]
+
+"""
+    A drillTable holds the drills of a board column by column, in typed
+      arrays decoded a whole section at a time. Indexing or iterating it
+      gives drill views.
+"""
+class drillTable:
+    def __init__(self):
+        self.diameters = array('d')
+        self.xs = array('d')
+        self.ys = array('d')
+        self.lineNumbers = None #array of line numbers, if kept
+
+    def __len__(self):
+        return len(self.diameters)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.diameters)
+        if not 0 <= index < len(self.diameters):
+            raise IndexError("drill index out of range")
+        return drill(self, index)
+
+    def __iter__(self):
+        for index in range(len(self.diameters)):
+            yield drill(self, index)
+
+    """
+        Decode drill records, one per line. Each line is split once, and
+          each numeric column is converted in one pass.
+    """
+    def addLines(self, lines, lineNumbers=None):
+        if not lines:
+            return
+        columns = list(zip(*[line.split(None, 3)[:3] for line in lines]))
+        if len(columns) < 3:
+            raise ValueError("%s has a drill with too few fields." %
+                             DRILL_START)
+
+        self.diameters.extend(map(float, columns[0]))
+        self.xs.extend(map(float, columns[1]))
+        self.ys.extend(map(float, columns[2]))
+        if lineNumbers is not None:
+            if self.lineNumbers is None:
+                self.lineNumbers = array('l')
+            self.lineNumbers.extend(lineNumbers)
+
+    #a new drillTable with only the rows at indexes, in that order
+    def subset(self, indexes):
+        table = drillTable()
+        for column in ("diameters", "xs", "ys"):
+            values = getattr(self, column)
+            setattr(table, column, array('d', [values[i] for i in indexes]))
+        if self.lineNumbers is not None:
+            table.lineNumbers = array('l',
+                                      [self.lineNumbers[i] for i in indexes])
+        return table
 
 #maybe drill could be a shape, but making another class was far easier
+#  A drill is a view of one row of a drillTable.
 class drill:
-    def __init__(self,dData):
-        self._dData = dData
-        dia = float(self._dData.split()[0])
-        xPos = float(self._dData.split()[1])
-        yPos = float(self._dData.split()[2])
-        self.coordinates = [xPos,yPos]
-        self.diameter = dia
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
 
     def __str__(self):
         info = (self.diameter,self.coordinates[0],self.coordinates[1])
-        return "Drill with diameter %.2f at [%.2f,%.2f]" % info
\ No newline at end of file
+        return ("Drill with diameter %.2f at [%.2f,%.2f]" % info +
+                lineSuffix(self.lineNumber))
+
+    @property
+    def diameter(self):
+        return self._table.diameters[self._index]
+
+    @property
+    def coordinates(self):
+        return (self._table.xs[self._index], self._table.ys[self._index])
+
+    #the drill's line, if kept
+    @property
+    def lineNumber(self):
+        if self._table.lineNumbers is None:
+            return None
+        return self._table.lineNumbers[self._index]
@@ -0,0 +1,147 @@
+"""
+    emnReader class:
+        ~memory-map a .emn file instead of reading it into a list of lines
+        ~scan the bytes once for section keywords and index where each
+          section starts and ends
+        ~decode only the sections a caller asks for, a block at a time
+        ~number those lines the way they're numbered in the file, when asked
+"""
+
+import locale
+import mmap
+import re
+import emnObj
+
+#a section keyword is the first field of a line and starts with a "."
+KEYWORD_PATTERN = re.compile(br"^[ \t]*(\.\S+)", re.MULTILINE)
+
+BLOCK_SIZE = 1024 * 1024 #decode at most this many bytes at a time
+
+"""
+    An emnReader maps a .emn file into memory and keeps a list of its
+      sections as (keyword, start, end) byte offsets, in file order.
+      start is the first byte of the section's start line and end is the
+      byte after its end line.
+
+    Use it as a context manager, or call close() when done.
+"""
+class emnReader:
+    def __init__(self, path, encoding=None):
+        self.path = path
+        #decode the same way open() would for a text file
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.sections = []
+        self._counted = (0, 1) #(offset, number of the line at that offset)
+
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        except ValueError: #empty files can't be mapped
+            self._map = None
+        else:
+            self.indexSections()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excInfo):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    """
+        Scan the file once and record the offsets of every section,
+          matching keywords exactly the way emnParser does.
+    """
+    def indexSections(self):
+        section = None
+        sectionStart = 0
+        sectionEnd = None
+
+        for match in KEYWORD_PATTERN.finditer(self._map):
+            keyword = match.group(1).decode("ascii", "replace")
+            if section is None:
+                if keyword in emnObj.SECTION_ENDS:
+                    section = keyword
+                    sectionStart = match.start()
+                    sectionEnd = emnObj.SECTION_ENDS[keyword]
+            elif keyword == sectionEnd:
+                self.sections.append((section, sectionStart,
+                                      self.lineEnd(match.end())))
+                section = None
+
+        if section is not None: #never closed, so it runs to the end
+            self.sections.append((section, sectionStart, len(self._map)))
+
+    #offset of the byte after the line that contains offset
+    def lineEnd(self, offset):
+        newline = self._map.find(b"\n", offset)
+        if newline == -1:
+            return len(self._map)
+        return newline + 1
+
+    """
+        Get the (start, end) offsets of every section with a keyword.
+    """
+    def getSection(self, keyword):
+        return [(start, end) for (k, start, end) in self.sections
+                if k == keyword]
+
+    """
+        Yield the decoded lines between two offsets, decoding one block
+          of whole lines at a time.
+    """
+    def iterLines(self, start, end):
+        while start < end:
+            blockEnd = end
+            if end - start > BLOCK_SIZE:
+                blockEnd = self.lineEnd(start + BLOCK_SIZE)
+                blockEnd = min(blockEnd, end)
+            text = self._map[start:blockEnd].decode(self.encoding)
+            for line in text.splitlines(True):
+                yield line
+            start = blockEnd
+
+    """
+        Get the number of the line that starts at offset. Newlines are only
+          counted when line numbers are asked for, carrying on from the
+          last offset asked about, so numbering sections in file order
+          reads the file once.
+    """
+    def lineNumber(self, offset):
+        countedTo, lineNumber = self._counted
+        if offset < countedTo:
+            countedTo, lineNumber = 0, 1
+        while countedTo < offset:
+            blockEnd = min(offset, countedTo + BLOCK_SIZE)
+            lineNumber += self._map[countedTo:blockEnd].count(b"\n")
+            countedTo = blockEnd
+        self._counted = (countedTo, lineNumber)
+        return lineNumber
+
+    """
+        Yield the lines of the sections whose keywords are in keywords
+          (every section if keywords is None), in file order. Lines outside
+          of sections are never decoded.
+    """
+    def lines(self, keywords=None):
+        for keyword, start, end in self.sections:
+            if keywords is None or keyword in keywords:
+                for line in self.iterLines(start, end):
+                    yield line
+
+    """
+        Like lines(), but yield (line number, line) pairs.
+    """
+    def numberedLines(self, keywords=None):
+        for keyword, start, end in self.sections:
+            if keywords is None or keyword in keywords:
+                lineNumber = self.lineNumber(start)
+                for line in self.iterLines(start, end):
+                    yield lineNumber, line
+                    lineNumber += line.count("\n")
@@ -0,0 +1,171 @@
+"""
+    emnWatcher class:
+        ~keep an eye on a set of .emn files and re-check the ones that change
+        ~report only the errors that are new or resolved since the last check
+
+    The parts library is loaded once by whoever builds the emnWatcher, so
+      a re-check after an export only costs one parse and one check. The
+      last checked revision of each file is kept, so checks that look at
+      one entity at a time only look at what the edit changed (see
+      emnDiff).
+"""
+
+import hashlib
+import io
+import os
+import time
+import emnObj
+import empLib
+
+"""
+    An emnWatcher polls the .emn files that findPaths() returns.
+
+    A file is re-checked when its modification time or size changes and
+      its content hash is different from the last check. Touching a file
+      without changing it costs one read, but no parse or check. A file
+      that can't be parsed (caught halfway through an export, say) is
+      reported once as a failure, keeps the errors of its last good check
+      and is re-checked on every poll until it can be.
+"""
+class emnWatcher:
+    def __init__(self, findPaths, partsLibrary, checks=None, pollInterval=0.5,
+                 empPath=None, lineNumbers=False):
+        self.findPaths = findPaths #returns the .emn paths to watch
+        self.partsLibrary = partsLibrary
+        #(name, needs) checks from emnObj.selectChecks, all of them by default
+        self.checks = checks if checks is not None else emnObj.selectChecks()
+        self.pollInterval = pollInterval #seconds between polls
+        #.emp file of component outlines, or None to use each file's own
+        self.empPath = empPath
+        self.lineNumbers = lineNumbers #say which line each error is about
+        self._stats = {} #path -> (mtime, size) at the last look
+        self._hashes = {} #path -> content hash at the last check
+        self._errors = {} #path -> errors found at the last check
+        self._failures = {} #path -> why the last check failed
+        self._boards = {} #path -> emnObj of the last check
+
+    """
+        Look at every watched file once. Returns a list of
+          (fileName, newErrors, resolvedErrors, failure) for files whose
+          errors changed, or that newly couldn't be checked (failure says
+          why, and is "" otherwise), in path order.
+    """
+    def poll(self):
+        changes = []
+        emnPaths = self.findPaths()
+
+        for emnPath in emnPaths:
+            try:
+                stat = os.stat(emnPath)
+            except OSError: #removed between listing and looking
+                continue
+            fileStat = (stat.st_mtime, stat.st_size)
+            if self._stats.get(emnPath) == fileStat:
+                continue
+
+            try:
+                with open(emnPath, "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue
+            fileHash = hashlib.sha1(data).hexdigest()
+            if self._hashes.get(emnPath) == fileHash:
+                #touched, or put back the way it was last checked
+                self._stats[emnPath] = fileStat
+                self._failures.pop(emnPath, None)
+                continue
+
+            #a file caught halfway through an export may not parse; it is
+            #  reported and looked at again on the next poll, and its
+            #  errors stay what the last good check found
+            try:
+                errors = self.checkData(data, emnPath)
+            except Exception as e:
+                failure = "Could not check %s: %s" % (emnPath, e)
+                if self._failures.get(emnPath) != failure:
+                    self._failures[emnPath] = failure
+                    changes.append((os.path.basename(emnPath), [], [],
+                                    failure))
+                continue
+            self._failures.pop(emnPath, None)
+            self._stats[emnPath] = fileStat
+            self._hashes[emnPath] = fileHash
+            change = self.compareErrors(emnPath, errors)
+            if change:
+                changes.append(change)
+
+        #files that went away have no errors left
+        for emnPath in sorted(set(self._errors).union(self._failures) -
+                              set(emnPaths)):
+            change = self.compareErrors(emnPath, [])
+            self._stats.pop(emnPath, None)
+            self._hashes.pop(emnPath, None)
+            self._failures.pop(emnPath, None)
+            del self._errors[emnPath]
+            self._boards.pop(emnPath, None)
+            if change:
+                changes.append(change)
+
+        return changes
+
+    """
+        Parse and check the bytes of a .emn file, against the last revision
+          of it that was checked. Component outlines come through empLib's
+          cache, which re-reads a .emp file only when it changes.
+    """
+    def checkData(self, data, emnPath):
+        #decode the same way open() would for a text file
+        with io.TextIOWrapper(io.BytesIO(data)) as f:
+            currentEmn = emnObj.emnObj(f, os.path.basename(emnPath),
+                                       lineNumbers=self.lineNumbers)
+        if self.empPath:
+            componentLibrary = empLib.getEmpLibrary(self.empPath)
+        else:
+            componentLibrary = empLib.findCompanion(emnPath)
+        currentEmn.runChecks(self.checks, self.partsLibrary, componentLibrary,
+                             previous=self._boards.get(emnPath))
+        self._boards[emnPath] = currentEmn
+        return currentEmn.errors
+
+    """
+        Store a file's new errors and work out what changed since last time.
+          Returns (fileName, newErrors, resolvedErrors, ""), or None if
+          nothing changed.
+    """
+    def compareErrors(self, emnPath, errors):
+        oldErrors = self._errors.get(emnPath, [])
+        self._errors[emnPath] = errors
+
+        oldSet = set(oldErrors)
+        newSet = set(errors)
+        newErrors = [e for e in errors if e not in oldSet]
+        resolvedErrors = [e for e in oldErrors if e not in newSet]
+
+        if newErrors or resolvedErrors:
+            return os.path.basename(emnPath), newErrors, resolvedErrors, ""
+        return None
+
+    """
+        Poll forever (until ctrl+c), printing what changed.
+    """
+    def run(self):
+        try:
+            while True:
+                for change in self.poll():
+                    printChange(*change)
+                time.sleep(self.pollInterval)
+        except KeyboardInterrupt:
+            print("Stopped watching.")
+
+"""
+    Show one file's new and resolved errors, or why it couldn't be checked.
+"""
+def printChange(fileName, newErrors, resolvedErrors, failure=""):
+    print("%s %s:" % (time.strftime("%H:%M:%S"), fileName))
+    if failure:
+        print("  ! %s" % failure)
+    for line in newErrors:
+        print("  + %s" % line)
+    for line in resolvedErrors:
+        print("  - %s" % line)
+    print("")
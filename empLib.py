@@ -0,0 +1,221 @@
+"""
+    componentOutline class:
+        ~store one component from an IDF 3.0 library (.emp) file: its
+          geometry name, part number, units, height and outline loops
+
+    empLibrary class:
+        ~store every component outline in a .emp file, keyed for lookup
+          by placed parts
+        ~work out (and remember) the outline of a part once it is rotated
+          and put on a side of the board, with its arcs split into short
+          straight edges
+
+    getEmpLibrary:
+        ~read .emp files through a process-wide cache, so boards that
+          share a .emp file only parse it once
+"""
+
+import math
+import os
+import emnObj
+import spatialIndex
+
+ELECTRICAL_START = ".ELECTRICAL"
+ELECTRICAL_END = ".END_ELECTRICAL"
+MECHANICAL_START = ".MECHANICAL"
+MECHANICAL_END = ".END_MECHANICAL"
+
+COMPONENT_ENDS = {
+    ELECTRICAL_START: ELECTRICAL_END,
+    MECHANICAL_START: MECHANICAL_END,
+}
+
+#length of one unit in millimetres
+UNIT_SCALE = {"MM": 1.0, "THOU": 0.0254}
+
+_empCache = {} #absolute path -> (mtime, size, empLibrary)
+
+#relevant component data: names, units, height and outline
+#  Only the parsed fields are kept, not the lines they came from.
+class componentOutline:
+    def __init__(self, cData):
+        #cData is the lines of the section, start and end included
+        self.cType = cData[0].split()[0] #.ELECTRICAL or .MECHANICAL
+        fields = emnObj.splitFields(cData[1])
+        self.geometry = fields[0] #geometry (package) name
+        self.partNumber = fields[1]
+        self.units = fields[2] #MM or THOU
+        self.height = float(fields[3])
+        self.loops = self.getLoops(cData) #list of list of [cutout,x,y,arc]
+
+    def __str__(self):
+        return "%s %s" % (self.geometry, self.partNumber)
+
+    #get outline loops, split the same way shape.getCoords does
+    def getLoops(self, cData):
+        loops = []
+        currentLoop = []
+        loopIndex = 0
+
+        for line in cData[2:-1]:
+            fields = line.split()
+            if len(fields) != 4 or fields[0] == "PROP":
+                continue
+            coord = [float(field) for field in fields]
+            if coord[0] != loopIndex:
+                loops.append(currentLoop)
+                currentLoop = []
+                loopIndex = coord[0]
+            currentLoop.append(coord)
+
+        loops.append(currentLoop)
+        return loops
+
+"""
+    An empLibrary holds the component outlines of one .emp file. Outlines
+      are found by (geometry, part number) first, then by geometry name.
+"""
+class empLibrary:
+    def __init__(self, lineSource, fileName=""):
+        self.fileName = fileName
+        self.components = {} #(geometry, part number) -> componentOutline
+        self._byGeometry = {} #geometry -> first componentOutline
+        #(component key, rotation, side, tolerance) -> outline loops
+        self._outlines = {}
+        self.readComponents(lineSource)
+
+    def __len__(self):
+        return len(self.components)
+
+    """
+        Read every .ELECTRICAL and .MECHANICAL section out of the lines.
+    """
+    def readComponents(self, lineSource):
+        section = None
+        lines = []
+        for line in lineSource:
+            fields = line.split(None, 1)
+            if not fields:
+                continue
+            if section is None:
+                if fields[0] in COMPONENT_ENDS:
+                    section = fields[0]
+                    lines = [line]
+            else:
+                lines.append(line)
+                if fields[0] == COMPONENT_ENDS[section]:
+                    self.addComponent(componentOutline(lines))
+                    section = None
+
+    def addComponent(self, component):
+        key = (component.geometry, component.partNumber)
+        self.components.setdefault(key, component)
+        self._byGeometry.setdefault(component.geometry, component)
+
+    """
+        Get the outline for a placed part, or None if the library doesn't
+          have one.
+    """
+    def getComponent(self, currentPart):
+        component = self.components.get((currentPart.geometry,
+                                         currentPart.partNumber))
+        if component is None:
+            component = self._byGeometry.get(currentPart.geometry)
+        return component
+
+    """
+        Get the loops of a component around its origin, in millimetres,
+          once rotated by rotation degrees and put on a side (bottom side
+          parts are mirrored in X), as flattened (cutout, x, y, 0) points
+          (see spatialIndex.flattenLoop) within tolerance millimetres of
+          its arcs. Every (component, rotation, side, tolerance) is only
+          worked out once.
+    """
+    def getOutline(self, component, rotation, side, tolerance):
+        key = ((component.geometry, component.partNumber), rotation % 360,
+               side, tolerance)
+        if key not in self._outlines:
+            scale = UNIT_SCALE.get(component.units, 1.0)
+            angle = math.radians(rotation)
+            cosA = math.cos(angle)
+            sinA = math.sin(angle)
+            mirror = -1.0 if side == "BOTTOM" else 1.0
+
+            loops = []
+            for loop in component.loops:
+                if not loop:
+                    continue
+                placedLoop = []
+                for point in spatialIndex.flattenLoop(loop,
+                                                      tolerance / scale):
+                    x = point[1] * scale * mirror
+                    y = point[2] * scale
+                    placedLoop.append((point[0], x * cosA - y * sinA,
+                                       x * sinA + y * cosA, 0.0))
+                loops.append(placedLoop)
+            self._outlines[key] = loops or None
+        return self._outlines[key]
+
+    """
+        Get the loops a placed part covers on the board, in boardUnits, as
+          flattened points within tolerance (in boardUnits) of its arcs,
+          or None if its outline isn't known.
+    """
+    def placedOutline(self, currentPart, boardUnits, tolerance):
+        component = self.getComponent(currentPart)
+        if component is None:
+            return None
+        unitScale = UNIT_SCALE.get(boardUnits, 1.0)
+        x, y, rotation = currentPart.coordinates
+        loops = self.getOutline(component, rotation, currentPart.side,
+                                tolerance * unitScale)
+        if loops is None:
+            return None
+
+        scale = 1.0 / unitScale
+        return [[(point[0], x + point[1] * scale, y + point[2] * scale, 0.0)
+                 for point in loop] for loop in loops]
+
+    #a component's height, in boardUnits
+    def heightIn(self, component, boardUnits):
+        return (component.height * UNIT_SCALE.get(component.units, 1.0) /
+                UNIT_SCALE.get(boardUnits, 1.0))
+
+"""
+    Read a .emp file into an empLibrary, or reuse the one read earlier
+      in this process if the file hasn't changed since.
+"""
+def getEmpLibrary(empPath):
+    empPath = os.path.abspath(empPath)
+    stat = os.stat(empPath)
+    cached = _empCache.get(empPath)
+    if cached and cached[0] == stat.st_mtime and cached[1] == stat.st_size:
+        return cached[2]
+
+    with open(empPath) as f:
+        library = empLibrary(f, os.path.basename(empPath))
+    _empCache[empPath] = (stat.st_mtime, stat.st_size, library)
+    return library
+
+"""
+    Find the .emp file that goes with a .emn file (same name, next to it).
+      Returns None if there isn't one, or if emnPath is None.
+"""
+def findCompanionPath(emnPath):
+    if emnPath is None:
+        return None
+    for extension in (".emp", ".EMP"):
+        empPath = os.path.splitext(emnPath)[0] + extension
+        if os.path.isfile(empPath):
+            return empPath
+    return None
+
+"""
+    Read the .emp file that goes with a .emn file through the cache.
+      Returns None if there isn't one.
+"""
+def findCompanion(emnPath):
+    empPath = findCompanionPath(emnPath)
+    if empPath is None:
+        return None
+    return getEmpLibrary(empPath)
@@ -0,0 +1,269 @@
+"""
+    errorRecord class:
+        ~one problem found in a .emn file: the file, the check that found
+          it, its severity, the kind of entity it is about, where that
+          entity is and the message
+
+    textSink, jsonLinesSink, sarifSink classes:
+        ~write error records out one at a time, as soon as they're found,
+          so nothing has to wait for (or hold on to) every error of a run
+        ~text is the format the tool has always printed, JSON Lines is one
+          JSON object per line, SARIF is the static analysis results format
+          editors and CI dashboards read
+        ~logSink writes the idferrors.log format, teeSink hands records to
+          several sinks and queueSink sends them back from worker processes
+
+    Every sink has the same methods: startFile(fileName) before a file's
+      records, emit(record) for each one, endFile(fileName, failure) after
+      them and close() at the end of the run.
+"""
+
+import json
+
+FORMATS = ("text", "jsonl", "sarif")
+
+#check name given to records about files that couldn't be checked at all
+FAILURE_CHECK = "readFile"
+
+SARIF_SCHEMA = ("https://docs.oasis-open.org/sarif/sarif/v2.1.0/os/"
+                "schemas/sarif-schema-2.1.0.json")
+
+#one problem found in a .emn file
+class errorRecord:
+    __slots__ = ("file", "check", "severity", "entity", "coordinates",
+                 "line", "message")
+
+    def __init__(self, file, check, severity, message, entity=None,
+                 coordinates=None, line=None):
+        self.file = file #file name
+        self.check = check #name of the check that found it
+        self.severity = severity #"error" or "warning"
+        self.message = message #the same text the tool has always printed
+        self.entity = entity #"shape", "part", "drill" or None
+        self.coordinates = coordinates #(x, y) of the entity, or None
+        self.line = line #line of the file the entity starts on, if known
+
+    def __str__(self):
+        return self.message
+
+    def asDict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+#rebuild an errorRecord from asDict(), optionally for another file name
+def recordFromDict(fields, fileName=None):
+    record = errorRecord(fields["file"], fields["check"], fields["severity"],
+                         fields["message"], fields["entity"],
+                         fields["coordinates"], fields["line"])
+    if record.coordinates is not None:
+        record.coordinates = tuple(record.coordinates)
+    if fileName is not None:
+        record.file = fileName
+    return record
+
+#collects records in a list, for handing a file's records back at once
+class recordList(list):
+    def startFile(self, fileName):
+        pass
+
+    def emit(self, record):
+        self.append(record)
+
+    def endFile(self, fileName, failure=""):
+        pass
+
+    def close(self):
+        pass
+
+"""
+    Hands records on to several sinks at once, counting the records of the
+      current file as they go by.
+"""
+class teeSink:
+    def __init__(self, *sinks):
+        self.sinks = sinks
+        self.count = 0 #records since the last startFile
+
+    def startFile(self, fileName):
+        self.count = 0
+        for sink in self.sinks:
+            sink.startFile(fileName)
+
+    def emit(self, record):
+        self.count += 1
+        for sink in self.sinks:
+            sink.emit(record)
+
+    def endFile(self, fileName, failure=""):
+        for sink in self.sinks:
+            sink.endFile(fileName, failure)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+"""
+    Sends records from a worker process back to the process writing them
+      out, through a multiprocessing queue. Records are put on the queue
+      one check's worth at a time, as (tag, records, None), so the reader
+      sees them while the rest of the checks run. flush() sends whatever
+      is left.
+"""
+class queueSink:
+    def __init__(self, queue, tag):
+        self.queue = queue
+        self.tag = tag #tells the reader which file the records are from
+        self._records = [] #records of the check being run
+
+    def emit(self, record):
+        if self._records and self._records[-1].check != record.check:
+            self.flush()
+        self._records.append(record)
+
+    def flush(self):
+        if self._records:
+            self.queue.put((self.tag, self._records, None))
+            self._records = []
+
+"""
+    Writes records the way the tool always has: a "Checking" line, one
+      message per line, then a blank line (or "No errors detected!").
+"""
+class textSink:
+    def __init__(self, stream):
+        self.stream = stream
+        self._count = 0 #records in the current file
+
+    def startFile(self, fileName):
+        self._count = 0
+        self.stream.write("Checking %s...\n" % fileName)
+
+    def emit(self, record):
+        self._count += 1
+        self.stream.write(record.message + "\n")
+        self.stream.flush()
+
+    def endFile(self, fileName, failure=""):
+        if failure:
+            self.stream.write(failure + "\n\n")
+        elif self._count:
+            self.stream.write("\n")
+        else:
+            self.stream.write("No errors detected!\n\n")
+        self.stream.flush()
+
+    def close(self):
+        pass
+
+"""
+    Writes the log file the tool has always written: the file name, one
+      message per line, then a blank line. A file that couldn't be
+      checked gets its failure message instead.
+"""
+class logSink:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def startFile(self, fileName):
+        self.stream.write("%s:\n" % fileName)
+
+    def emit(self, record):
+        self.stream.write(record.message + "\n")
+
+    def endFile(self, fileName, failure=""):
+        if failure:
+            self.stream.write(failure + "\n")
+        self.stream.write("\n")
+        self.stream.flush()
+
+    def close(self):
+        pass
+
+"""
+    Writes one JSON object per record, one per line, flushed as it goes.
+      A file that couldn't be checked gets one record with check readFile.
+"""
+class jsonLinesSink:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def startFile(self, fileName):
+        pass
+
+    def emit(self, record):
+        self.stream.write(json.dumps(record.asDict(), sort_keys=True) + "\n")
+        self.stream.flush()
+
+    def endFile(self, fileName, failure=""):
+        if failure:
+            self.emit(errorRecord(fileName, FAILURE_CHECK, "error", failure))
+
+    def close(self):
+        pass
+
+"""
+    Writes a SARIF 2.1.0 log. The log is one JSON document, so the opening
+      is written straight away, each result is written as it comes and
+      close() writes the end; a reader that follows the file sees results
+      as they are found. ruleIds are the check names results can have.
+"""
+class sarifSink:
+    def __init__(self, stream, toolVersion="", ruleIds=()):
+        self.stream = stream
+        self._results = 0 #results written so far
+
+        rules = [{"id": name} for name in ruleIds]
+        rules.append({"id": FAILURE_CHECK})
+        header = json.dumps({
+            "$schema": SARIF_SCHEMA,
+            "version": "2.1.0",
+            "runs": [{
+                "tool": {"driver": {
+                    "name": "IDF Checking Tool",
+                    "version": toolVersion,
+                    "rules": rules,
+                }},
+                "results": [],
+            }],
+        })
+        #leave the results array (and everything after it) open
+        self.stream.write(header[:-len("]}]}")])
+        self.stream.flush()
+
+    def startFile(self, fileName):
+        pass
+
+    def emit(self, record):
+        location = {"artifactLocation": {"uri": record.file}}
+        if record.line is not None:
+            location["region"] = {"startLine": record.line}
+        result = {
+            "ruleId": record.check,
+            "level": record.severity,
+            "message": {"text": record.message},
+            "locations": [{"physicalLocation": location}],
+        }
+        if record.entity is not None or record.coordinates is not None:
+            result["properties"] = {"entity": record.entity,
+                                    "coordinates": record.coordinates}
+
+        if self._results:
+            self.stream.write(",")
+        self.stream.write("\n" + json.dumps(result, sort_keys=True))
+        self.stream.flush()
+        self._results += 1
+
+    def endFile(self, fileName, failure=""):
+        if failure:
+            self.emit(errorRecord(fileName, FAILURE_CHECK, "error", failure))
+
+    def close(self):
+        self.stream.write("\n]}]}\n")
+        self.stream.flush()
+
+#make the sink for a format name in FORMATS
+def makeSink(formatName, stream, toolVersion="", ruleIds=()):
+    if formatName == "sarif":
+        return sarifSink(stream, toolVersion, ruleIds)
+    elif formatName == "jsonl":
+        return jsonLinesSink(stream)
+    return textSink(stream)
@@ -11,13 +11,59 @@
              circuitworks to generate IDF 3.0 data for MCAD/ECAD data transfer
 """
 
+import argparse
+import io
+import json
 import sys
 import traceback
 import os
 import glob
+import multiprocessing
+import queue
+import time
+import tracemalloc
 import emnObj
-
-startDir = os.getcwd()
+import emnReader
+import emnWatcher
+import errorSink
+import empLib
+import idfProfile
+import libIndex
+import resultCache
+import usageIndex
+
+#places to look for the parts library, in order
+LIB_PATHS = (
+    r"C:\csdat\library", #local drive
+    r"\\bombay.ad.garmin.com\data\CSWIN\LIBRARY", #network
+)
+
+#how long checks wait for the parts library before using the last good copy
+LIB_TIMEOUT = 60.0 #seconds
+#where the last good copy of the parts library is kept
+LIB_SNAPSHOT = os.path.join(os.path.expanduser("~"), ".idfLibrary.snapshot")
+
+#where the part usage index is kept, unless --usage-index says otherwise
+USAGE_INDEX = os.path.join(os.path.expanduser("~"), ".idfUsage.db")
+
+#where the check server listens, unless --host/--port say otherwise
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+
+#characters that make a command line argument a glob pattern
+GLOB_CHARS = "*?["
+
+#batch mode exit codes
+EXIT_CLEAN = 0 #every file was checked and had no errors
+EXIT_ERRORS = 1 #every file was checked, some had errors
+EXIT_FAILURE = 2 #a file couldn't be checked, or there was nothing to check
+
+_workerLibrary = None #the parts library, as seen by batch worker processes
+_workerChecks = None #the checks to run, as seen by batch worker processes
+_workerProfiling = False #whether batch workers profile each file
+_workerEmpPath = None #the .emp library every file uses, if one was given
+_workerLineNumbers = False #whether errors say which line they're about
+_workerQueue = None #where batch workers send the records they find
 
 """
     Read some .emn files, read in the parts libraries (if available),
@@ -26,10 +72,12 @@ startDir = os.getcwd()
 def main():
     emnsToCheck = []
 
-    partsLibrary = importLibrary() #store a list of library parts in memory
+    #the library loads while the user picks files and they're parsed, and
+    #  is only waited on by the checks that need it
+    partsLibrary = startLibraryLoad()
     #libReadTest(partsLibrary) #write the library list contents to a file
 
-    print("IDF CHECKING TOOL v0.2\n")
+    print("IDF CHECKING TOOL v%s\n" % emnObj.CHECKER_VERSION)
 
     userIn = input("Drop one .emn file here and press return,\n" +
         "or press return to check all .emn files in the current directory.\n" +
@@ -44,10 +92,16 @@ def main():
 
     #check for errors and show them to the user
     if emnsToCheck: 
+        #errors are printed as each check finds them
+        sink = errorSink.textSink(sys.stdout)
         for currentEmn in emnsToCheck:
-            print("\nChecking %s..." % currentEmn.__str__())
-            currentEmn.checkAllErrors(partsLibrary)
-            currentEmn.printAllErrors()
+            print("")
+            sink.startFile(currentEmn.__str__())
+            currentEmn.sink = sink
+            currentEmn.checkAllErrors(partsLibrary, componentLibrary=
+                                      empLib.findCompanion(currentEmn.path))
+            currentEmn.close()
+            sink.endFile(currentEmn.__str__())
 
         #prompt the user to save errors to a log
         userIn = input("Save these results to idferrors.log? (y/n): ")
@@ -55,14 +109,509 @@ def main():
         if userIn.lower().strip() == 'y':
             with open("idferrors.log","w") as f:
                 for currentEmn in emnsToCheck:
-                    f.write("%s:\n" % currentEmn.__str__())
-                    for currentError in currentEmn.errors:
-                        f.write("%s\n" % currentError)
-                    f.write("\n")
+                    writeLogEntry(f, currentEmn.__str__(), currentEmn.errors)
 
     else:
         print("Did not find any .emn data to check.\n")
 
+"""
+    Check the .emn files named on the command line without any prompts.
+
+    Files are parsed and checked on a pool of worker processes. Each worker
+      gets its own copy of the parts library once, when it starts, rather
+      than with every file. Results are printed (and logged) in the order
+      the files were named, no matter which worker finishes first.
+
+    With --serve, nothing is checked straight away; a checkServer keeps the
+      library loaded and answers check requests until ctrl+c.
+
+    With --usage-index, the parts the files place are also kept in a
+      usageIndex. --where-used, --where-refdes and --missing-parts answer
+      from that index (after indexing the files given, if any) instead of
+      checking anything.
+"""
+def batchMain(argv):
+    parser = argparse.ArgumentParser(
+        description="Check IDF 3.0 (.emn) data for errors.")
+    parser.add_argument("paths", nargs="*",
+        help=".emn files, folders of .emn files, or glob patterns")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+        help="number of worker processes (default: one per core)")
+    parser.add_argument("-l", "--library", action="append", default=None,
+        help="parts library folder to use (may be given more than once)")
+    parser.add_argument("--no-library", action="store_true",
+        help="skip the parts library checks")
+    parser.add_argument("--library-timeout", type=float, default=LIB_TIMEOUT,
+        help="seconds to wait for the parts library before using the last "
+             "good copy (default: %g)" % LIB_TIMEOUT)
+    parser.add_argument("--library-snapshot", default=LIB_SNAPSHOT,
+        help="where the last good copy of the parts library is kept "
+             "(default: %s)" % LIB_SNAPSHOT)
+    parser.add_argument("--log", default=None,
+        help="also write the results to this file")
+    parser.add_argument("--format", choices=errorSink.FORMATS, default="text",
+        help="how to write the results: text (default), jsonl (one JSON "
+             "object per error) or sarif")
+    parser.add_argument("-o", "--output", default=None,
+        help="write the results to this file instead of the screen")
+    parser.add_argument("-w", "--watch", action="store_true",
+        help="keep running and re-check files as they change")
+    parser.add_argument("--serve", action="store_true",
+        help="keep the parts library loaded and check files sent to a "
+             "local HTTP server (see checkServer.py)")
+    parser.add_argument("--host", default=SERVER_HOST,
+        help="address the server listens on (default: %s)" % SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT,
+        help="port the server listens on (default: %d)" % SERVER_PORT)
+    parser.add_argument("--library-poll", type=float, default=10.0,
+        help="seconds between the server's looks for changed .LIB files "
+             "(default: 10)")
+    parser.add_argument("--cache", default=None,
+        help="reuse results from this cache file for unchanged files")
+    parser.add_argument("--cache-size", type=int, default=64,
+        help="largest the cache may grow, in MB (default: 64)")
+    parser.add_argument("--clear-cache", action="store_true",
+        help="empty the cache before checking")
+    parser.add_argument("--checks", default=None,
+        help="comma separated checks to run (default: all of %s)" %
+             ", ".join(emnObj.CHECK_NAMES))
+    parser.add_argument("--skip", default=None,
+        help="comma separated checks not to run")
+    parser.add_argument("--timings", action="store_true",
+        help="show how long each check took and how many errors it found")
+    parser.add_argument("--emp", default=None,
+        help="IDF library (.emp) of component outlines for every file "
+             "(default: the .emp file next to each .emn file, if any)")
+    parser.add_argument("--line-numbers", action="store_true",
+        help="say which line of the file each part, shape and drill "
+             "error is about")
+    parser.add_argument("--profile", default=None,
+        help="write phase timings, entity counts and peak memory for "
+             "every file to this JSON file")
+    parser.add_argument("--usage-index", default=None,
+        help="keep the parts every file places in this index file, "
+             "updated for files that changed (default for queries: %s)" %
+             USAGE_INDEX)
+    parser.add_argument("--where-used", default=None,
+        help="comma separated part names: list the indexed boards that "
+             "place them instead of checking")
+    parser.add_argument("--where-refdes", default=None,
+        help="list where a reference designator is used on the indexed "
+             "boards instead of checking")
+    parser.add_argument("--missing-parts", action="store_true",
+        help="list the parts on the indexed boards that aren't in the "
+             "parts library instead of checking")
+    args = parser.parse_args(argv)
+    querying = bool(args.where_used or args.where_refdes or
+                    args.missing_parts)
+    if not args.paths and not args.serve and not querying:
+        parser.error("give some .emn paths to check, or --serve")
+    if querying and args.format == "sarif":
+        parser.error("usage queries are written as text or jsonl")
+    if args.missing_parts and args.no_library:
+        parser.error("--missing-parts needs the parts library")
+
+    try:
+        checks = emnObj.selectChecks(splitNames(args.checks),
+                                     splitNames(args.skip))
+    except ValueError as e:
+        parser.error(str(e))
+
+    #progress messages go to stderr when stdout carries jsonl or sarif
+    info = sys.stdout
+    if args.format != "text" and not args.output:
+        info = sys.stderr
+
+    def log(message):
+        print(message, file=info)
+
+    #the library loads on a thread of its own and can say something at
+    #  any time, in the middle of a file's errors, so it goes to stderr
+    def libraryLog(message):
+        print(message, file=sys.stderr)
+
+    profile = idfProfile.runProfile()
+    if args.no_library or (querying and not args.missing_parts):
+        partsLibrary = libIndex.libIndex()
+    else:
+        partsLibrary = startLibraryLoad(args.library or LIB_PATHS,
+                                        args.library_timeout,
+                                        args.library_snapshot, profile,
+                                        libraryLog)
+
+    if args.serve:
+        #checkServer imports this module, which would load a second copy
+        #  of it when run as a script, so it is only imported to serve
+        import checkServer
+        libPaths = args.library or LIB_PATHS
+        findLibFiles = None
+        if not args.no_library:
+            findLibFiles = lambda: findLibraryFiles(libPaths)
+        server = checkServer.checkServer(partsLibrary, findLibFiles,
+            lambda: importLibrary(libPaths, log=lambda message: None),
+            checks, args.jobs, args.emp, args.line_numbers,
+            args.library_poll, args.library_snapshot, log)
+        server.serve(args.host, args.port)
+        return EXIT_CLEAN
+
+    if querying or args.usage_index:
+        usage = usageIndex.usageIndex(args.usage_index or USAGE_INDEX)
+        try:
+            if args.paths:
+                emnPaths = findEmnPaths(args.paths)
+                with profile.phase("usageIndex"):
+                    readCount, failures = usage.update(emnPaths, args.jobs)
+                for failure in failures:
+                    log(failure)
+                if querying:
+                    log("Indexed %d changed files, %d files in the index.\n"
+                        % (readCount, len(usage)))
+            if querying:
+                return queryUsage(usage, args, partsLibrary)
+        finally:
+            usage.close()
+
+    if args.watch:
+        print("Watching for changes, press ctrl+c to stop.\n")
+        watcher = emnWatcher.emnWatcher(lambda: findEmnPaths(args.paths),
+                                        partsLibrary, checks,
+                                        empPath=args.emp,
+                                        lineNumbers=args.line_numbers)
+        watcher.run()
+        return EXIT_CLEAN
+
+    emnPaths = findEmnPaths(args.paths)
+    if not emnPaths:
+        print("Did not find any .emn data to check.", file=info)
+        return EXIT_FAILURE
+
+    cache = None
+    if args.cache:
+        cache = resultCache.resultCache(args.cache,
+                                        args.cache_size * 1024 * 1024)
+        if args.clear_cache:
+            cache.invalidate()
+
+    exitCode = EXIT_CLEAN
+    logFile = open(args.log, "w") if args.log else None
+    outFile = open(args.output, "w") if args.output else None
+    sinks = [errorSink.makeSink(args.format, outFile or sys.stdout,
+                                emnObj.CHECKER_VERSION, emnObj.CHECK_NAMES)]
+    if logFile:
+        sinks.append(errorSink.logSink(logFile))
+    sink = errorSink.teeSink(*sinks)
+    try:
+        results = checkFiles(emnPaths, partsLibrary, checks, sink, args.jobs,
+                             cache, bool(args.profile), args.emp,
+                             args.line_numbers)
+        #records are written out as the checks find them; a file is ended
+        #  once all of its checks have run
+        for fileName, recordCount, failure, fileStats in results:
+            outputStart = time.perf_counter()
+            if "profile" in fileStats:
+                profile.addFile(fileStats["profile"])
+
+            if args.timings:
+                info.flush()
+                for name, seconds, errorCount in fileStats.get("checks", []):
+                    print("  %-20s %9.3f ms  %d errors" %
+                          (name, seconds * 1000, errorCount), file=info)
+
+            sink.endFile(fileName, failure)
+            if failure:
+                exitCode = EXIT_FAILURE
+            elif recordCount and exitCode == EXIT_CLEAN:
+                exitCode = EXIT_ERRORS
+            profile.addTime("output", time.perf_counter() - outputStart)
+    finally:
+        sink.close()
+        if outFile:
+            outFile.close()
+        if logFile:
+            logFile.close()
+        if cache is not None:
+            cache.close()
+
+    if args.profile:
+        profile.write(args.profile)
+
+    return exitCode
+
+"""
+    Answer the usage queries on the command line from a usageIndex and
+      print the parts they find, one per line (or one JSON object per
+      part with --format jsonl). Returns EXIT_ERRORS if --missing-parts
+      found any.
+"""
+def queryUsage(usage, args, partsLibrary):
+    rows = []
+    if args.where_used:
+        rows.extend(usage.whereUsed(splitNames(args.where_used)))
+    if args.where_refdes:
+        rows.extend(usage.whereRefDes(args.where_refdes))
+    missingCount = 0
+    if args.missing_parts:
+        missing = usage.missingParts(libIndex.waitForLibrary(partsLibrary))
+        missingCount = len(missing)
+        rows.extend(missing)
+
+    outFile = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for row in rows:
+            if args.format == "jsonl":
+                outFile.write(json.dumps(dict(zip(usageIndex.ROW_FIELDS,
+                                                  row)),
+                                         sort_keys=True) + "\n")
+            else:
+                outFile.write(usageIndex.formatRow(row) + "\n")
+        if not rows and args.format == "text":
+            outFile.write("Nothing in the usage index matched.\n")
+    finally:
+        if outFile is not sys.stdout:
+            outFile.close()
+
+    return EXIT_ERRORS if missingCount else EXIT_CLEAN
+
+"""
+    Check a list of .emn paths with checks from emnObj.selectChecks, in
+      order, sending each file's errorSink.errorRecords to sink as they
+      are found. sink.startFile is called before a file's records; once
+      its checks are done, (fileName, recordCount, failure, fileStats) is
+      yielded and it is up to the caller to end the file with
+      sink.endFile. jobs=1 checks in this process.
+
+    With more jobs, files are checked on a pool of worker processes,
+      which send their records back through a queue a check at a time.
+      The file whose turn it is has its records written as they arrive;
+      records of files further down the list wait until their turn.
+
+    fileStats holds the emnObj's checkTimes under "checks" and, when
+      profiling, an idfProfile.fileProfile under "profile". Files answered
+      from the cache have empty fileStats.
+
+    With a resultCache, files whose content, library, component outlines
+      and checker version match a stored result are answered from the
+      cache without being parsed; only the rest are handed to the workers.
+
+    partsLibrary can be a libIndex.libraryLoader that is still loading.
+      It is waited on before anything that needs the whole library (cache
+      keys, starting worker processes); with jobs=1 and no cache, only
+      the first library check waits for it.
+
+    Component outlines come from empPath, or from the .emp file next to
+      each .emn file when empPath is None. With lineNumbers, errors about
+      parts, shapes and drills say which line of the file they're on.
+"""
+def checkFiles(emnPaths, partsLibrary, checks, sink, jobs=None, cache=None,
+               profiling=False, empPath=None, lineNumbers=False):
+    cachedErrors = {} #path -> errors, for cache hits
+    cacheKeys = {} #path -> cache key, for cache misses
+    if cache is not None:
+        #cache keys need the library's fingerprint
+        partsLibrary = libIndex.waitForLibrary(partsLibrary)
+        for emnPath in emnPaths:
+            try:
+                with open(emnPath, "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue #let the worker report it
+            checkSet = ",".join(name for name, needs in checks)
+            componentPath = empPath or empLib.findCompanionPath(emnPath)
+            if componentPath:
+                checkSet += ":" + resultCache.fileHash(componentPath)
+            if lineNumbers:
+                checkSet += ":lines"
+            key = resultCache.makeKey(data, partsLibrary.fingerprint(),
+                                      emnObj.CHECKER_VERSION, checkSet)
+            errors = cache.get(key)
+            if errors is None:
+                cacheKeys[emnPath] = key
+            else:
+                cachedErrors[emnPath] = [
+                    errorSink.recordFromDict(fields, os.path.basename(emnPath))
+                    for fields in errors]
+
+    toCheck = [p for p in emnPaths if p not in cachedErrors]
+    pool = None
+    if jobs == 1 or not toCheck:
+        #checked in this process, so a loading library is only waited on
+        #  by the first library check
+        initWorker(partsLibrary, checks, profiling, empPath, lineNumbers)
+    else:
+        partsLibrary = libIndex.waitForLibrary(partsLibrary)
+        partsLibrary.prepareForWorkers()
+        recordQueue = multiprocessing.Queue()
+        pool = multiprocessing.Pool(jobs, initWorker,
+                                    (partsLibrary, checks, profiling,
+                                     empPath, lineNumbers, recordQueue))
+        pending = pool.map_async(streamFile, list(enumerate(toCheck)),
+                                 chunksize=1)
+        waiting = {} #index -> records that came before the file's turn
+        finished = {} #index -> (fileName, failure, fileStats)
+
+    try:
+        index = 0 #position of the next file in toCheck
+        for emnPath in emnPaths:
+            fileName = os.path.basename(emnPath)
+            fileSink = errorSink.teeSink(sink)
+            if emnPath in cacheKeys:
+                records = errorSink.recordList()
+                fileSink = errorSink.teeSink(sink, records)
+            fileSink.startFile(fileName)
+
+            if emnPath in cachedErrors:
+                for record in cachedErrors[emnPath]:
+                    fileSink.emit(record)
+                yield fileName, fileSink.count, "", {}
+                continue
+
+            if pool is None:
+                fileName, failure, fileStats = checkFile(emnPath, fileSink)
+            else:
+                for record in waiting.pop(index, ()):
+                    fileSink.emit(record)
+                while index not in finished:
+                    try:
+                        tag, batch, result = recordQueue.get(timeout=1.0)
+                    except queue.Empty:
+                        if pending.ready():
+                            pending.get() #raises what went wrong
+                        continue
+                    if result is not None:
+                        finished[tag] = result
+                    elif tag == index:
+                        for record in batch:
+                            fileSink.emit(record)
+                    else:
+                        waiting.setdefault(tag, []).extend(batch)
+                fileName, failure, fileStats = finished.pop(index)
+            index += 1
+
+            if emnPath in cacheKeys and not failure:
+                cache.put(cacheKeys[emnPath],
+                          [record.asDict() for record in records])
+            yield fileName, fileSink.count, failure, fileStats
+    finally:
+        if pool:
+            pool.terminate()
+
+#runs once in each batch worker process (and in the check server's)
+def initWorker(partsLibrary, checks, profiling=False, empPath=None,
+               lineNumbers=False, recordQueue=None):
+    global _workerLibrary, _workerChecks, _workerProfiling, _workerEmpPath
+    global _workerLineNumbers, _workerQueue
+    _workerLibrary = partsLibrary
+    _workerChecks = checks
+    _workerProfiling = profiling
+    _workerEmpPath = empPath
+    _workerLineNumbers = lineNumbers
+    _workerQueue = recordQueue
+
+"""
+    Check one file for checkFiles in a batch worker process. task is
+      (index, emnPath); the file's records go back through the worker
+      queue tagged with index, followed by (index, None, (fileName,
+      failure, fileStats)) once it is done.
+"""
+def streamFile(task):
+    index, emnPath = task
+    records = errorSink.queueSink(_workerQueue, index)
+    result = checkFile(emnPath, records)
+    records.flush()
+    _workerQueue.put((index, None, result))
+
+"""
+    Parse and check one .emn file, sending its errorSink.errorRecords to
+      sink as they're found. Returns (fileName, failure, fileStats).
+      Uses the settings initWorker was given.
+
+    data can be the text of a file that was sent instead of reading the
+      one at emnPath (which can then be None); fileName is the name its
+      records carry, the base name of emnPath by default.
+
+    When profiling, memory is traced while the file is read and checked.
+      .emp files are read through empLib's cache, so each worker parses a
+      shared .emp file once, not once per board.
+"""
+def checkFile(emnPath, sink, data=None, fileName=None):
+    if fileName is None:
+        fileName = os.path.basename(emnPath)
+    if _workerProfiling:
+        tracemalloc.start()
+    try:
+        readStart = time.perf_counter()
+        if data is None:
+            currentEmn = emnObj.emnObj(emnReader.emnReader(emnPath), fileName,
+                                       lineNumbers=_workerLineNumbers,
+                                       sink=sink, keepErrors=False)
+        else:
+            #already text, so only line endings are made the same as
+            #  open() makes them
+            with io.StringIO(data, newline=None) as f:
+                currentEmn = emnObj.emnObj(f, fileName,
+                                           lineNumbers=_workerLineNumbers,
+                                           sink=sink, keepErrors=False)
+        readTime = time.perf_counter() - readStart
+        if _workerEmpPath:
+            componentLibrary = empLib.getEmpLibrary(_workerEmpPath)
+        else:
+            componentLibrary = empLib.findCompanion(emnPath)
+        try:
+            currentEmn.runChecks(_workerChecks, _workerLibrary,
+                                 componentLibrary)
+        finally:
+            currentEmn.close()
+
+        fileStats = {"checks": currentEmn.checkTimes}
+        if _workerProfiling:
+            fileStats["profile"] = idfProfile.fileProfile(
+                currentEmn, readTime, tracemalloc.get_traced_memory()[1])
+    except OSError:
+        return fileName, "Could not access %s" % (emnPath or fileName), {}
+    except Exception as e:
+        return fileName, "Could not check %s: %s" % (emnPath or fileName,
+                                                      e), {}
+    finally:
+        if _workerProfiling:
+            tracemalloc.stop()
+
+    return fileName, "", fileStats
+
+"""
+    Turn command line arguments (files, folders and globs) into a list of
+      .emn paths, without duplicates, in a stable order.
+"""
+def findEmnPaths(args):
+    emnPaths = []
+    seen = set()
+    for arg in args:
+        if os.path.isdir(arg):
+            found = sorted(glob.glob(os.path.join(arg, "*.emn")))
+        elif any(char in arg for char in GLOB_CHARS):
+            found = sorted(glob.glob(arg))
+        else:
+            found = [arg]
+        for emnPath in found:
+            if emnPath not in seen:
+                seen.add(emnPath)
+                emnPaths.append(emnPath)
+    return emnPaths
+
+#split a comma separated command line option into a list, or None
+def splitNames(option):
+    if option is None:
+        return None
+    return [name.strip() for name in option.split(",") if name.strip()]
+
+"""
+    Write one file's errors to an open log file.
+"""
+def writeLogEntry(f, fileName, errors):
+    f.write("%s:\n" % fileName)
+    for currentError in errors:
+        f.write("%s\n" % currentError)
+    f.write("\n")
+
 #==============================================================================
 
 """
@@ -73,11 +622,8 @@ def getEmnsInFolder():
     emnObjList = []
 
     for file in glob.glob("*.emn"):
-        lineList = []
-        with open(file) as f:
-            for line in f: #read each line of the file
-                lineList.append(line)
-        newEmnObj = emnObj.emnObj(lineList,file) #build an emnObj
+        #map the file, sections are parsed as the checks need them
+        newEmnObj = emnObj.emnObj(emnReader.emnReader(file),file)
         emnObjList.append(newEmnObj) #put emnObjs in a list
 
     if emnObjList:
@@ -91,92 +637,83 @@ def getEmnsInFolder():
 """
 def getDraggedFile(userIn):
     emnObjList = []
-    lineList = []
     fileName = userIn.split('\\')[-1] #get the filename without the path
 
     if '.emn' in fileName[-4:]: 
-        with open(userIn) as f:
-            for line in f:      
-                lineList.append(line)
-        newEmnObj = emnObj.emnObj(lineList,fileName) 
+        newEmnObj = emnObj.emnObj(emnReader.emnReader(userIn),fileName)
         emnObjList.append(newEmnObj)
 
     return emnObjList
 
 """
     Check if CADSTAR part libraries are available,
-      then read all the part numbers from the library into a list.
+      then read all the part numbers from the library into a libIndex.
+
+    libPaths are tried in order (locally first, then the network).
+      The .LIB files are read on a pool of worker threads, or processes
+      if useProcesses is set. Discovery and parse times go in profile.
+
+    When the snapshot at snapshotPath was saved from .LIB files with the
+      same paths, sizes and modification times, it is used instead of
+      reading them (a libraryLoader saves new snapshots).
 """
-def importLibrary(): 
-    foundLib = True
-    libPath = ""
-    partsLib = [] #start a list of parts
+def importLibrary(libPaths=LIB_PATHS, workers=None, useProcesses=False,
+                  profile=None, log=print, snapshotPath=None): 
+    if profile is None:
+        profile = idfProfile.runProfile()
 
     #check to see if the library paths are accessible
-    #  first check locally, then check the network
-    try: 
-        libPath = r"C:\csdat\library"
-        print("Checking local drive for parts library...")
-        os.chdir(libPath)
-    except:
-        try:
-            libPath = r"\\bombay.ad.garmin.com\data\CSWIN\LIBRARY"
-            print("Checking network for parts library...")
-            os.chdir(libPath)
-        except:
-            foundLib = False
-            print(" could not find parts library.\n")
-
-    if foundLib:
-        print(" found parts library!\n")
-
-        validTopLibs = [ #valid libraries in the top level
-        '800899.LIB','900904.LIB','600799.LIB','000199.LIB',
-        '400599.LIB','905XXX.LIB','906999.LIB','200399.LIB',
-        'NOGARPN.LIB','TEMP.LIB'
-        ]
-
-        #read in top-level library parts
-        for libFile in glob.glob("*.LIB"):
-            if libFile in validTopLibs:
-                partsLib.extend(readLibFile(libFile))
-                
-        #read LIB files in LIB folders
-        for root, dirs, files in os.walk("."):
-            for dirName in dirs:
-                if (dirName != "LIBRARIAN" and
-                    dirName.startswith("LIB") or 
-                    dirName.startswith("lib")):
-                    newPath = libPath + "\\" + dirName
-                    os.chdir(newPath)
-                    for libFile in glob.glob("*.LIB"):
-                        if libFile.startswith("LIB"):
-                            partsLib.extend(readLibFile(libFile))
-
-    #go back to the folder we started in.
-    os.chdir(startDir)
-    
-    return partsLib
+    for libPath in libPaths:
+        log("Checking %s for parts library..." % libPath)
+        if os.path.isdir(libPath):
+            log(" found parts library!\n")
+            with profile.phase("libraryDiscovery"):
+                libStats = libIndex.scanLibFiles(libPath)
+                libFiles = [libFile for libFile, size, mtime in libStats]
+                snapshotKey = libIndex.snapshotKey(libStats)
+            profile.counts["libraryFiles"] = len(libFiles)
+
+            if snapshotPath:
+                with profile.phase("librarySnapshot"):
+                    try:
+                        partsLib = libIndex.loadSnapshot(snapshotPath,
+                                                         snapshotKey)
+                    except (OSError, ValueError):
+                        partsLib = None #missing, out of date or damaged
+                if partsLib is not None:
+                    profile.counts["libraryEntries"] = len(partsLib)
+                    return partsLib
+
+            with profile.phase("libraryParse"):
+                partsLib = libIndex.loadLibrary(libPath, workers,
+                                                useProcesses, libFiles)
+            partsLib.snapshotKey = snapshotKey
+            profile.counts["libraryEntries"] = len(partsLib)
+            return partsLib
+
+    log(" could not find parts library.\n")
+    return libIndex.libIndex()
+
+#the .LIB files of the first library in libPaths that is there
+def findLibraryFiles(libPaths=LIB_PATHS):
+    for libPath in libPaths:
+        if os.path.isdir(libPath):
+            return libIndex.findLibFiles(libPath)
+    return []
 
 """
-    Read a .lib file and do some conditioning to get a list of part numbers.
+    Start importLibrary on a background thread and return its
+      libIndex.libraryLoader. Progress messages go to log (none if it is
+      None); falling back to the last good copy is always reported.
 """
-def readLibFile(libFile):
-    currentLibParts = []
-
-    #all/only part numbers start with single quotes
-    for currentLine in open(libFile):
-        if currentLine.startswith("\'"):
-            currentLibParts.append(currentLine)
-
-    #remove ampersands, single quotes, whitespace, case
-    for i in range(len(currentLibParts)):
-        currentLibParts[i] = currentLibParts[i].replace("&", "")
-        currentLibParts[i] = currentLibParts[i].replace("\'", "")
-        currentLibParts[i] = currentLibParts[i].strip()
-        currentLibParts[i] = currentLibParts[i].upper()
-
-    return currentLibParts
+def startLibraryLoad(libPaths=LIB_PATHS, timeout=LIB_TIMEOUT,
+                     snapshotPath=LIB_SNAPSHOT, profile=None, log=None):
+    def load():
+        return importLibrary(libPaths, profile=profile,
+                             log=log or (lambda message: None),
+                             snapshotPath=snapshotPath)
+    return libIndex.libraryLoader(load, timeout, snapshotPath,
+                                  report=log or print)
 
 """
     Write all the parts in the partsLibrary list to a file
@@ -190,6 +727,9 @@ def libReadTest(partsLibrary):
     Run the main function
 """
 if __name__ == '__main__':
+    if len(sys.argv) > 1: #files were given, so don't prompt for anything
+        sys.exit(batchMain(sys.argv[1:]))
+
     try:
         main()
     except OSError as e:
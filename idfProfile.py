@@ -0,0 +1,85 @@
+"""
+    runProfile class:
+        ~record how long each phase of a run took (library discovery,
+          library parse, output) and how much of everything there was
+        ~collect a profile of every checked file: read time, section parse
+          times, check times, entity counts and peak memory
+        ~write it all out as a JSON report
+
+    Profiling is opt-in; when it is off, none of this is collected.
+"""
+
+import json
+import time
+import emnObj
+
+"""
+    A runProfile holds run-wide phase timings and counts, plus one entry
+      per checked file (see fileProfile).
+"""
+class runProfile:
+    def __init__(self):
+        self.phases = {} #phase name -> seconds
+        self.counts = {} #entity -> count
+        self.files = [] #fileProfile dicts
+
+    """
+        Time a block of code, adding it to a phase:
+          with profile.phase("libraryParse"): ...
+    """
+    def phase(self, name):
+        return phaseTimer(self, name)
+
+    def addTime(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def addFile(self, fileStats):
+        self.files.append(fileStats)
+        for entity, count in fileStats.get("counts", {}).items():
+            self.counts[entity] = self.counts.get(entity, 0) + count
+
+    """
+        Write the report as JSON.
+    """
+    def write(self, path):
+        report = {
+            "checkerVersion": emnObj.CHECKER_VERSION,
+            "phases": self.phases,
+            "counts": self.counts,
+            "files": self.files,
+        }
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+#adds the time spent inside a with block to a runProfile phase
+class phaseTimer:
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.startTime = time.perf_counter()
+        return self
+
+    def __exit__(self, *excInfo):
+        self.profile.addTime(self.name, time.perf_counter() - self.startTime)
+
+"""
+    Profile one checked file: how long it took to open and index, how long
+      each section took to parse and each check took to run, how many of
+      each entity it had and its peak traced memory.
+"""
+def fileProfile(currentEmn, readTime, peakMemory):
+    phases = {"fileRead": readTime}
+    for section, seconds in currentEmn.sectionTimes.items():
+        phases["parse." + section] = seconds
+    for name, seconds, errorCount in currentEmn.checkTimes:
+        phases["check." + name] = seconds
+
+    return {
+        "file": currentEmn.fileName,
+        "phases": phases,
+        "counts": currentEmn.getCounts(),
+        "errors": currentEmn.errorCount,
+        "peakMemoryBytes": peakMemory,
+    }
@@ -0,0 +1,628 @@
+"""
+    libIndex class:
+        ~store the normalized part numbers of the CADSTAR parts library
+        ~look part numbers up in constant time
+        ~remember which .LIB file each part number came from
+        ~suggest library part numbers close to one that isn't there
+
+    readLibFile:
+        ~read one .LIB file into a list of normalized part numbers
+
+    findLibFiles, loadLibrary:
+        ~find the .LIB files of a library folder and read them all in
+          parallel, without changing the working directory
+        ~libFileStats tells when those files have changed
+
+    libraryLoader class:
+        ~load the parts library on a background thread, so nothing has to
+          wait for it until a check needs it
+        ~fall back to the last library that loaded (a snapshot file) if
+          loading takes too long or fails
+
+    libSnapshot class:
+        ~a compact binary copy of the library: sorted part numbers and the
+          .LIB file of each, keyed by the paths, sizes and modification
+          times of the .LIB files it was read from
+        ~read in one go and used as it is, so a library that hasn't
+          changed since the last run loads without parsing anything
+"""
+
+import bisect
+import concurrent.futures
+import fnmatch
+import hashlib
+import itertools
+import os
+import struct
+import threading
+import time
+import similarityIndex
+from array import array
+
+#how many edits away a library part number can be and still be suggested:
+#  one typo (a swapped pair of characters counts as one edit too)
+SUGGEST_DISTANCE = 1
+#longest revision suffix a suggestion can add or take off (never more
+#  than half of the part number)
+SUFFIX_LENGTH = 4
+#characters checkLibErrors flags in part names
+INVALID_CHARACTERS = "_^"
+
+#start of every snapshot file; change the number when the layout changes
+SNAPSHOT_MAGIC = b"IDFLIB03"
+#magic, 1 in the byte order it was written in, .LIB files key, library
+#  fingerprint, part numbers, bytes of part numbers, bytes of .LIB names,
+#  bytes of the similarity index
+SNAPSHOT_HEADER = struct.Struct("=8sI20s20sIIII")
+#lookups a snapshot answers by binary search before it builds a set of
+#  its part numbers, which takes about as long as this many searches
+SNAPSHOT_LOOKUPS = 2000
+
+VALID_TOP_LIBS = ( #valid libraries in the top level
+    '800899.LIB','900904.LIB','600799.LIB','000199.LIB',
+    '400599.LIB','905XXX.LIB','906999.LIB','200399.LIB',
+    'NOGARPN.LIB','TEMP.LIB'
+)
+
+"""
+    Remove ampersands, single quotes, whitespace and case from a line of
+      a .LIB file so it can be compared to a part name.
+"""
+def normalizePartNumber(libLine):
+    partNumber = libLine.replace("&", "")
+    partNumber = partNumber.replace("\'", "")
+    partNumber = partNumber.strip()
+    return partNumber.upper()
+
+"""
+    Read a .lib file and do some conditioning to get a list of part numbers.
+"""
+def readLibFile(libFile):
+    currentLibParts = []
+
+    #all/only part numbers start with single quotes
+    with open(libFile) as f:
+        for currentLine in f:
+            if currentLine.startswith("\'"):
+                currentLibParts.append(normalizePartNumber(currentLine))
+
+    return currentLibParts
+
+"""
+    A libIndex holds every part number in the parts library, keyed to the
+      .LIB file it was read from. Part numbers are normalized once when
+      they are added, so lookups are a single hash. Part numbers that look
+      like a missing one are found through a similarityIndex.ngramIndex,
+      built the first time one is asked for.
+
+    If a part number shows up in more than one .LIB file, the first file
+      it was added from is kept.
+
+    A libIndex made from a libSnapshot looks part numbers up in the
+      snapshot until something needs all of them at once.
+"""
+class libIndex:
+    def __init__(self, snapshot=None):
+        #part number -> name of its .LIB file, or None while the parts are
+        #  only in the snapshot
+        self._sources = {} if snapshot is None else None
+        self._snapshot = snapshot
+        self._sortedParts = None #sorted part numbers, built when needed
+        self._fingerprint = None #hash of the contents, built when needed
+        self._similar = None #similarityIndex.ngramIndex, built when needed
+        self._suggestions = {} #part number -> suggestions() already given
+        #key (see snapshotKey) of the .LIB files the parts were read from
+        self.snapshotKey = None
+        self.fromSnapshot = snapshot is not None
+        if snapshot is not None:
+            self._fingerprint = snapshot.fingerprint
+            self.snapshotKey = snapshot.key
+
+    def __contains__(self, partNumber):
+        if self._sources is None:
+            return partNumber in self._snapshot
+        return partNumber in self._sources
+
+    def __len__(self):
+        if self._sources is None:
+            return len(self._snapshot)
+        return len(self._sources)
+
+    def __iter__(self):
+        if self._sources is None:
+            return iter(self._snapshot.names())
+        return iter(self._sources)
+
+    #the part number -> .LIB file dict, read out of the snapshot if need be
+    def sources(self):
+        if self._sources is None:
+            self._sources = dict(self._snapshot.items())
+            self._snapshot = None
+        return self._sources
+
+    """
+        Add a list of normalized part numbers read from libFile.
+    """
+    def addParts(self, partNumbers, libFile):
+        sources = self.sources()
+        for partNumber in partNumbers:
+            if partNumber not in sources:
+                sources[partNumber] = libFile
+        self._sortedParts = None
+        self._fingerprint = None
+        self._similar = None
+        self._suggestions = {}
+
+    """
+        Add every part number in a .LIB file.
+    """
+    def addLibFile(self, libFile):
+        self.addParts(readLibFile(libFile), libFile)
+
+    """
+        A hash of every part number and its .LIB file. Two indexes with
+          the same contents have the same fingerprint.
+    """
+    def fingerprint(self):
+        if self._fingerprint is None:
+            libHash = hashlib.sha1()
+            sources = self.sources()
+            for partNumber in self.sortedParts():
+                libHash.update(("%s\t%s\n" % (
+                    partNumber, sources[partNumber])).encode())
+            self._fingerprint = libHash.hexdigest()
+        return self._fingerprint
+
+    #the .LIB file a part number was read from, or "" if it isn't there
+    def getSource(self, partNumber):
+        if self._sources is None:
+            return self._snapshot.getSource(partNumber)
+        return self._sources.get(partNumber, "")
+
+    """
+        Guess which .LIB file a part number should have been in.
+          .LIB files hold ranges of part numbers, so the files that hold
+          its sorted neighbours are the best guess.
+    """
+    def expectedSource(self, partNumber):
+        if not len(self):
+            return ""
+        sortedParts = self.sortedParts()
+
+        i = bisect.bisect_left(sortedParts, partNumber)
+        if i > 0: #the part number just before this one
+            return self.getSource(sortedParts[i-1])
+        return self.getSource(sortedParts[i])
+
+    #the sorted part numbers
+    def sortedParts(self):
+        if self._sortedParts is None:
+            if self._sources is None: #a snapshot is already sorted
+                self._sortedParts = self._snapshot.names()
+            else:
+                self._sortedParts = sorted(self._sources)
+        return self._sortedParts
+
+    #the ngramIndex of every part number, read from the snapshot if any
+    def similarParts(self):
+        if self._similar is None:
+            if self._sources is None:
+                self._similar = self._snapshot.similarParts(
+                    self.sortedParts())
+            else:
+                self._similar = similarityIndex.ngramIndex(
+                    self.sortedParts())
+        return self._similar
+
+    """
+        Build what every worker process would otherwise build for itself
+          the first time it needs it (the ngramIndex behind suggestions),
+          before the library is handed to them. A library read from a
+          snapshot already has it, so there is nothing to do then.
+    """
+    def prepareForWorkers(self):
+        if self._sources is not None:
+            self.similarParts()
+
+    """
+        Get up to count library part numbers that look like partNumber (a
+          normalized part number that isn't in the library), closest first:
+          the ones the fewest edits (up to SUGGEST_DISTANCE) away, and ones
+          that are it with a revision suffix added or taken off.
+    """
+    def suggestions(self, partNumber, count=3):
+        key = (partNumber, count)
+        if key not in self._suggestions:
+            if not len(self) or not partNumber:
+                self._suggestions[key] = []
+                return []
+            found = dict((name, distance) for distance, name in
+                self.similarParts().nearest(partNumber, SUGGEST_DISTANCE))
+            for i in range(len(partNumber) - 1):
+                swapped = (partNumber[:i] + partNumber[i+1] + partNumber[i] +
+                           partNumber[i+2:])
+                if swapped != partNumber and swapped in self:
+                    found[swapped] = 1
+
+            #library part numbers that are it with a revision suffix added
+            #  (they sort right after it) or taken off count as one edit
+            longest = min(SUFFIX_LENGTH, len(partNumber) // 2)
+            sortedParts = self.sortedParts()
+            i = bisect.bisect_right(sortedParts, partNumber)
+            for name in sortedParts[i:i + count]:
+                if (name.startswith(partNumber) and
+                    len(name) - len(partNumber) <= longest):
+                    found[name] = 1
+            for end in range(len(partNumber) - longest, len(partNumber)):
+                if partNumber[:end] in self:
+                    found[partNumber[:end]] = 1
+
+            self._suggestions[key] = [name for distance, name in
+                sorted((distance, name) for name, distance in found.items())
+                ][:count]
+        return self._suggestions[key]
+
+    """
+        Find a library part number that partNumber only differs from in the
+          characters checkLibErrors flags as invalid: one with some other
+          character wherever partNumber has a flagged one, or partNumber
+          with them (and a "_CC" suffix) left out. Returns "" if there
+          isn't one.
+    """
+    def flaggedMatch(self, partNumber):
+        if not len(self):
+            return ""
+        for candidate in (partNumber[:-3] if partNumber.endswith("_CC")
+                          else None,
+                          "".join(char for char in partNumber
+                                  if char not in INVALID_CHARACTERS)):
+            if candidate and candidate in self:
+                return candidate
+        matches = self.similarParts().wildcardMatches(partNumber,
+                                                      INVALID_CHARACTERS)
+        return matches[0] if matches else ""
+
+    """
+        Write every part number and its .LIB file to a snapshot file (see
+          libSnapshot), keyed by snapshotKey. The file is written next to
+          path and then moved into place, so a reader never sees half of
+          it.
+    """
+    def saveSnapshot(self, path):
+        sources = self.sources()
+        partNumbers = self.sortedParts()
+        libFiles = sorted(set(sources.values()))
+        libFileIds = {libFile: i for i, libFile in enumerate(libFiles)}
+
+        names = [partNumber.encode() + b"\n" for partNumber in partNumbers]
+        offsets = array("I", [0])
+        offsets.extend(itertools.accumulate(map(len, names)))
+        ids = array("I", [libFileIds[sources[partNumber]]
+                          for partNumber in partNumbers])
+        names = b"".join(names)
+        libNames = "\n".join(libFiles).encode()
+        similar = self.similarParts().toBytes()
+
+        tempPath = "%s.%d.tmp" % (path, os.getpid())
+        with open(tempPath, "wb") as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, 1,
+                self.snapshotKey or bytes(20),
+                bytes.fromhex(self.fingerprint()), len(partNumbers),
+                len(names), len(libNames), len(similar)))
+            f.write(offsets.tobytes())
+            f.write(ids.tobytes())
+            f.write(names)
+            f.write(libNames)
+            f.write(similar)
+        os.replace(tempPath, path)
+
+"""
+    A libSnapshot reads the parts library out of the bytes of a snapshot
+      file. The file is laid
+      out so nothing has to be parsed to use it:
+        SNAPSHOT_HEADER
+        offset of every part number, and the end of the last (uint32)
+        number of the .LIB file of every part number (uint32)
+        the sorted part numbers, one per line
+        the .LIB file names, one per line
+        the similarityIndex.ngramIndex of the part numbers (see toBytes)
+      Part numbers are looked up by binary search on their UTF-8 bytes,
+      which sort the same way the strings do, until there have been
+      SNAPSHOT_LOOKUPS of them; a set of them all is quicker from then on.
+
+    Raises ValueError if the contents aren't a whole snapshot.
+"""
+class libSnapshot:
+    def __init__(self, data):
+        self._data = data
+        if len(data) < SNAPSHOT_HEADER.size:
+            raise ValueError("Not a parts library snapshot.")
+        (magic, byteOrder, self.key, fingerprint, count, namesSize,
+         libNamesSize, similarSize) = SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC or byteOrder != 1:
+            raise ValueError("Not a parts library snapshot.")
+        self.fingerprint = fingerprint.hex()
+        start = SNAPSHOT_HEADER.size
+        namesStart = start + 8 * count + 4
+        libNamesStart = namesStart + namesSize
+        similarStart = libNamesStart + libNamesSize
+        if similarStart + similarSize != len(data):
+            raise ValueError("Parts library snapshot is cut short.")
+
+        view = memoryview(data)
+        self._offsets = view[start:start + 4 * (count + 1)].cast("I")
+        self._ids = view[start + 4 * (count + 1):namesStart].cast("I")
+        self._namesStart = namesStart
+        self._namesEnd = libNamesStart
+        self._libFiles = data[libNamesStart:similarStart].decode().split(
+            "\n")
+        self._similarStart = similarStart
+        self._lookups = 0 #part numbers looked up so far
+        self._nameSet = None #every part number, once lookups are many
+
+    def __contains__(self, partNumber):
+        if self._nameSet is None:
+            self._lookups += 1
+            if self._lookups <= SNAPSHOT_LOOKUPS:
+                return self.find(partNumber) >= 0
+            self._nameSet = set(self.names())
+        return partNumber in self._nameSet
+
+    def __len__(self):
+        return len(self._ids)
+
+    #the snapshot goes to worker processes as the bytes of the file
+    def __reduce__(self):
+        return (libSnapshot, (bytes(self._data),))
+
+    #the position of a part number, or -1 if it isn't there
+    def find(self, partNumber):
+        key = partNumber.encode()
+        data = self._data
+        offsets = self._offsets
+        start = self._namesStart
+        low = 0
+        high = len(self._ids)
+        while low < high:
+            middle = (low + high) // 2
+            if data[start + offsets[middle]:
+                    start + offsets[middle + 1] - 1] < key:
+                low = middle + 1
+            else:
+                high = middle
+        if (low < len(self._ids) and
+            data[start + offsets[low]:start + offsets[low + 1] - 1] == key):
+            return low
+        return -1
+
+    #the .LIB file a part number was read from, or "" if it isn't there
+    def getSource(self, partNumber):
+        i = self.find(partNumber)
+        return self._libFiles[self._ids[i]] if i >= 0 else ""
+
+    #every part number, sorted
+    def names(self):
+        return self._data[self._namesStart:self._namesEnd].decode().split(
+            "\n")[:-1]
+
+    #the ngramIndex saved with the snapshot, of names (its part numbers)
+    def similarParts(self, names):
+        return similarityIndex.ngramIndex(names,
+                                          self._data[self._similarStart:])
+
+    #(part number, .LIB file) pairs
+    def items(self):
+        libFiles = self._libFiles
+        return zip(self.names(), (libFiles[i] for i in self._ids))
+
+"""
+    Get the key a snapshot of the library read from some .LIB files is
+      saved under, from their libFileStats.
+"""
+def snapshotKey(libStats):
+    keyHash = hashlib.sha1()
+    for libFile, size, mtime in libStats:
+        keyHash.update(("%s\t%d\t%r\n" % (libFile, size, mtime)).encode())
+    return keyHash.digest()
+
+"""
+    Read a libIndex back from a snapshot file written by saveSnapshot.
+      With a key, raises ValueError unless the snapshot was saved under
+      it, which is found out from the header alone.
+
+    The file is read into memory rather than mapped, so it isn't held
+      open while the library is in use; Windows won't replace a file that
+      is mapped, and a newer snapshot has to be able to take its place.
+"""
+def loadSnapshot(path, key=None):
+    with open(path, "rb") as f:
+        data = f.read(SNAPSHOT_HEADER.size)
+        if (key is not None and len(data) == SNAPSHOT_HEADER.size and
+            SNAPSHOT_HEADER.unpack(data)[2] != key):
+            raise ValueError("Parts library snapshot is out of date.")
+        data += f.read()
+    snapshot = libSnapshot(data)
+    if key is not None and snapshot.key != key:
+        raise ValueError("Parts library snapshot is out of date.")
+    return libIndex(snapshot)
+
+"""
+    List the .LIB files to read from a library folder: the valid top-level
+      libraries, then the LIB*.LIB files in each LIB* folder.
+      Paths come back sorted, so every load reads files in the same order.
+"""
+def findLibFiles(libPath):
+    return [libFile for libFile, size, mtime in scanLibFiles(libPath)]
+
+"""
+    List the .LIB files of a library folder the way findLibFiles does,
+      as (path, size, modification time) like libFileStats. The sizes and
+      times come from the folder listing, which on Windows costs nothing
+      more, even on a network share.
+"""
+def scanLibFiles(libPath):
+    topFiles = []
+    libDirs = []
+
+    for entry in os.scandir(libPath):
+        if entry.is_dir():
+            if ((entry.name != "LIBRARIAN" and entry.name.startswith("LIB")) or
+                entry.name.startswith("lib")):
+                libDirs.append(entry.path)
+        elif (fnmatch.fnmatch(entry.name, "*.LIB") and
+              entry.name in VALID_TOP_LIBS):
+            topFiles.append(entry)
+
+    libFiles = sorted(topFiles, key=lambda entry: entry.path)
+    for libDir in sorted(libDirs):
+        libFiles.extend(sorted(
+            (entry for entry in os.scandir(libDir)
+             if (entry.is_file() and fnmatch.fnmatch(entry.name, "*.LIB")
+                 and entry.name.startswith("LIB"))),
+            key=lambda entry: entry.path))
+
+    stats = []
+    for entry in libFiles:
+        stat = entry.stat()
+        stats.append((entry.path, stat.st_size, stat.st_mtime))
+    return stats
+
+"""
+    Get (path, size, modification time) for each of libFiles that is
+      there. The list changes whenever a .LIB file is added, removed or
+      written, so it tells when a library has to be read again.
+"""
+def libFileStats(libFiles):
+    stats = []
+    for libFile in libFiles:
+        try:
+            stat = os.stat(libFile)
+        except OSError:
+            continue
+        stats.append((libFile, stat.st_size, stat.st_mtime))
+    return stats
+
+"""
+    Read every .LIB file in a library folder into a libIndex.
+
+    Files are read and parsed on a pool of worker threads (or processes,
+      if useProcesses is set), then merged in the order findLibFiles gives,
+      so the result doesn't depend on which file finishes first.
+      Parts are keyed to their .LIB file's path relative to libPath.
+      libFiles can be passed in if findLibFiles has already been run.
+"""
+def loadLibrary(libPath, workers=None, useProcesses=False, libFiles=None):
+    partsLib = libIndex()
+    if libFiles is None:
+        libFiles = findLibFiles(libPath)
+
+    if useProcesses:
+        executor = concurrent.futures.ProcessPoolExecutor(workers)
+    else:
+        executor = concurrent.futures.ThreadPoolExecutor(workers)
+
+    with executor:
+        for libFile, partNumbers in zip(libFiles,
+                                        executor.map(readLibFile, libFiles)):
+            partsLib.addParts(partNumbers, os.path.relpath(libFile, libPath))
+
+    return partsLib
+
+"""
+    A libraryLoader runs load (a function that returns a libIndex) on a
+      background thread as soon as it is made. result() waits for it, but
+      only until timeout seconds after the load started.
+
+    When the load finishes in time with some parts in it, that library is
+      used and saved to snapshotPath as the last good copy (unless it was
+      read from that copy). When it takes
+      too long, fails, or finds no library, the snapshot is used instead,
+      or an empty libIndex if there is no snapshot. report (if given) is
+      called with a message whenever the loaded library isn't used.
+
+    result() always gives the same answer once it has been called, so
+      every file in a run is checked against the same library.
+"""
+class libraryLoader:
+    def __init__(self, load, timeout=None, snapshotPath=None, report=None):
+        self.timeout = timeout #seconds, or None to wait as long as it takes
+        self.snapshotPath = snapshotPath
+        self.report = report
+        self.usedSnapshot = False #whether result() fell back to the snapshot
+        self._load = load
+        self._loaded = None #the libIndex the thread loaded
+        self._error = None #what the thread raised, if anything
+        self._result = None
+        self._lock = threading.Lock()
+        self._startTime = time.monotonic()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    #runs on the background thread
+    def run(self):
+        try:
+            self._loaded = self._load()
+        except Exception as e:
+            self._error = e
+            return
+        if (self.snapshotPath and len(self._loaded) and
+            not self._loaded.fromSnapshot):
+            try:
+                self._loaded.saveSnapshot(self.snapshotPath)
+            except OSError:
+                pass #the library is fine, it just won't be there next time
+
+    """
+        Wait for the library (up to the timeout) and return it, or the
+          fallback.
+    """
+    def result(self):
+        with self._lock:
+            if self._result is None:
+                self._result = self.decide()
+            return self._result
+
+    def decide(self):
+        if self.timeout is None:
+            self._thread.join()
+        else:
+            self._thread.join(max(0.0, self._startTime + self.timeout -
+                                  time.monotonic()))
+
+        if self._thread.is_alive():
+            reason = ("Parts library took longer than %g seconds to load" %
+                      self.timeout)
+        elif self._error is not None:
+            reason = "Could not load parts library (%s)" % self._error
+        elif not len(self._loaded):
+            reason = "Did not find a parts library"
+        else:
+            return self._loaded
+
+        if self.snapshotPath and os.path.isfile(self.snapshotPath):
+            try:
+                snapshot = loadSnapshot(self.snapshotPath)
+            except (OSError, ValueError):
+                pass
+            else:
+                self.usedSnapshot = True
+                self.tell("%s, using the copy saved %s." % (reason,
+                    time.strftime("%Y-%m-%d %H:%M", time.localtime(
+                        os.path.getmtime(self.snapshotPath)))))
+                return snapshot
+
+        self.tell("%s, skipping the parts library checks." % reason)
+        return self._loaded if self._loaded is not None else libIndex()
+
+    def tell(self, message):
+        if self.report:
+            self.report(message)
+
+"""
+    Get a libIndex out of partsLibrary, waiting for it if it is a
+      libraryLoader.
+"""
+def waitForLibrary(partsLibrary):
+    if isinstance(partsLibrary, libraryLoader):
+        return partsLibrary.result()
+    return partsLibrary
@@ -0,0 +1,105 @@
+"""
+    resultCache class:
+        ~remember the errors found in a .emn file between runs
+        ~entries are keyed by the file content, the parts library and the
+          checker version, so a hit can skip parsing and checking entirely
+        ~the cache is capped in size and evicts least recently used entries
+
+    The cache is a small SQLite database.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024 #64MB of stored error text
+
+"""
+    Build a cache key from everything that decides a file's errors.
+"""
+def makeKey(data, libFingerprint, checkerVersion, checkSet="all"):
+    keyHash = hashlib.sha1(data)
+    for part in (libFingerprint, checkerVersion, checkSet):
+        keyHash.update(b"\0" + part.encode())
+    return keyHash.hexdigest()
+
+#hash a file's contents
+def fileHash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+"""
+    A resultCache stores each file's error list as JSON in a SQLite
+      database at dbPath. Every get or put marks an entry as used; once
+      the stored errors pass maxBytes, the least recently used entries
+      are removed.
+"""
+class resultCache:
+    def __init__(self, dbPath, maxBytes=DEFAULT_MAX_BYTES):
+        self.dbPath = dbPath
+        self.maxBytes = maxBytes
+        self._db = sqlite3.connect(dbPath)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, errors TEXT, size INTEGER, lastUsed REAL)")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS resultsByUse ON results (lastUsed)")
+        self._db.commit()
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    """
+        Get the errors stored under key, or None if there aren't any.
+    """
+    def get(self, key):
+        row = self._db.execute(
+            "SELECT errors FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        self._db.execute("UPDATE results SET lastUsed = ? WHERE key = ?",
+                         (time.time(), key))
+        self._db.commit()
+        return json.loads(row[0])
+
+    """
+        Store a file's errors under key, then evict old entries if the
+          cache has grown past maxBytes.
+    """
+    def put(self, key, errors):
+        text = json.dumps(errors)
+        self._db.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+            (key, text, len(text), time.time()))
+        self.evict()
+        self._db.commit()
+
+    #remove least recently used entries until the cache fits
+    def evict(self):
+        total = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.maxBytes:
+            return
+
+        rows = self._db.execute(
+            "SELECT key, size FROM results ORDER BY lastUsed")
+        oldKeys = []
+        for key, size in rows:
+            if total <= self.maxBytes:
+                break
+            oldKeys.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM results WHERE key = ?", oldKeys)
+
+    """
+        Throw away every stored result.
+    """
+    def invalidate(self):
+        self._db.execute("DELETE FROM results")
+        self._db.commit()
+        self._db.execute("VACUUM")
+
+    def close(self):
+        self._db.close()
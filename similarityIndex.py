@@ -0,0 +1,283 @@
+"""
+    ngramIndex class:
+        ~an inverted index from every 3 character piece (trigram) of a list
+          of names, and where in the name it is, to the names that have it
+        ~finds the names within a few edits of a query without comparing
+          it to every name: only names that share a whole stretch of the
+          query, in about the same place, are compared in full
+        ~can be written out as bytes and read back without rebuilding it
+
+    editDistance:
+        ~count the single character inserts, deletes and changes between
+          two strings, giving up early past a limit (and only looking for
+          one difference when the limit is one)
+"""
+
+import bisect
+import struct
+from array import array
+
+GRAM_SIZE = 3
+
+#start of ngramIndex.toBytes(): (trigram, position) keys, bytes of their
+#  text, name lengths
+NGRAM_HEADER = struct.Struct("=III")
+
+"""
+    Count the edits between a and b, or return limit + 1 as soon as it is
+      clear there are more than limit of them (limit None never gives up).
+      With a limit, only the cells of the usual table within limit of its
+      diagonal are worked out, since no path through the others can be
+      short enough.
+"""
+def editDistance(a, b, limit=None):
+    if limit is None:
+        limit = max(len(a), len(b))
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if limit <= 1:
+        return min(oneEditDistance(a, b), limit + 1)
+    tooFar = limit + 1
+    previous = [j if j <= limit else tooFar for j in range(len(b) + 1)]
+    for i, charA in enumerate(a, 1):
+        current = [tooFar] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        rowBest = current[0]
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            cost = previous[j-1] if charA == b[j-1] else previous[j-1] + 1
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j-1] + 1 < cost:
+                cost = current[j-1] + 1
+            current[j] = cost
+            if cost < rowBest:
+                rowBest = cost
+        if rowBest > limit:
+            return tooFar
+        previous = current
+    return min(previous[-1], tooFar)
+
+"""
+    Count the edits between a and b if there are no more than one, or
+      return 2. With one edit there is either one changed character (the
+      same length) or one extra character, which is found by comparing
+      what is left after the first difference.
+"""
+def oneEditDistance(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    if len(b) - len(a) > 1:
+        return 2
+    for i, (charA, charB) in enumerate(zip(a, b)):
+        if charA != charB:
+            if len(a) == len(b):
+                return 1 if a[i+1:] == b[i+1:] else 2
+            return 1 if a[i:] == b[i+1:] else 2
+    return len(b) - len(a)
+
+"""
+    Split a string into count stretches as even as possible, as
+      (start, stretch) pairs. Returns None if a stretch would be shorter
+      than a trigram.
+"""
+def splitStretches(text, count):
+    size, extra = divmod(len(text), count)
+    if size < GRAM_SIZE:
+        return None
+    stretches = []
+    start = 0
+    for i in range(count):
+        end = start + size + (1 if i < extra else 0)
+        stretches.append((start, text[start:end]))
+        start = end
+    return stretches
+
+#whether a sorted array holds a number
+def sortedContains(numbers, number):
+    i = bisect.bisect_left(numbers, number)
+    return i < len(numbers) and numbers[i] == number
+
+"""
+    Get the numbers that are in every one of some sorted posting arrays.
+      The shortest ones are intersected first, and long ones are searched
+      rather than walked, so a common trigram costs next to nothing.
+"""
+def intersectPostings(postingLists):
+    postingLists = sorted(postingLists, key=len)
+    found = set(postingLists[0])
+    for postings in postingLists[1:]:
+        if not found:
+            break
+        if len(postings) <= 8 * len(found):
+            found.intersection_update(postings)
+        else:
+            found = {number for number in found
+                     if sortedContains(postings, number)}
+    return found
+
+"""
+    An ngramIndex holds a list of names and, for every (trigram, position)
+      in them, the numbers of the names that have that trigram there, as
+      sorted typed arrays (to keep a big library small). Names too short
+      to split up are also kept by length.
+
+    data can be what toBytes() gave for an index of the same names, which
+      is read back instead of building the index again.
+"""
+class ngramIndex:
+    def __init__(self, names, data=None):
+        self.names = list(names)
+        self._grams = {} #(trigram, position) -> array of name numbers
+        self._lengths = {} #name length -> array of name numbers
+        if data is not None:
+            self.readBytes(data)
+            return
+        for number, name in enumerate(self.names):
+            for position in range(len(name) - GRAM_SIZE + 1):
+                key = (name[position:position+GRAM_SIZE], position)
+                postings = self._grams.get(key)
+                if postings is None:
+                    postings = self._grams[key] = array('i')
+                postings.append(number)
+            postings = self._lengths.get(len(name))
+            if postings is None:
+                postings = self._lengths[len(name)] = array('i')
+            postings.append(number)
+
+    def __len__(self):
+        return len(self.names)
+
+    """
+        The index as bytes, for keeping in a file: NGRAM_HEADER, the keys
+          as "trigram<tab>position" lines, the name lengths (uint32), where
+          the postings of each key and then each length start, and the end
+          of the last (uint32), then all of the postings (int32).
+    """
+    def toBytes(self):
+        keys = sorted(self._grams)
+        keyText = "".join("%s\t%d\n" % key for key in keys).encode()
+        lengths = array('I', sorted(self._lengths))
+        offsets = array('I', [0])
+        postings = array('i')
+        for key in keys:
+            postings.extend(self._grams[key])
+            offsets.append(len(postings))
+        for length in lengths:
+            postings.extend(self._lengths[length])
+            offsets.append(len(postings))
+        return b"".join((NGRAM_HEADER.pack(len(keys), len(keyText),
+                                           len(lengths)),
+                         keyText, lengths.tobytes(), offsets.tobytes(),
+                         postings.tobytes()))
+
+    #fill the index in from what toBytes() gave
+    def readBytes(self, data):
+        keyCount, keyTextSize, lengthCount = NGRAM_HEADER.unpack_from(data)
+        start = NGRAM_HEADER.size
+        keys = bytes(data[start:start + keyTextSize]).decode().split("\n")
+        start += keyTextSize
+        lengths = array('I')
+        lengths.frombytes(data[start:start + 4 * lengthCount])
+        start += 4 * lengthCount
+        offsets = array('I')
+        offsets.frombytes(data[start:start + 4 * (keyCount + lengthCount + 1)])
+        start += 4 * (keyCount + lengthCount + 1)
+        postings = array('i')
+        postings.frombytes(data[start:])
+        if len(postings) != offsets[-1]:
+            raise ValueError("Similarity index is cut short.")
+
+        for i, key in enumerate(keys[:keyCount]):
+            gram, position = key.rsplit("\t", 1)
+            self._grams[(gram, int(position))] = postings[offsets[i]:
+                                                          offsets[i+1]]
+        for i, length in enumerate(lengths, keyCount):
+            self._lengths[length] = postings[offsets[i]:offsets[i+1]]
+
+    """
+        Get the numbers of the names that have text at start (shifted by
+          up to shift characters either way).
+    """
+    def namesWith(self, text, start, shift=0):
+        found = set()
+        for offset in range(-shift, shift + 1):
+            position = start + offset
+            if position < 0:
+                continue
+            postingLists = []
+            for i in range(len(text) - GRAM_SIZE + 1):
+                postings = self._grams.get((text[i:i+GRAM_SIZE], position + i))
+                if not postings:
+                    break
+                postingLists.append(postings)
+            else:
+                found.update(intersectPostings(postingLists))
+        return found
+
+    #numbers of the names whose lengths are within spread of length
+    def namesOfLength(self, length, spread=0):
+        found = []
+        for nameLength in range(length - spread, length + spread + 1):
+            found.extend(self._lengths.get(nameLength, ()))
+        return found
+
+    """
+        Find the names closest to query, as (distance, name) pairs,
+          alphabetically: the ones the fewest edits away, as long as that
+          is no more than maxDistance.
+
+        A name within d edits keeps at least one of d + 1 stretches of the
+          query untouched, moved by at most d places, so only names that
+          have one of them are compared in full. Closer distances are
+          tried first, and farther ones only if nothing was found.
+    """
+    def nearest(self, query, maxDistance=2, count=None):
+        found = []
+        for distance in range(maxDistance + 1):
+            stretches = splitStretches(query, distance + 1)
+            if stretches is None:
+                candidates = self.namesOfLength(len(query), distance)
+            else:
+                candidates = set()
+                for start, stretch in stretches:
+                    candidates.update(self.namesWith(stretch, start,
+                                                     distance))
+            for number in candidates:
+                name = self.names[number]
+                nameDistance = editDistance(query, name, distance)
+                if nameDistance <= distance:
+                    found.append((nameDistance, name))
+            if found:
+                break
+
+        found.sort()
+        return found[:count] if count is not None else found
+
+    """
+        Find the names that match pattern at every position except the
+          ones where pattern has one of wildcards, where any character
+          will do. Returns them sorted.
+    """
+    def wildcardMatches(self, pattern, wildcards):
+        postingLists = []
+        for position in range(len(pattern) - GRAM_SIZE + 1):
+            gram = pattern[position:position+GRAM_SIZE]
+            if not any(char in wildcards for char in gram):
+                postings = self._grams.get((gram, position))
+                if not postings:
+                    return []
+                postingLists.append(postings)
+        if postingLists:
+            candidates = intersectPostings(postingLists)
+        else: #too short, or too many wildcards, to look up any other way
+            candidates = self.namesOfLength(len(pattern))
+
+        found = []
+        for number in candidates:
+            name = self.names[number]
+            if len(name) == len(pattern) and all(
+                charP == charN or charP in wildcards
+                for charP, charN in zip(pattern, name)):
+                found.append(name)
+        return sorted(found)
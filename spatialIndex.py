@@ -0,0 +1,507 @@
+"""
+    gridIndex class:
+        ~a uniform grid of buckets for finding things near a point or box
+        ~items are stored by bounding box, so a lookup only looks at the
+          items in the cells it touches instead of every item
+
+    pointInLoops:
+        ~check whether a point is inside a shape's outline and cutouts
+
+    flattenLoop, loopCrossings:
+        ~turn the arcs of a loop into short straight edges
+        ~find where loops cross or touch themselves and each other by
+          sweeping across them, so only edges that overlap along the
+          sweep are ever compared
+
+    loopEdges class:
+        ~tell whether a shape overlaps another one, or holds all of it,
+          comparing the other shape's edges only to the edges near them
+"""
+
+import heapq
+import math
+
+#most straight edges a flattened arc (or circle) is split into
+MAX_ARC_SEGMENTS = 64
+#most active edges a loopCrossings sweep looks through one by one before
+#  it keeps them ordered by y instead
+SWEEP_SCAN_LIMIT = 128
+
+"""
+    Pick a grid cell size for count items spread over a width x height
+      area, so that each cell holds a handful of items on average. The cell
+      is never smaller than minSize.
+"""
+def chooseCellSize(width, height, count, minSize=0.0):
+    area = max(width * height, 1e-12)
+    cellSize = math.sqrt(area / max(count, 1)) * 2
+    return max(cellSize, minSize, 1e-6)
+
+"""
+    A gridIndex maps integer (column, row) cells to the items whose
+      bounding boxes touch them. Items are any hashable ids.
+"""
+class gridIndex:
+    def __init__(self, cellSize):
+        self.cellSize = float(cellSize)
+        self._cells = {} #(column, row) -> list of item ids
+
+    def cellRange(self, minX, minY, maxX, maxY):
+        size = self.cellSize
+        return (range(int(math.floor(minX / size)),
+                      int(math.floor(maxX / size)) + 1),
+                range(int(math.floor(minY / size)),
+                      int(math.floor(maxY / size)) + 1))
+
+    """
+        Add an item with a bounding box.
+    """
+    def insert(self, item, minX, minY, maxX, maxY):
+        columns, rows = self.cellRange(minX, minY, maxX, maxY)
+        for column in columns:
+            for row in rows:
+                self._cells.setdefault((column, row), []).append(item)
+
+    """
+        Get the items whose cells contain a point. These are candidates;
+          the caller still has to check them exactly.
+    """
+    def queryPoint(self, x, y):
+        size = self.cellSize
+        return self._cells.get((int(math.floor(x / size)),
+                                int(math.floor(y / size))), ())
+
+    """
+        Get the items whose cells touch a box, each one once.
+    """
+    def queryBox(self, minX, minY, maxX, maxY):
+        found = set()
+        columns, rows = self.cellRange(minX, minY, maxX, maxY)
+        for column in columns:
+            for row in rows:
+                found.update(self._cells.get((column, row), ()))
+        return found
+
+"""
+    Check whether (x, y) is inside a shape, given its loops as lists of
+      [cutout,x,y,arc] points. Every loop counts (even-odd rule), so a
+      point inside a cutout is outside the shape. A 2 point loop with a
+      360 degree arc is a circle around its first point. Other arcs are
+      treated as straight edges.
+"""
+def pointInLoops(x, y, loops):
+    inside = False
+    for loop in loops:
+        if len(loop) == 2 and loop[1][3] == 360:
+            radius = math.hypot(loop[1][1] - loop[0][1],
+                                loop[1][2] - loop[0][2])
+            if math.hypot(x - loop[0][1], y - loop[0][2]) <= radius:
+                inside = not inside
+        elif len(loop) >= 3:
+            if pointInPolygon(x, y, loop):
+                inside = not inside
+    return inside
+
+#ray casting test against one closed polygon
+def pointInPolygon(x, y, loop):
+    inside = False
+    x1, y1 = loop[-1][1], loop[-1][2]
+    for point in loop:
+        x2, y2 = point[1], point[2]
+        if (y2 > y) != (y1 > y):
+            crossX = x2 + (y - y2) * (x1 - x2) / (y1 - y2)
+            if x < crossX:
+                inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+"""
+    Get the bounding box of a shape's loops as (minX, minY, maxX, maxY),
+      counting the full circle of 360 degree loops.
+"""
+def loopsBounds(loops):
+    xs = []
+    ys = []
+    for loop in loops:
+        if len(loop) == 2 and loop[1][3] == 360:
+            radius = math.hypot(loop[1][1] - loop[0][1],
+                                loop[1][2] - loop[0][2])
+            xs.extend((loop[0][1] - radius, loop[0][1] + radius))
+            ys.extend((loop[0][2] - radius, loop[0][2] + radius))
+        else:
+            xs.extend(point[1] for point in loop)
+            ys.extend(point[2] for point in loop)
+    if not xs:
+        return None
+    return min(xs), min(ys), max(xs), max(ys)
+
+"""
+    Get the number of straight edges that keep an arc of some radius and
+      sweep (radians) within tolerance of the true arc, up to
+      MAX_ARC_SEGMENTS.
+"""
+def arcSegments(radius, sweep, tolerance):
+    if radius > tolerance:
+        step = 2 * math.acos(1 - tolerance / radius)
+    else:
+        step = math.pi
+    return min(MAX_ARC_SEGMENTS, max(1, int(math.ceil(abs(sweep) / step))))
+
+"""
+    Get the points between the ends of an arc, for the arc that ends at
+      point end (its fourth field is the angle, counterclockwise degrees)
+      and starts at point start.
+"""
+def arcPoints(start, end, tolerance):
+    x0, y0, x1, y1 = start[1], start[2], end[1], end[2]
+    sweep = math.radians(end[3])
+    chord = math.hypot(x1 - x0, y1 - y0)
+    half = sweep / 2
+    if chord == 0 or math.sin(half) == 0:
+        return []
+
+    #the center is off the middle of the chord, to the left for
+    #  counterclockwise arcs under 180 degrees
+    offset = chord / 2 / math.tan(half)
+    cx = (x0 + x1) / 2 - (y1 - y0) / chord * offset
+    cy = (y0 + y1) / 2 + (x1 - x0) / chord * offset
+    radius = abs(chord / 2 / math.sin(half))
+    count = arcSegments(radius, sweep, tolerance)
+    startAngle = math.atan2(y0 - cy, x0 - cx)
+    return [(end[0], cx + radius * math.cos(startAngle + sweep * k / count),
+             cy + radius * math.sin(startAngle + sweep * k / count), 0.0)
+            for k in range(1, count)]
+
+"""
+    Flatten a loop of [cutout,x,y,arc] points into straight edges: each
+      arc is split into as few edges as keep it within tolerance (see
+      arcSegments). A 2 point loop with a 360 degree arc becomes a closed
+      polygon around its first point. Returns (cutout, x, y, 0) points.
+"""
+def flattenLoop(loop, tolerance):
+    if len(loop) == 2 and loop[1][3] == 360:
+        cutout, cx, cy = loop[0][0], loop[0][1], loop[0][2]
+        radius = math.hypot(loop[1][1] - cx, loop[1][2] - cy)
+        startAngle = math.atan2(loop[1][2] - cy, loop[1][1] - cx)
+        count = max(3, arcSegments(radius, math.tau, tolerance))
+        points = [(cutout, cx + radius * math.cos(startAngle +
+                                                  math.tau * k / count),
+                   cy + radius * math.sin(startAngle + math.tau * k / count),
+                   0.0) for k in range(count)]
+        points.append(points[0])
+        return points
+
+    points = []
+    for i, point in enumerate(loop):
+        if i and point[3] and abs(point[3]) < 360:
+            points.extend(arcPoints(loop[i-1], point, tolerance))
+        points.append((point[0], point[1], point[2], 0.0))
+    return points
+
+"""
+    Find where two straight edges a-b and c-d meet, as an (x, y) point or
+      None. Edges that lie along each other give the first point they
+      share. Neighbouring edges of a loop (adjacent) always share an end,
+      so for them only doubling back along each other counts.
+"""
+def edgeCrossing(ax, ay, bx, by, cx, cy, dx, dy, adjacent=False):
+    #which side of each edge the other edge's ends are on
+    sideA = (dx - cx) * (ay - cy) - (dy - cy) * (ax - cx)
+    sideB = (dx - cx) * (by - cy) - (dy - cy) * (bx - cx)
+    if (sideA > 0 and sideB > 0) or (sideA < 0 and sideB < 0):
+        return None
+    sideC = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+    sideD = (bx - ax) * (dy - ay) - (by - ay) * (dx - ax)
+    if (sideC > 0 and sideD > 0) or (sideC < 0 and sideD < 0):
+        return None
+
+    if sideA == 0 and sideB == 0: #along the same line
+        axis = 0 if abs(bx - ax) + abs(dx - cx) >= abs(by - ay) + \
+            abs(dy - cy) else 1
+        ends = ((ax, ay), (bx, by), (cx, cy), (dx, dy))
+        low = max(min(ends[0][axis], ends[1][axis]),
+                  min(ends[2][axis], ends[3][axis]))
+        high = min(max(ends[0][axis], ends[1][axis]),
+                   max(ends[2][axis], ends[3][axis]))
+        if low > high or (adjacent and low == high):
+            return None
+        for end in ends:
+            if end[axis] == low:
+                return end
+    if adjacent:
+        return None
+
+    t = sideA / (sideA - sideB)
+    return ax + t * (bx - ax), ay + t * (by - ay)
+
+"""
+    Find where some loops of (cutout, x, y, arc) points (flattened, see
+      flattenLoop) cross or touch themselves or each other. Returns
+      (loopA, loopB, x, y) for every pair of edges that meet, with
+      loopA <= loopB. A loop is closed when its last point is its first.
+
+    The edges are swept across from left to right. An edge stays active
+      from its left end to its right end, and each new edge is only
+      compared to the active edges that overlap it top to bottom. While
+      few edges are active at once, as on most outlines, they are simply
+      looked through; while many are, they are found through the active
+      edges ordered by y (see activeEdges). Either way each edge costs
+      O(log n) plus the edges it is compared to, and the sweep as a whole
+      O((n + k) log n) for n edges with k pairs to compare, however the
+      edges line up.
+"""
+def loopCrossings(loops):
+    edges = []
+    lastEdge = [] #index of the closing edge of each closed loop, or None
+    for loopIndex, loop in enumerate(loops):
+        count = 0 #edges so far, leaving out repeated points
+        for i in range(len(loop) - 1):
+            x1, y1, x2, y2 = loop[i][1], loop[i][2], loop[i+1][1], loop[i+1][2]
+            if x1 == x2 and y1 == y2:
+                continue
+            edges.append((min(x1, x2), max(x1, x2), min(y1, y2), max(y1, y2),
+                          x1, y1, x2, y2, loopIndex, count))
+            count += 1
+        closed = count > 2 and loop[0][1:3] == loop[-1][1:3]
+        lastEdge.append(count - 1 if closed else None)
+    edges.sort()
+
+    crossings = []
+    active = activeEdges(edges)
+    for edge in edges:
+        minX, maxX, minY, maxY, x1, y1, x2, y2, loopIndex, i = edge
+        for other in active.overlapping(minX, minY, maxY):
+            adjacent = False
+            if other[8] == loopIndex:
+                j = other[9]
+                last = lastEdge[loopIndex]
+                adjacent = (abs(i - j) == 1 or
+                            (last is not None and {i, j} == {0, last}))
+            point = edgeCrossing(x1, y1, x2, y2, other[4], other[5],
+                                 other[6], other[7], adjacent)
+            if point is not None:
+                crossings.append((min(loopIndex, other[8]),
+                                  max(loopIndex, other[8])) + tuple(point))
+        active.add(edge)
+    return crossings
+
+"""
+    The active edges of a loopCrossings sweep. While there are no more
+      than SWEEP_SCAN_LIMIT of them they are kept in a list and simply
+      looked through. Past that they are ordered by y, so the ones that
+      overlap a y range are found without looking at the rest, until
+      they are down to half as many again. An active edge overlaps
+      [minY, maxY] either because it spans minY or because its bottom is
+      above minY and no higher than maxY. Both are found with segment
+      trees over every y an edge ends at:
+        ~spans keeps each edge in the O(log n) nodes that make up its y
+          range, so the edges spanning a y are the ones kept on the path
+          from its leaf to the root
+        ~bottoms keeps each edge in every node above the leaf of its
+          bottom, so the edges with their bottom in a range are the ones
+          kept in the O(log n) nodes that make up that range
+      Edges the sweep has passed (their right end is left of it) are
+      dropped from a tree node the first time it is looked at after that,
+      and counted off a heap of right ends.
+"""
+class activeEdges:
+    def __init__(self, edges):
+        self._edges = edges #every edge of the sweep, for the trees' ys
+        self._few = [] #the active edges, while they are few
+        self._tidyAt = 0 #length of _few at which passed edges are dropped
+        self._ends = None #heap of (maxX, number, edge) while in the trees
+        self._numbered = 0 #numbers given out, to tell heap entries apart
+        self._rank = None #y -> leaf number, from the first use of the trees
+        self._size = 1 #leaves in the trees, a power of two
+        self._spans = None #edges kept at each node of the trees
+        self._bottoms = None
+
+    def add(self, edge):
+        if self._ends is None:
+            self._few.append(edge)
+        else:
+            self.addToTrees(edge)
+            heapq.heappush(self._ends, (edge[1], self._numbered, edge))
+            self._numbered += 1
+
+    #the active edges (right end at sweepX or beyond) overlapping minY-maxY
+    def overlapping(self, sweepX, minY, maxY):
+        if self._ends is None:
+            #passed edges are only dropped once the list has grown, which
+            #  still keeps it under 2 * SWEEP_SCAN_LIMIT + 16 edges
+            if len(self._few) > self._tidyAt:
+                self._few = [other for other in self._few
+                             if other[1] >= sweepX]
+                self._tidyAt = 2 * len(self._few) + 16
+                if len(self._few) > SWEEP_SCAN_LIMIT:
+                    self.useTrees()
+        else:
+            ends = self._ends
+            while ends and ends[0][0] < sweepX:
+                heapq.heappop(ends)
+            if len(ends) <= SWEEP_SCAN_LIMIT // 2:
+                self._few = [entry[2] for entry in ends]
+                self._tidyAt = 2 * len(self._few) + 16
+                self._ends = None
+        if self._ends is None:
+            return [other for other in self._few if other[1] >= sweepX and
+                    other[3] >= minY and other[2] <= maxY]
+
+        nodes = [] #(tree, node) to look in
+        node = self._rank[minY] + self._size
+        while node:
+            nodes.append((self._spans, node))
+            node //= 2
+        low = self._rank[minY] + self._size + 1
+        high = self._rank[maxY] + self._size + 1
+        while low < high:
+            if low & 1:
+                nodes.append((self._bottoms, low))
+                low += 1
+            if high & 1:
+                high -= 1
+                nodes.append((self._bottoms, high))
+            low //= 2
+            high //= 2
+
+        found = []
+        for tree, node in nodes:
+            kept = tree[node]
+            if kept:
+                stillActive = [other for other in kept if other[1] >= sweepX]
+                if len(stillActive) < len(kept):
+                    tree[node] = stillActive
+                found.extend(stillActive)
+        return found
+
+    #move the active edges from the list into empty trees
+    def useTrees(self):
+        if self._rank is None:
+            ys = sorted(set(y for edge in self._edges for y in edge[2:4]))
+            self._rank = {y: i for i, y in enumerate(ys)}
+            while self._size < len(ys):
+                self._size *= 2
+        self._spans = [None] * (2 * self._size)
+        self._bottoms = [None] * (2 * self._size)
+        self._ends = []
+        for edge in self._few:
+            self.addToTrees(edge)
+            self._ends.append((edge[1], self._numbered, edge))
+            self._numbered += 1
+        heapq.heapify(self._ends)
+        self._few = []
+
+    def addToTrees(self, edge):
+        spans = self._spans
+        low = self._rank[edge[2]] + self._size
+        high = self._rank[edge[3]] + self._size + 1
+        while low < high:
+            if low & 1:
+                if spans[low] is None:
+                    spans[low] = []
+                spans[low].append(edge)
+                low += 1
+            if high & 1:
+                high -= 1
+                if spans[high] is None:
+                    spans[high] = []
+                spans[high].append(edge)
+            low //= 2
+            high //= 2
+
+        bottoms = self._bottoms
+        node = self._rank[edge[2]] + self._size
+        while node:
+            if bottoms[node] is None:
+                bottoms[node] = []
+            bottoms[node].append(edge)
+            node //= 2
+
+"""
+    A loopEdges holds the straight edges of a shape's flattened loops (see
+      flattenLoop) in a gridIndex, and the first point of every loop in
+      another, to compare other shapes to it. Inside means inside by the
+      even-odd rule, as in pointInLoops, so cutouts aren't inside.
+
+    Two shapes whose edges don't cross or touch either nest or are apart,
+      so after the edges, one point of each loop settles the rest.
+"""
+class loopEdges:
+    def __init__(self, loops):
+        self.loops = [loop for loop in loops if loop]
+        self._edges = [] #(x1, y1, x2, y2)
+        for loop in self.loops:
+            self._edges.extend(loopSegments(loop))
+        bounds = loopsBounds(self.loops) or (0.0, 0.0, 0.0, 0.0)
+        cellSize = chooseCellSize(bounds[2] - bounds[0],
+                                  bounds[3] - bounds[1], len(self._edges))
+        self._grid = gridIndex(cellSize)
+        for k, (x1, y1, x2, y2) in enumerate(self._edges):
+            self._grid.insert(k, min(x1, x2), min(y1, y2), max(x1, x2),
+                              max(y1, y2))
+        self._starts = gridIndex(cellSize)
+        for k, loop in enumerate(self.loops):
+            self._starts.insert(k, loop[0][1], loop[0][2], loop[0][1],
+                                loop[0][2])
+
+    #whether any edge of some flattened loops crosses or touches an edge
+    def crossedBy(self, loops):
+        edges = self._edges
+        for loop in loops:
+            for x1, y1, x2, y2 in loopSegments(loop):
+                for k in self._grid.queryBox(min(x1, x2), min(y1, y2),
+                                             max(x1, x2), max(y1, y2)):
+                    edge = edges[k]
+                    if edgeCrossing(x1, y1, x2, y2, *edge) is not None:
+                        return True
+        return False
+
+    #the loops whose first points are inside a box
+    def startsIn(self, minX, minY, maxX, maxY):
+        for k in self._starts.queryBox(minX, minY, maxX, maxY):
+            x, y = self.loops[k][0][1], self.loops[k][0][2]
+            if minX <= x <= maxX and minY <= y <= maxY:
+                yield self.loops[k]
+
+    """
+        Whether some flattened loops share any area or edge with the shape.
+    """
+    def overlaps(self, loops):
+        loops = [loop for loop in loops if loop]
+        if not loops or not self.loops:
+            return False
+        if self.crossedBy(loops):
+            return True
+        if pointInLoops(loops[0][0][1], loops[0][0][2], self.loops):
+            return True
+        bounds = loopsBounds(loops)
+        return any(pointInLoops(loop[0][1], loop[0][2], loops)
+                   for loop in self.startsIn(*bounds))
+
+    """
+        Whether all of some flattened loops is inside the shape: no edge
+          of theirs crosses or touches its edges, they are inside it, and
+          none of its loops (a cutout, say) is inside them.
+    """
+    def holds(self, loops):
+        loops = [loop for loop in loops if loop]
+        if not loops or not self.loops:
+            return False
+        if self.crossedBy(loops):
+            return False
+        if not pointInLoops(loops[0][0][1], loops[0][0][2], self.loops):
+            return False
+        bounds = loopsBounds(loops)
+        return not any(pointInLoops(loop[0][1], loop[0][2], loops)
+                       for loop in self.startsIn(*bounds))
+
+#the straight edges of a flattened loop as (x1, y1, x2, y2), closing it
+#  if its last point isn't its first, the way pointInPolygon does
+def loopSegments(loop):
+    segments = []
+    for i in range(len(loop)):
+        x1, y1 = loop[i-1][1], loop[i-1][2]
+        x2, y2 = loop[i][1], loop[i][2]
+        if x1 != x2 or y1 != y2:
+            segments.append((x1, y1, x2, y2))
+    return segments
@@ -0,0 +1,99 @@
+"""
+    Tests for emnObj.checkArcAngle, which checks every loop on a board at
+      once: it should find the same acute arcs, in the same order, as
+      checking one loop at a time the way the tool first did.
+
+    Run from the repository folder with:
+        python -m unittest discover tests
+"""
+
+import math
+import os
+import random
+import sys
+import unittest
+
+#the tool's modules live one folder up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import emnObj
+import errorSink
+
+#the check as it was before it was batched, one loop at a time
+def loopByLoop(shapes):
+    errors = []
+    for currentShape in shapes:
+        for s in [currentShape.outline] + currentShape.cutouts:
+            s = s[1:]
+            if len(s) > 2:
+                for i in range(len(s)):
+                    phi0 = s[i-1][3]
+                    phi1 = s[i][3]
+                    if phi0 or phi1:
+                        phi0 = math.radians(phi0)
+                        phi1 = math.radians(phi1)
+                        alpha0 = math.atan2(s[i-2][2]-s[i-1][2],
+                                            s[i-2][1]-s[i-1][1])
+                        alpha1 = math.atan2(s[i][2]-s[i-1][2],
+                                            s[i][1]-s[i-1][1])
+                        alpha0 = math.fmod((alpha0 + math.tau),math.tau)
+                        alpha1 = math.fmod((alpha1 + math.tau),math.tau)
+                        beta0 = alpha0 + (phi0/2)
+                        beta1 = alpha1 - (phi1/2)
+                        delta = math.fmod(math.fabs(beta1-beta0),math.tau)
+                        if math.isclose(delta,0,rel_tol=0.01,abs_tol=0.01) or \
+                            math.isclose(delta,math.tau,rel_tol=0.01,
+                                         abs_tol=0.01):
+                            errors.append("Infinitesimal arc intersection" +
+                                          " found at [%.2f,%.2f]" %
+                                          (s[i-1][1],s[i-1][2]))
+    return errors
+
+"""
+    Lines of a board of route keepouts made of random loops. Points sit on
+      a coarse grid and arcs are multiples of 45 degrees, so plenty of
+      arcs meet their neighbours at no angle at all.
+"""
+def randomBoard(rng, shapes):
+    lines = [".HEADER\n",
+             "BOARD_FILE 3.0 \"CircuitWorks\" 2016/01/01.12:00:00 1\n",
+             "\"board\" MM\n",
+             ".END_HEADER\n"]
+    for n in range(shapes):
+        lines.extend((".ROUTE_KEEPOUT ECAD\n", "ALL\n"))
+        for loop in range(rng.randint(1, 3)):
+            points = [(rng.randint(0, 4), rng.randint(0, 4))
+                      for i in range(rng.randint(2, 7))]
+            points.append(points[0])
+            for i, (x, y) in enumerate(points):
+                arc = rng.choice((0, 0, 45, 90, 180, -90, -180)) if i else 0
+                lines.append("%d %d %d %d\n" % (loop, x, y, arc))
+        lines.append(".END_ROUTE_KEEPOUT\n")
+    return lines
+
+class arcAngleTest(unittest.TestCase):
+    def testMatchesLoopByLoop(self):
+        rng = random.Random(5)
+        found = 0
+        for trial in range(30):
+            records = errorSink.recordList()
+            board = emnObj.emnObj(randomBoard(rng, 20), "board.emn",
+                                  sink=records)
+            board.runChecks(emnObj.selectChecks(["checkArcAngle"]), None)
+            expected = loopByLoop(board.shapes)
+            self.assertEqual([record.message for record in records],
+                             expected)
+            found += len(expected)
+        self.assertGreater(found, 0) #the boards did have acute arcs
+
+    def testNoArcs(self):
+        lines = randomBoard(random.Random(6), 5)
+        lines = [line.rsplit(" ", 1)[0] + " 0\n" if line[0].isdigit()
+                 else line for line in lines]
+        records = errorSink.recordList()
+        board = emnObj.emnObj(lines, "board.emn", sink=records)
+        board.runChecks(emnObj.selectChecks(["checkArcAngle"]), None)
+        self.assertEqual(list(records), [])
+
+if __name__ == "__main__":
+    unittest.main()
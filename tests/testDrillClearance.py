@@ -0,0 +1,89 @@
+"""
+    Tests for emnObj.checkDrillClearance:
+        ~drills of very different sizes (a tooling hole among vias) are
+          found to overlap or crowd each other exactly when a comparison
+          of every pair says so
+        ~drills with no size, and boards with no units, don't trip up the
+          grid the drills are bucketed in
+
+    Run from the repository folder with:
+        python -m unittest discover tests
+"""
+
+import math
+import os
+import random
+import sys
+import unittest
+
+#the tool's modules live one folder up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import emnObj
+import errorSink
+
+#lines of a board with some drills, as (diameter, x, y)
+def boardLines(drills, units="MM"):
+    lines = [".HEADER\n",
+             "BOARD_FILE 3.0 \"CircuitWorks\" 2016/01/01.12:00:00 1\n",
+             "\"board\" %s\n" % units,
+             ".END_HEADER\n",
+             ".DRILLED_HOLES\n"]
+    lines.extend("%.4f %.4f %.4f PTH BOARD VIA ECAD\n" % drill
+                 for drill in drills)
+    lines.append(".END_DRILLED_HOLES\n")
+    return lines
+
+#the drill clearance errors of a board
+def clearanceErrors(drills, units="MM"):
+    records = errorSink.recordList()
+    board = emnObj.emnObj(boardLines(drills, units), "board.emn",
+                          sink=records)
+    board.runChecks(emnObj.selectChecks(["checkDrillClearance"]), None)
+    return sorted(record.message for record in records)
+
+#what comparing every pair of drills finds, as (first, second, overlaps)
+def bruteForcePairs(drills, clearance):
+    pairs = []
+    for i, (diameterA, xA, yA) in enumerate(drills):
+        for j in range(i + 1, len(drills)):
+            diameterB, xB, yB = drills[j]
+            gap = math.hypot(xB - xA, yB - yA) - (diameterA + diameterB) / 2
+            if gap < clearance:
+                pairs.append((i, j, gap < 0))
+    return pairs
+
+class drillClearanceTest(unittest.TestCase):
+    #drills written at the precision boardLines writes them with
+    def roundDrills(self, drills):
+        return [tuple(float("%.4f" % value) for value in drill)
+                for drill in drills]
+
+    def testMixedSizesMatchEveryPair(self):
+        rng = random.Random(3)
+        for trial in range(20):
+            drills = [(rng.choice((0.2, 0.3, 0.5, 1.0)),
+                       rng.uniform(0, 20), rng.uniform(0, 20))
+                      for n in range(rng.randint(2, 150))]
+            #a few tooling holes much bigger than everything else
+            drills.extend((rng.uniform(3.0, 8.0), rng.uniform(0, 20),
+                           rng.uniform(0, 20)) for n in range(2))
+            drills = self.roundDrills(drills)
+            errors = clearanceErrors(drills)
+            pairs = bruteForcePairs(drills, emnObj.DRILL_CLEARANCE["MM"])
+            self.assertEqual(len(errors), len(pairs))
+            self.assertEqual(sum(" overlaps " in e for e in errors),
+                             sum(overlaps for i, j, overlaps in pairs))
+
+    def testZeroSizeDrills(self):
+        drills = [(0.0, 1.0, 1.0), (0.0, 1.05, 1.0), (0.0, 5.0, 5.0)]
+        self.assertEqual(len(clearanceErrors(drills)), 1)
+        #no units, so no clearance and a grid sized from nothing at all
+        self.assertEqual(clearanceErrors(drills, units=""), [])
+
+    def testDrillsOnTopOfEachOther(self):
+        drills = [(0.5, 2.0, 2.0)] * 3 + [(0.0, 2.0, 2.0)] * 2
+        self.assertEqual(len(clearanceErrors(drills)), 10)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+"""
+    Regression test for incremental checking (see emnDiff):
+        ~edits a generated board (benchmarks/idfGenerator.py) a few lines
+          at a time, the way an export changes it
+        ~checks every revision against the one before it, the way watch
+          mode does, and in full, and expects the same error records in
+          the same order
+
+    Run from the repository folder with:
+        python -m unittest discover tests
+"""
+
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+#the tool's modules live one folder up, the generator in benchmarks
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import emnObj
+import errorSink
+import idfGenerator
+import libIndex
+
+#small enough to check a board in well under a second
+SCALE = idfGenerator.boardScale(parts=150, shapesPerType=2,
+                                cutoutsPerShape=2, loopVertices=12,
+                                drills=200, libSize=1000, boardSize=100.0)
+
+REVISIONS = 40 #revisions of the board each test goes through
+
+"""
+    Change a few lines of a board, the way re-exporting it would: move a
+      part (sometimes off the board), rename one (sometimes to a part the
+      library doesn't have), move or drop a drill (sometimes onto
+      another one) or move a point of a shape.
+"""
+def editBoard(lines, rng):
+    lines = list(lines)
+    for edit in range(rng.randint(1, 3)):
+        i = rng.randrange(len(lines))
+        fields = lines[i].split()
+        if len(fields) == 6 and fields[-1] == "PLACED":
+            x = float(fields[0]) + rng.choice((-150.0, -2.0, 0.5, 3.0))
+            lines[i] = "%.4f %s\n" % (x, " ".join(fields[1:]))
+        elif len(fields) == 3 and fields[1].startswith("PKG"):
+            fields[0] = rng.choice((idfGenerator.partNumber(
+                rng.randrange(SCALE.libSize)), "999-99999-99", "ABC_1"))
+            lines[i] = " ".join(fields) + "\n"
+        elif len(fields) == 7 and fields[3] == "PTH":
+            if rng.random() < 0.2:
+                del lines[i]
+                continue
+            j = rng.randrange(len(lines))
+            other = lines[j].split()
+            if len(other) == 7 and other[3] == "PTH":
+                fields[1:3] = other[1:3] #right on top of another drill
+            else:
+                fields[1] = "%.4f" % (float(fields[1]) + rng.random())
+            lines[i] = " ".join(fields) + "\n"
+        elif len(fields) == 4 and not fields[0].startswith("."):
+            try:
+                y = float(fields[2]) + rng.choice((-5.0, 0.25, 1.0))
+            except ValueError:
+                continue
+            fields[2] = "%.4f" % y
+            lines[i] = " ".join(fields) + "\n"
+    return lines
+
+class incrementalTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.TemporaryDirectory()
+        boardPath = os.path.join(cls.folder.name, "board.emn")
+        idfGenerator.writeBoard(boardPath, SCALE, seed=1)
+        with open(boardPath) as f:
+            cls.lines = f.readlines()
+        libPath = os.path.join(cls.folder.name, "library")
+        idfGenerator.writeLibrary(libPath, SCALE)
+        cls.partsLibrary = libIndex.loadLibrary(libPath)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.folder.cleanup()
+
+    #check some lines, against an earlier emnObj if there is one
+    def check(self, lines, previous=None, lineNumbers=False):
+        records = errorSink.recordList()
+        board = emnObj.emnObj(list(lines), "board.emn",
+                              lineNumbers=lineNumbers, sink=records)
+        board.runChecks(emnObj.selectChecks(), self.partsLibrary,
+                        previous=previous)
+        return board, [record.asDict() for record in records]
+
+    #edit the board over and over, checking each revision both ways
+    def compareRevisions(self, seed, lineNumbers=False):
+        rng = random.Random(seed)
+        lines = self.lines
+        previous, records = self.check(lines, lineNumbers=lineNumbers)
+        for revision in range(REVISIONS):
+            lines = editBoard(lines, rng)
+            full, fullRecords = self.check(lines, lineNumbers=lineNumbers)
+            board, records = self.check(lines, previous, lineNumbers)
+            self.assertEqual(records, fullRecords,
+                             "revision %d differs" % revision)
+            self.assertEqual(board.errors, full.errors)
+            previous = board #chain revisions, like watch mode
+
+    def testChainedEdits(self):
+        self.compareRevisions(1)
+
+    def testChainedEditsWithLineNumbers(self):
+        self.compareRevisions(2, lineNumbers=True)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+    Tests for parts library snapshots (libIndex.saveSnapshot and
+      loadSnapshot):
+        ~a library read back from its snapshot has the same part numbers,
+          .LIB files, fingerprint and suggestions as the one saved
+        ~a snapshot saved under another key, or cut short, isn't used
+        ~a snapshot can be saved over one that is loaded and in use
+
+    Run from the repository folder with:
+        python -m unittest discover tests
+"""
+
+import os
+import pickle
+import sys
+import tempfile
+import unittest
+
+#the tool's modules live one folder up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libIndex
+
+#part numbers in two .LIB files, some of them a typo or suffix apart
+PARTS = {
+    "LIB01.LIB": ["100-00001-00", "100-00002-00", "100-00002-01",
+                  "ABC_1", "X"],
+    "LIB02.LIB": ["200-00001-00", "200-00011-00", "200-00001-00A",
+                  "Å-1"],
+}
+
+#a library with PARTS in it, saved under key
+def makeLibrary(key=b"k" * 20):
+    partsLibrary = libIndex.libIndex()
+    for libFile, partNumbers in sorted(PARTS.items()):
+        partsLibrary.addParts(partNumbers, libFile)
+    partsLibrary.snapshotKey = key
+    return partsLibrary
+
+class librarySnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "library.snapshot")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def testRoundTrip(self):
+        saved = makeLibrary()
+        saved.saveSnapshot(self.path)
+        loaded = libIndex.loadSnapshot(self.path, b"k" * 20)
+
+        self.assertTrue(loaded.fromSnapshot)
+        self.assertEqual(loaded.snapshotKey, b"k" * 20)
+        self.assertEqual(len(loaded), len(saved))
+        self.assertEqual(loaded.fingerprint(), saved.fingerprint())
+        for libFile, partNumbers in PARTS.items():
+            for partNumber in partNumbers:
+                self.assertIn(partNumber, loaded)
+                self.assertEqual(loaded.getSource(partNumber), libFile)
+        self.assertNotIn("100-00003-00", loaded)
+        self.assertEqual(loaded.getSource("100-00003-00"), "")
+        for partNumber in ("100-00003-00", "200-00001-0", "ABC1", "Y"):
+            self.assertEqual(loaded.suggestions(partNumber),
+                             saved.suggestions(partNumber))
+        self.assertEqual(sorted(loaded.sources().items()),
+                         sorted(saved.sources().items()))
+
+    def testSentToWorkers(self):
+        makeLibrary().saveSnapshot(self.path)
+        loaded = libIndex.loadSnapshot(self.path)
+        copy = pickle.loads(pickle.dumps(loaded))
+        self.assertEqual(copy.fingerprint(), loaded.fingerprint())
+        self.assertEqual(sorted(copy), sorted(loaded))
+
+    def testWrongKeyOrCutShort(self):
+        makeLibrary().saveSnapshot(self.path)
+        with self.assertRaises(ValueError):
+            libIndex.loadSnapshot(self.path, b"o" * 20)
+        with open(self.path, "rb") as f:
+            data = f.read()
+        for size in (0, 10, len(data) - 1):
+            with open(self.path, "wb") as f:
+                f.write(data[:size])
+            with self.assertRaises(ValueError):
+                libIndex.loadSnapshot(self.path)
+
+    def testSaveOverLoadedSnapshot(self):
+        makeLibrary().saveSnapshot(self.path)
+        loaded = libIndex.loadSnapshot(self.path)
+        newer = makeLibrary(b"n" * 20)
+        newer.addParts(["300-00001-00"], "LIB03.LIB")
+        newer.saveSnapshot(self.path)
+
+        self.assertIn("100-00001-00", loaded) #still usable
+        reloaded = libIndex.loadSnapshot(self.path, b"n" * 20)
+        self.assertIn("300-00001-00", reloaded)
+        self.assertEqual(reloaded.fingerprint(), newer.fingerprint())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+    Tests for spatialIndex.loopCrossings: the sweep should find exactly
+      the crossings that comparing every pair of edges finds, both while
+      few edges are active at once and once there are more than
+      SWEEP_SCAN_LIMIT of them.
+
+    Run from the repository folder with:
+        python -m unittest discover tests
+"""
+
+import os
+import random
+import sys
+import unittest
+
+#the tool's modules live one folder up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import spatialIndex
+
+#what loopCrossings should find, from comparing every pair of edges
+def everyPair(loops):
+    edges = [] #(loop, edge number, x1, y1, x2, y2)
+    lastEdge = []
+    for loopIndex, loop in enumerate(loops):
+        count = 0
+        for i in range(len(loop) - 1):
+            x1, y1, x2, y2 = loop[i][1], loop[i][2], loop[i+1][1], loop[i+1][2]
+            if (x1, y1) != (x2, y2):
+                edges.append((loopIndex, count, x1, y1, x2, y2))
+                count += 1
+        closed = count > 2 and loop[0][1:3] == loop[-1][1:3]
+        lastEdge.append(count - 1 if closed else None)
+
+    crossings = []
+    for a in range(len(edges)):
+        for b in range(a + 1, len(edges)):
+            loopA, i = edges[a][:2]
+            loopB, j = edges[b][:2]
+            adjacent = loopA == loopB and (
+                abs(i - j) == 1 or
+                (lastEdge[loopA] is not None and {i, j} == {0, lastEdge[loopA]}))
+            point = spatialIndex.edgeCrossing(*(edges[a][2:] + edges[b][2:] +
+                                                (adjacent,)))
+            if point is None:
+                #the sweep compares the edges the other way round
+                point = spatialIndex.edgeCrossing(*(edges[b][2:] +
+                                                    edges[a][2:] + (adjacent,)))
+            if point is not None:
+                crossings.append((min(loopA, loopB), max(loopA, loopB)))
+    return sorted(crossings)
+
+#the loop pairs of loopCrossings' results, to compare with everyPair
+def sweptPairs(loops):
+    return sorted(crossing[:2] for crossing in spatialIndex.loopCrossings(loops))
+
+#a closed loop of (cutout, x, y, arc) points on a coarse grid
+def randomLoop(rng, loopIndex, size):
+    points = [(loopIndex, float(rng.randint(0, size)),
+               float(rng.randint(0, size)), 0.0)
+              for i in range(rng.randint(2, 8))]
+    return points + [points[0]]
+
+class loopCrossingsTest(unittest.TestCase):
+    def testRandomLoops(self):
+        rng = random.Random(11)
+        for trial in range(300):
+            loops = [randomLoop(rng, i, rng.choice((3, 10)))
+                     for i in range(rng.randint(1, 4))]
+            self.assertEqual(sweptPairs(loops), everyPair(loops),
+                             "loops %r" % loops)
+
+    def testManyActiveEdges(self):
+        #long edges stacked on top of each other keep hundreds active at
+        #  once, and short loops are scattered through them
+        rng = random.Random(12)
+        count = spatialIndex.SWEEP_SCAN_LIMIT * 2
+        loops = [[(0, 0.0, float(y), 0.0), (0, 100.0, float(y) + 0.5, 0.0)]
+                 for y in range(count)]
+        loops.extend(randomLoop(rng, 1, 100) for i in range(40))
+        #a side split into pieces along the same line
+        loops.append([(2, 50.0, y / 2.0, 0.0) for y in range(count)])
+        expected = everyPair(loops)
+        self.assertGreater(len(expected), count)
+        self.assertEqual(sweptPairs(loops), expected)
+
+    def testClosedSquareIsClean(self):
+        square = [(0, 0.0, 0.0, 0.0), (0, 1.0, 0.0, 0.0), (0, 1.0, 1.0, 0.0),
+                  (0, 0.0, 1.0, 0.0), (0, 0.0, 0.0, 0.0)]
+        self.assertEqual(spatialIndex.loopCrossings([square]), [])
+        bowTie = [(0, 0.0, 0.0, 0.0), (0, 1.0, 1.0, 0.0), (0, 1.0, 0.0, 0.0),
+                  (0, 0.0, 1.0, 0.0), (0, 0.0, 0.0, 0.0)]
+        self.assertEqual(spatialIndex.loopCrossings([bowTie]),
+                         [(0, 0, 0.5, 0.5)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+    Tests for checking parts against their .emp component outlines
+      (emnObj.checkPartsOnBoard and emnObj.checkPartHeights):
+        ~a part in a rounded board corner is on the board when it is
+          inside the arc, even though it is outside the arc's chord
+        ~a part over a cutout doesn't fit, even with every corner on the
+          board
+        ~a height area counts when the part's outline overlaps it, even
+          with no corner of the part inside it
+
+    Run from the repository folder with:
+        python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+#the tool's modules live one folder up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import emnObj
+import empLib
+import errorSink
+
+#a 2 x 2 mm square part and a 3 mm tall one, 6 mm across
+COMPONENTS = [
+    ".ELECTRICAL\n",
+    "SQUARE PN-1 MM 1.0\n",
+    "0 -1 -1 0\n", "0 1 -1 0\n", "0 1 1 0\n", "0 -1 1 0\n", "0 -1 -1 0\n",
+    ".END_ELECTRICAL\n",
+    ".ELECTRICAL\n",
+    "WIDE PN-2 MM 3.0\n",
+    "0 -3 -3 0\n", "0 3 -3 0\n", "0 3 3 0\n", "0 -3 3 0\n", "0 -3 -3 0\n",
+    ".END_ELECTRICAL\n",
+]
+
+#a 100 mm square board whose top right corner is rounded off (radius 20),
+#  with a 1 mm square cutout at [50,50]
+BOARD = [
+    ".HEADER\n",
+    "BOARD_FILE 3.0 \"CircuitWorks\" 2016/01/01.12:00:00 1\n",
+    "\"board\" MM\n",
+    ".END_HEADER\n",
+    ".BOARD_OUTLINE MCAD\n",
+    "1.6\n",
+    "0 0 0 0\n", "0 100 0 0\n", "0 100 80 0\n", "0 80 100 90\n",
+    "0 0 100 0\n", "0 0 0 0\n",
+    "1 50 50 0\n", "1 51 50 0\n", "1 51 51 0\n", "1 50 51 0\n",
+    "1 50 50 0\n",
+    ".END_BOARD_OUTLINE\n",
+    ".PLACE_OUTLINE MCAD\n",
+    "TOP 2.0\n",
+    "0 20 20 0\n", "0 21 20 0\n", "0 21 21 0\n", "0 20 21 0\n",
+    "0 20 20 0\n",
+    ".END_PLACE_OUTLINE\n",
+]
+
+#the errors a check finds with some parts, as (geometry, x, y) on top
+def checkParts(checkName, parts):
+    lines = list(BOARD)
+    lines.append(".PLACEMENT\n")
+    for number, (geometry, x, y) in enumerate(parts):
+        partNumber = "PN-1" if geometry == "SQUARE" else "PN-2"
+        lines.append("%s %s U%d\n" % (geometry, partNumber, number))
+        lines.append("%.2f %.2f 0.0 0.0 TOP PLACED\n" % (x, y))
+    lines.append(".END_PLACEMENT\n")
+
+    records = errorSink.recordList()
+    board = emnObj.emnObj(lines, "board.emn", sink=records)
+    board.runChecks(emnObj.selectChecks([checkName]), None,
+                    empLib.empLibrary(COMPONENTS))
+    return [record.message for record in records]
+
+class partOutlineTest(unittest.TestCase):
+    def testRoundedCorner(self):
+        #reaches [93,93], past the chord from [100,80] to [80,100] but
+        #  18.4 mm from the arc's center at [80,80]
+        self.assertEqual(checkParts("checkPartsOnBoard",
+                                    [("SQUARE", 92.0, 92.0)]), [])
+        #reaches [97,97], 24 mm from the center
+        self.assertEqual(len(checkParts("checkPartsOnBoard",
+                                        [("SQUARE", 96.0, 96.0)])), 1)
+
+    def testPartOverCutout(self):
+        self.assertEqual(len(checkParts("checkPartsOnBoard",
+                                        [("WIDE", 50.5, 50.5)])), 1)
+        self.assertEqual(checkParts("checkPartsOnBoard",
+                                    [("WIDE", 40.0, 40.0)]), [])
+
+    def testHeightAreaInsidePart(self):
+        #the 1 mm area sits inside the part, clear of its corners and origin
+        self.assertEqual(len(checkParts("checkPartHeights",
+                                        [("WIDE", 22.0, 22.0)])), 1)
+        self.assertEqual(checkParts("checkPartHeights",
+                                    [("SQUARE", 22.0, 22.0),
+                                     ("WIDE", 30.0, 30.0)]), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+    Tests for similarityIndex, behind the closest part number suggestions:
+        ~editDistance counts the same edits as the plain full table, and
+          gives up past its limit
+        ~ngramIndex.nearest finds the same names as comparing the query to
+          every name, including queries too short to split into trigrams
+        ~wildcardMatches finds the names that match a pattern
+
+    Run from the repository folder with:
+        python -m unittest discover tests
+"""
+
+import os
+import random
+import sys
+import unittest
+
+#the tool's modules live one folder up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import similarityIndex
+
+#the full edit distance table, with no shortcuts
+def fullDistance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, charA in enumerate(a, 1):
+        current = [i]
+        for j, charB in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j-1] + 1,
+                               previous[j-1] + (charA != charB)))
+        previous = current
+    return previous[-1]
+
+#what nearest() should give, from comparing the query to every name
+def bruteNearest(names, query, maxDistance):
+    found = sorted((fullDistance(query, name), name) for name in set(names))
+    found = [(distance, name) for distance, name in found
+             if distance <= maxDistance]
+    if not found:
+        return []
+    return [entry for entry in found if entry[0] == found[0][0]]
+
+#a name like a library part number, or a short one
+def randomName(rng, alphabet="0129AB-"):
+    length = rng.choice((1, 2, 3, 5, 8, 10, 12))
+    return "".join(rng.choice(alphabet) for i in range(length))
+
+#a copy of name with up to edits random single character edits
+def editName(rng, name, edits, alphabet="0129AB-"):
+    for edit in range(edits):
+        i = rng.randrange(len(name) + 1)
+        kind = rng.randrange(3)
+        if kind == 0 or not name:
+            name = name[:i] + rng.choice(alphabet) + name[i:]
+        elif kind == 1:
+            name = name[:i] + name[i+1:]
+        else:
+            name = name[:i] + rng.choice(alphabet) + name[i+1:]
+    return name
+
+class similarityTest(unittest.TestCase):
+    def testEditDistance(self):
+        rng = random.Random(7)
+        for trial in range(500):
+            a, b = randomName(rng), randomName(rng)
+            distance = fullDistance(a, b)
+            self.assertEqual(similarityIndex.editDistance(a, b), distance)
+            for limit in range(4):
+                self.assertEqual(similarityIndex.editDistance(a, b, limit),
+                                 min(distance, limit + 1))
+
+    def testNearestMatchesEveryName(self):
+        rng = random.Random(8)
+        names = sorted({randomName(rng) for i in range(300)})
+        index = similarityIndex.ngramIndex(names)
+        for trial in range(150):
+            query = editName(rng, rng.choice(names), rng.randint(0, 3))
+            for maxDistance in (1, 2):
+                self.assertEqual(index.nearest(query, maxDistance),
+                                 bruteNearest(names, query, maxDistance),
+                                 "query %r" % query)
+
+    def testShortQueries(self):
+        index = similarityIndex.ngramIndex(["A", "AB", "ABC", "XY", "ABCD"])
+        self.assertEqual(index.nearest("AB", 1), [(0, "AB")])
+        self.assertEqual(index.nearest("AC", 1),
+                         [(1, "A"), (1, "AB"), (1, "ABC")])
+        self.assertEqual(index.nearest("Q", 1), [(1, "A")])
+        self.assertEqual(index.nearest("", 1), [(1, "A")])
+        self.assertEqual(index.nearest("QQQQ", 1), [])
+
+    def testWildcardMatches(self):
+        index = similarityIndex.ngramIndex(["123-456", "123_456", "12",
+                                            "1234567", "X23-456"])
+        self.assertEqual(index.wildcardMatches("123?456", "?"),
+                         ["123-456", "123_456"])
+        self.assertEqual(index.wildcardMatches("??", "?"), ["12"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,220 @@
+"""
+    usageIndex class:
+        ~remember the parts every indexed .emn file places: part name,
+          reference designator, side and position, in a SQLite database
+        ~only look at files again when they change: a file whose size and
+          modification time are the same is skipped without being read,
+          and one whose content hash is the same isn't parsed
+        ~answer which boards place a part number, where a reference
+          designator is used and which boards place parts the library
+          doesn't have, without parsing any .emn files
+
+    Only the placement section of a changed file is parsed.
+"""
+
+import multiprocessing
+import os
+import sqlite3
+import emnObj
+import emnReader
+import resultCache
+
+#bump this whenever what is stored for a file changes
+INDEX_VERSION = 1
+
+#the columns a query gives for each placed part, in order
+ROW_FIELDS = ("file", "name", "refDes", "side", "x", "y", "rotation")
+
+"""
+    Read the parts of one .emn file for the index. request is
+      (path, storedHash): the hash the index has for the file, or None.
+      Returns (path, hash, parts, failure), where parts is None when the
+      content hasn't changed and otherwise a list of (name, refDes, side,
+      x, y, rotation). Runs in a worker process.
+"""
+def readUsage(request):
+    emnPath, storedHash = request
+    try:
+        newHash = resultCache.fileHash(emnPath)
+        if newHash == storedHash:
+            return emnPath, newHash, None, ""
+        currentEmn = emnObj.emnObj(emnReader.emnReader(emnPath),
+                                   os.path.basename(emnPath))
+        try:
+            parts = currentEmn.parts
+        finally:
+            currentEmn.close()
+        rows = list(zip(parts.names, parts.refDeses, parts.sides, parts.xs,
+                        parts.ys, parts.rotations))
+    except OSError:
+        return emnPath, None, None, "Could not access %s" % emnPath
+    except Exception as e:
+        return emnPath, None, None, "Could not index %s: %s" % (emnPath, e)
+    return emnPath, newHash, rows, ""
+
+"""
+    A usageIndex keeps the parts of every file it has been given in a
+      SQLite database at dbPath. Files are kept by absolute path. Part
+      names are also kept the way the parts library has them (upper
+      case), which is what queries look them up by.
+"""
+class usageIndex:
+    def __init__(self, dbPath):
+        self.dbPath = dbPath
+        self._db = sqlite3.connect(dbPath)
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version != INDEX_VERSION:
+            #an index from another version can't be trusted, start over
+            self._db.execute("DROP TABLE IF EXISTS parts")
+            self._db.execute("DROP TABLE IF EXISTS files")
+            self._db.execute("PRAGMA user_version = %d" % INDEX_VERSION)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "id INTEGER PRIMARY KEY, path TEXT UNIQUE, size INTEGER, "
+            "mtime REAL, hash TEXT)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS parts ("
+            "fileId INTEGER, libraryName TEXT, name TEXT, refDes TEXT, "
+            "side TEXT, x REAL, y REAL, rotation REAL)")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS partsByName ON parts (libraryName)")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS partsByRefDes ON parts "
+            "(refDes COLLATE NOCASE)")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS partsByFile ON parts (fileId)")
+        self._db.commit()
+
+    #the number of files in the index
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    """
+        Bring the index up to date for some .emn paths, reading the ones
+          that changed on jobs worker processes (all of the cores when
+          None, none with one job). Files that were indexed but are gone
+          are dropped. Returns (files read, failure messages).
+    """
+    def update(self, emnPaths, jobs=None):
+        stored = {} #path -> (id, size, mtime, hash)
+        for fileId, path, size, mtime, storedHash in self._db.execute(
+                "SELECT id, path, size, mtime, hash FROM files"):
+            stored[path] = (fileId, size, mtime, storedHash)
+
+        stats = {} #path -> (size, mtime), for the files to read
+        requests = []
+        failures = []
+        for emnPath in emnPaths:
+            path = os.path.abspath(emnPath)
+            try:
+                fileStat = os.stat(path)
+            except OSError:
+                failures.append("Could not access %s" % emnPath)
+                continue
+            entry = stored.get(path)
+            if entry and entry[1:3] == (fileStat.st_size, fileStat.st_mtime):
+                continue
+            stats[path] = (fileStat.st_size, fileStat.st_mtime)
+            requests.append((path, entry[3] if entry else None))
+
+        if jobs == 1 or len(requests) < 2:
+            results = map(readUsage, requests)
+            pool = None
+        else:
+            pool = multiprocessing.Pool(jobs)
+            results = pool.imap_unordered(readUsage, requests)
+
+        try:
+            with self._db:
+                for path, newHash, rows, failure in results:
+                    if failure:
+                        failures.append(failure)
+                        continue
+                    size, mtime = stats[path]
+                    if rows is None: #touched, but the same content
+                        self._db.execute(
+                            "UPDATE files SET size = ?, mtime = ? "
+                            "WHERE path = ?", (size, mtime, path))
+                    else:
+                        self.storeFile(path, size, mtime, newHash, rows,
+                                       stored.get(path, (None,))[0])
+                self.dropMissing(stored)
+        finally:
+            if pool:
+                pool.terminate()
+        return len(requests), failures
+
+    #replace what the index has for one file
+    def storeFile(self, path, size, mtime, newHash, rows, fileId=None):
+        if fileId is None:
+            fileId = self._db.execute(
+                "INSERT INTO files (path, size, mtime, hash) "
+                "VALUES (?, ?, ?, ?)", (path, size, mtime, newHash)).lastrowid
+        else:
+            self._db.execute(
+                "UPDATE files SET size = ?, mtime = ?, hash = ? WHERE id = ?",
+                (size, mtime, newHash, fileId))
+            self._db.execute("DELETE FROM parts WHERE fileId = ?", (fileId,))
+        self._db.executemany(
+            "INSERT INTO parts VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ((fileId, name.upper(), name, refDes, side, x, y, rotation)
+             for name, refDes, side, x, y, rotation in rows))
+
+    #forget the stored files (path -> (id, ...)) that aren't there anymore
+    def dropMissing(self, stored):
+        goneIds = [(entry[0],) for path, entry in stored.items()
+                   if not os.path.exists(path)]
+        self._db.executemany("DELETE FROM parts WHERE fileId = ?", goneIds)
+        self._db.executemany("DELETE FROM files WHERE id = ?", goneIds)
+
+    """
+        Get the parts placed with any of some part names, as ROW_FIELDS
+          tuples ordered by name, file and reference designator. Names are
+          matched the way the parts library matches them, ignoring case.
+    """
+    def whereUsed(self, names):
+        #the names go in a temporary table rather than one parameter each,
+        #  which could be more than SQLite allows in one statement
+        with self._db:
+            self._db.execute("CREATE TEMP TABLE IF NOT EXISTS wanted "
+                             "(libraryName TEXT PRIMARY KEY)")
+            self._db.execute("DELETE FROM wanted")
+            self._db.executemany("INSERT OR IGNORE INTO wanted VALUES (?)",
+                                 ((name.upper(),) for name in names))
+        return self.query(
+            "parts.libraryName IN (SELECT libraryName FROM wanted)", ())
+
+    """
+        Get the parts with a reference designator (ignoring case), as
+          ROW_FIELDS tuples.
+    """
+    def whereRefDes(self, refDes):
+        return self.query("parts.refDes = ? COLLATE NOCASE", (refDes,))
+
+    """
+        Get the parts whose names aren't in a parts library, as ROW_FIELDS
+          tuples. Each distinct name is looked up once.
+    """
+    def missingParts(self, partsLibrary):
+        missing = [libraryName for (libraryName,) in self._db.execute(
+                       "SELECT DISTINCT libraryName FROM parts")
+                   if libraryName not in partsLibrary]
+        return self.whereUsed(missing)
+
+    #placed parts matching an SQL condition on parts, as ROW_FIELDS tuples
+    def query(self, condition, parameters):
+        return self._db.execute(
+            "SELECT files.path, parts.name, parts.refDes, parts.side, "
+            "parts.x, parts.y, parts.rotation FROM parts "
+            "JOIN files ON files.id = parts.fileId WHERE " + condition +
+            " ORDER BY parts.libraryName, files.path, parts.refDes",
+            parameters).fetchall()
+
+    def close(self):
+        self._db.close()
+
+#a query row the way the tool prints parts
+def formatRow(row):
+    path, name, refDes, side, x, y, rotation = row
+    return "%s: %s (%s) at [%.2f,%.2f] on %s" % (path, name, refDes, x, y,
+                                                 side)